@@ -1 +1,2 @@
-from pyspawn.checkpoint import Checkpoint
\ No newline at end of file
+from pyspawn.checkpoint import Checkpoint
+from pyspawn.checkpoint_pool import CheckpointPool
\ No newline at end of file
@@ -0,0 +1,25 @@
+"""Runs command texts on async connections: asyncpg connections (execute / fetch) and async DB-API connections (aioodbc, psycopg's AsyncConnection)."""
+from typing import Any, List
+
+
+def _is_asyncpg(conn) -> bool:
+    """asyncpg connections have no cursors for plain statements, they execute and fetch on the connection."""
+    return hasattr(conn, "fetch")
+
+
+async def async_execute(conn, cmd_txt: str) -> None:
+    """Executes a (multi statement) batch without reading rows. asyncpg runs a batch without arguments over the simple query protocol."""
+    if _is_asyncpg(conn):
+        await conn.execute(cmd_txt)
+        return
+    async with conn.cursor() as cursor:
+        await cursor.execute(cmd_txt)
+
+
+async def async_fetch_all(conn, cmd_txt: str) -> List[Any]:
+    """Executes a single query and returns all its rows."""
+    if _is_asyncpg(conn):
+        return await conn.fetch(cmd_txt)
+    async with conn.cursor() as cursor:
+        await cursor.execute(cmd_txt)
+        return await cursor.fetchall()
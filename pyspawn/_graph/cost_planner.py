@@ -0,0 +1,105 @@
+from dataclasses import dataclass, field
+from typing import Dict, List, Set
+from pyspawn._graph.graph_builder import GraphBuilder
+from pyspawn._graph.table import Table
+
+
+TRUNCATE = "truncate"
+DELETE = "delete"
+BATCHED_DELETE = "batched_delete"
+
+
+@dataclass(frozen=True)
+class TableStrategy:
+    """The strategy chosen to empty a table, with the catalog row estimate and estimated cost it was chosen from."""
+    table: Table
+    strategy: str
+    estimated_rows: int
+    estimated_cost: float
+
+
+@dataclass
+class ResetPlan:
+    """The strategies chosen for the tables of a reset, in graph.to_delete order, and the number of rows per batched delete statement."""
+    batch_size: int
+    tables: List[TableStrategy] = field(default_factory=list)
+
+
+    @property
+    def estimated_cost(self) -> float:
+        """The total estimated cost of the reset."""
+        return sum([t.estimated_cost for t in self.tables])
+
+
+    def get_tables(self, strategy: str) -> List[Table]:
+        """Returns the tables planned with the strategy, in graph.to_delete order."""
+        return [t.table for t in self.tables if t.strategy == strategy]
+
+
+
+class CostPlanner:
+    """
+    CostPlanner picks TRUNCATE, DELETE or batched DELETE for each table from catalog row estimates.
+    TRUNCATE has a fixed cost regardless of the row count, DELETE a small per statement cost plus a cost per row.
+    Tables that cannot be truncated and are estimated to hold more than batched_delete_threshold rows are deleted in batches of batch_size rows
+    if the adapter supports it (SQL Server): every batch is a statement of its own, which on an autocommit connection also commits on its own,
+    so the lock count and log growth per transaction stay bounded at the price of one statement per batch.
+    Costs are relative units, not time.
+    """
+
+    def __init__(self, truncate_cost: float = 50.0, delete_statement_cost: float = 1.0, delete_row_cost: float = 0.01, batched_delete_threshold: int = 500000, batch_size: int = 50000):
+        self.truncate_cost                            = truncate_cost
+        self.delete_statement_cost                    = delete_statement_cost
+        self.delete_row_cost                          = delete_row_cost
+        self.batched_delete_threshold                 = batched_delete_threshold
+        self.batch_size                               = batch_size
+
+
+
+    def plan(self, graph: GraphBuilder, tables: List[Table], row_estimates: Dict[Table, int], truncatable_tables: Set[Table], truncate_cascades: bool = False, batched_delete: bool = True) -> ResetPlan:
+        """
+        Plans the cheapest strategy for each of the tables (in graph.to_delete order). Tables missing from row_estimates are estimated as empty.
+        If truncate_cascades (Postgres TRUNCATE ... CASCADE) every table referencing a truncated table is truncated as well, so they are planned as truncated.
+        Tables in cyclical relationships are then always truncated too, since a cascading truncate empties a cycle without disabling any constraint.
+        Without batched_delete (the adapter can't commit batches on their own) large tables are deleted in one statement.
+        """
+        strategies: Dict[Table, str] = {}
+        for t in tables:
+            strategies[t] = self._choose_strategy(row_estimates.get(t, 0), t in truncatable_tables, batched_delete)
+
+        if truncate_cascades:
+            for r in graph.cyclic_relationships:
+                for t in [r.parent_table, r.referenced_table]:
+                    if t in strategies:
+                        strategies[t] = TRUNCATE
+            truncated = [t for t in tables if strategies[t] == TRUNCATE]
+            for t in graph.get_delete_subset(truncated):
+                if t in strategies:
+                    strategies[t] = TRUNCATE
+
+        reset_plan = ResetPlan(self.batch_size)
+        for t in tables:
+            estimated_rows = row_estimates.get(t, 0)
+            reset_plan.tables.append(TableStrategy(t, strategies[t], estimated_rows, self._estimate_cost(strategies[t], estimated_rows)))
+        return reset_plan
+
+
+
+    def _choose_strategy(self, estimated_rows: int, truncatable: bool, batched_delete: bool = True) -> str:
+        """Returns the cheapest strategy allowed for a table with the estimated row count."""
+        if truncatable and self._estimate_cost(TRUNCATE, estimated_rows) < self._estimate_cost(DELETE, estimated_rows):
+            return TRUNCATE
+        if batched_delete and estimated_rows > self.batched_delete_threshold:
+            return BATCHED_DELETE
+        return DELETE
+
+
+
+    def _estimate_cost(self, strategy: str, estimated_rows: int) -> float:
+        """Returns the estimated cost of emptying a table with the estimated row count using the strategy."""
+        if strategy == TRUNCATE:
+            return self.truncate_cost
+        if strategy == BATCHED_DELETE:
+            batches = max(1, -(-estimated_rows // self.batch_size))
+            return batches * self.delete_statement_cost + estimated_rows * self.delete_row_cost
+        return self.delete_statement_cost + estimated_rows * self.delete_row_cost
@@ -1,5 +1,6 @@
-from queue import LifoQueue
-from typing import Set
+import heapq
+from array import array
+from typing import Dict, Iterable, List, Set, Tuple
 from pyspawn._graph.relationship import Relationship
 from pyspawn._graph.table import Table
 
@@ -7,69 +8,333 @@ from pyspawn._graph.table import Table
 class GraphBuilder:
     """GraphBuilder puts together an ordered list of tables to delete so that foreign key constraints are not violated."""
     ### If any combination of tables have cyclical relationships (i.e. A -> FK -> B, B -> FK -> C and C -> FK -> A)
-    ### that is handled by executing 'ALTER TABLE {} NOCHECK CONSTRAINT ALL' and 'ALTER TABLE {} WITH CHECK CONSTRAINT ALL'
-    ### statements for the last constraint the _has_cycle() recursion finds that completes the circle.
-    ### For instance, A -> FK -> B, B -> FK -> C and C -> FK -> A: if C -> FK -> A is the last constraint in the _has_cycle() recursion then C would be NOCHECK CONSTRAINT ALL followed by Delete A, Delete B & Delete C
-    ### For instance, A -> FK -> B, B -> FK -> C and C -> FK -> A: if B -> FK -> C is the last constraint in the _has_cycle() recursion then B would be NOCHECK CONSTRAINT ALL followed by Delete C, Delete A & Delete B
+    ### the cycle is broken by disabling a small set of named constraints (the feedback arc set) while deleting, instead of disabling every constraint of the tables.
+    ### For instance, A -> FK -> B, B -> FK -> C and C -> FK -> A: the tables are ordered A, B, C and only the C -> FK -> A constraint, which points backwards in that order, is disabled.
+    ### The order and the disabled constraints are deterministic: ties are broken on schema and table name.
 
-    def __init__(self, tables: Set[Table], relationships: Set[Relationship]):
-        self.to_delete: list[Table] = []
+    def __init__(self, tables: Set[Table], relationships: Iterable[Relationship]):
         self._fill_table_relationships(tables, relationships)
         cyclic_relationships, to_delete = self._find_and_remove_cycles(tables)
-        self.cyclic_relationships = list(cyclic_relationships)
-        
-        while not to_delete.empty():
-            self.to_delete.append(to_delete.get())
-        
+        self.cyclic_relationships: List[Relationship] = cyclic_relationships
+        self.to_delete: List[Table] = to_delete
 
 
-    def _fill_table_relationships(self, tables: Set[Table], relationships: Set[Relationship]):
-        """Loops through all relationships and adds existing relationships to the Table.relationships set."""
+    @classmethod
+    def from_plan(cls, to_delete: List[Table], relationships: Iterable[Relationship], cyclic_relationships: List[Relationship]) -> "GraphBuilder":
+        """Restores a GraphBuilder from an already computed delete order (i.e. a cached plan) without re-running the cycle detection."""
+        graph = cls.__new__(cls)
+        graph.to_delete = list(to_delete)
+        graph._fill_table_relationships(set(graph.to_delete), relationships)
+        graph.cyclic_relationships = list(cyclic_relationships)
+        return graph
+
+
+
+    def update(self, tables: Set[Table], relationships: Iterable[Relationship]) -> bool:
+        """
+        Patches the graph to a new set of tables and relationships (i.e. after a migration) without rebuilding it from scratch.
+        Only the weakly connected components touched by an added or removed table or relationship are re-ordered; the rest keep their order and cyclical relationships.
+        Returns False if the tables and relationships are unchanged.
+        """
+        new_tables: Dict[Table, Table] = {t: Table(t.schema, t.table_name) for t in tables}
+        new_relationships: Dict[Tuple, Relationship] = {}
         for r in relationships:
-            parent_table = next((t for t in tables if t == r.parent_table), None)
-            reference_table = next((t for t in tables if t == r.referenced_table), None)
+            if r.parent_table in new_tables and r.referenced_table in new_tables and r.parent_table != r.referenced_table:
+                new_relationships[self._relationship_key(r)] = r
+        old_relationships: Dict[Tuple, Relationship] = {self._relationship_key(r): r for t in self.to_delete for r in t.relationships}
+        old_tables: Set[Table] = set(self.to_delete)
+
+        changed_tables = old_tables.symmetric_difference(new_tables.keys())
+        changed_relationships = set(old_relationships.keys()).symmetric_difference(new_relationships.keys())
+        if len(changed_tables) == 0 and len(changed_relationships) == 0:
+            return False
+
+        parent: Dict[Table, Table] = {t: t for t in new_tables}
+        def find(table: Table) -> Table:
+            while parent[table] != table:
+                parent[table] = parent[parent[table]]
+                table = parent[table]
+            return table
+        for r in new_relationships.values():
+            parent[find(r.parent_table)] = find(r.referenced_table)
+
+        affected: Set[Table] = set([t for t in changed_tables if t in new_tables])
+        for key in changed_relationships:
+            r = new_relationships.get(key) or old_relationships[key]
+            affected.update([t for t in [r.parent_table, r.referenced_table] if t in new_tables])
+        affected_roots = set([find(t) for t in affected])
+        affected_tables = set([new_tables[t] for t in new_tables if find(t) in affected_roots])
+
+        patch = GraphBuilder(affected_tables, set([r for r in new_relationships.values() if find(r.parent_table) in affected_roots]))
+        unaffected_tables = [t for t in self.to_delete if t in new_tables and find(t) not in affected_roots]
+        unaffected = set(unaffected_tables)
+        self.cyclic_relationships = [r for r in self.cyclic_relationships if r.parent_table in unaffected] + patch.cyclic_relationships
+        self.to_delete = unaffected_tables + patch.to_delete
+        return True
+
+
+
+    def get_delete_subset(self, tables: Iterable[Table]) -> List[Table]:
+        """Returns the given tables plus all tables (transitively) referencing them with a foreign key, in to_delete order."""
+        referencing: Dict[Table, List[Table]] = {}
+        for t in self.to_delete:
+            for r in t.relationships:
+                referencing.setdefault(r.referenced_table, []).append(t)
+
+        subset: Set[Table] = set()
+        stack: List[Table] = list(tables)
+        while len(stack) > 0:
+            table = stack.pop()
+            if table in subset:
+                continue
+            subset.add(table)
+            stack.extend(referencing.get(table, []))
+
+        return [t for t in self.to_delete if t in subset]
+
+
+
+    @property
+    def levels(self) -> List[List[Table]]:
+        """The depth levels of all tables, see get_levels()."""
+        return self.get_levels()
+
+
+
+    def get_levels(self, tables: Iterable[Table] = None) -> List[List[Table]]:
+        """
+        Splits the tables (all tables if None) into depth levels: level 0 holds the tables no other table references and level n the tables only referenced from levels below n.
+        There is no foreign key between the tables of a level, so a level can be deleted set based or concurrently once the levels before it are deleted.
+        Cyclical relationships are disabled during the delete and are therefore not considered. Tables in a level are in to_delete order.
+        """
+        subset = set(self.to_delete if tables is None else tables)
+        cyclic_relationships = set(self._relationship_key(r) for r in self.cyclic_relationships)
+        depth: Dict[Table, int] = {}
+        for t in self.to_delete:
+            if t not in subset:
+                continue
+            depth.setdefault(t, 0)
+            for r in t.relationships:
+                if self._relationship_key(r) not in cyclic_relationships and r.referenced_table in subset:
+                    depth[r.referenced_table] = max(depth.get(r.referenced_table, 0), depth[t] + 1)
+
+        levels: List[List[Table]] = [[] for _ in range(max(depth.values(), default=-1) + 1)]
+        for t in self.to_delete:
+            if t in subset:
+                levels[depth[t]].append(t)
+        return levels
+
+
+
+    def get_components(self) -> List[List[Table]]:
+        """Returns the weakly connected components of the foreign key graph. Tables in a component are in to_delete order."""
+        tables, offsets, targets = self.get_adjacency()
+        parent = array("q", range(len(tables)))
+
+        def find(i: int) -> int:
+            while parent[i] != i:
+                parent[i] = parent[parent[i]]
+                i = parent[i]
+            return i
+
+        for i in range(len(tables)):
+            for j in range(offsets[i], offsets[i + 1]):
+                parent[find(i)] = find(targets[j])
+
+        components: Dict[int, List[Table]] = {}
+        for i, t in enumerate(tables):
+            components.setdefault(find(i), []).append(t)
+        return list(components.values())
+
+
+
+    def get_adjacency(self) -> Tuple[List[Table], array, array]:
+        """
+        Returns a compact integer indexed adjacency of the foreign key graph in compressed sparse row form, with tables in to_delete order:
+        tables[i] references tables[targets[j]] for offsets[i] <= j < offsets[i + 1].
+        """
+        index: Dict[Table, int] = {t: i for i, t in enumerate(self.to_delete)}
+        offsets = array("q", [0])
+        targets = array("q")
+        for t in self.to_delete:
+            for r in t.relationships:
+                targets.append(index[r.referenced_table])
+            offsets.append(len(targets))
+        return list(self.to_delete), offsets, targets
+
+
+
+    @staticmethod
+    def _relationship_key(r: Relationship) -> Tuple:
+        """Identifies a relationship by both of its tables and its name (Relationship equality only compares the name)."""
+        return (r.parent_table.schema, r.parent_table.table_name, r.referenced_table.schema, r.referenced_table.table_name, r.relationship_name)
+
+
+
+    def _fill_table_relationships(self, tables: Set[Table], relationships: Iterable[Relationship]):
+        """Indexes the tables by schema and name, and adds existing relationships to the Table.relationships set in O(tables + relationships)."""
+        table_index: Dict[Table, Table] = {t: t for t in tables}
+        for r in relationships:
+            parent_table = table_index.get(r.parent_table)
+            reference_table = table_index.get(r.referenced_table)
             if parent_table != None and reference_table != None and parent_table != reference_table:
                 parent_table.relationships.add(Relationship(parent_table, reference_table, r.relationship_name))
 
 
 
-    def _find_and_remove_cycles(self, tables:Set[Table]): #-> Tuple[Set[Relationship], LifoQueue[Table]]:
-        """Loops through all tables and, in combination with _has_cycle(), creates a Last In First Out (LIFO) queue
-           of tables to be deleted. Cyclical relations are kept separate for special handling."""
-        not_visited: Set[Table] = tables.copy()
-        visiting: Set[Table] = set()
-        visited: Set[Table] = set()
-        cyclic_relationships: Set[Relationship] = set()
-        to_delete: LifoQueue[Table] = LifoQueue(-1)
+    def _find_and_remove_cycles(self, tables:Set[Table]) -> Tuple[List[Relationship], List[Table]]:
+        """
+        Orders the tables so that referencing tables come before the tables they reference, and returns the relationships that have to be disabled to delete in that order.
+        The strongly connected components of the foreign key graph are found with _find_components(). The components are ordered topologically, and the tables within a
+        cyclical component are ordered by _order_component(); the relationships pointing backwards in that order form the feedback arc set.
+        Ties are broken on schema and table name, so the result does not depend on set iteration order.
+        """
+        ordered: List[Table] = sorted(tables, key=lambda t: (t.schema or "", t.table_name))
+        index: Dict[Table, int] = {t: i for i, t in enumerate(ordered)}
+        edges: List[List[Tuple[int, Relationship]]] = [
+            sorted([(index[r.referenced_table], r) for r in t.relationships], key=lambda e: (e[0], e[1].relationship_name)) for t in ordered]
+
+        components = self._find_components(edges)
+        component_of = array("q", [0] * len(ordered))
+        for c, component in enumerate(components):
+            for i in component:
+                component_of[i] = c
+
+        referencing_count = [0] * len(components)
+        component_edges: List[Set[int]] = [set() for _ in components]
+        for i in range(len(ordered)):
+            for j, _ in edges[i]:
+                if component_of[i] != component_of[j] and component_of[j] not in component_edges[component_of[i]]:
+                    component_edges[component_of[i]].add(component_of[j])
+                    referencing_count[component_of[j]] += 1
 
-        for t in tables:
-            self._has_cycle(t, not_visited, visiting, visited, cyclic_relationships, to_delete)
+        ready = [(min(component), c) for c, component in enumerate(components) if referencing_count[c] == 0]
+        heapq.heapify(ready)
+        to_delete: List[Table] = []
+        cyclic_relationships: List[Relationship] = []
+        while len(ready) > 0:
+            _, c = heapq.heappop(ready)
+            component_order = self._order_component(components[c], edges) if len(components[c]) > 1 else components[c]
+            position = {i: p for p, i in enumerate(component_order)}
+            for i in component_order:
+                to_delete.append(ordered[i])
+                for j, r in edges[i]:
+                    if j in position and position[j] < position[i]:
+                        cyclic_relationships.append(r)
+            for d in sorted(component_edges[c]):
+                referencing_count[d] -= 1
+                if referencing_count[d] == 0:
+                    heapq.heappush(ready, (min(components[d]), d))
 
         return cyclic_relationships, to_delete
 
 
 
-    def _has_cycle(self, table:Table, not_visited:Set[Table], visiting:Set[Table], visited:Set[Table], cyclic_relationships:Set[Relationship], to_delete) -> bool:
-        """Looks through a tables relationships and checks if it's a cyclical constraint (i.e. A with FK -> B, B with FK -> C and C with FK -> A).\n
-           If the table has no relationships it's immediately pushed to the LIFO-queue deleting. If it has dependencies the dependencies are recursively looped until the end of the chain is found or it's established as a cyclical constraint."""
-        if table in visited:
-            return False
-        
-        if table in visiting:
-            return True
+    def _find_components(self, edges: List[List[Tuple[int, Relationship]]]) -> List[List[int]]:
+        """Tarjan's strongly connected components with an explicit stack instead of recursion, so the depth of a foreign key chain is not limited by the recursion limit."""
+        count = len(edges)
+        indexes = array("q", [-1] * count)
+        low_links = array("q", [0] * count)
+        on_stack = [False] * count
+        stack: List[int] = []
+        components: List[List[int]] = []
+        next_index = 0
+
+        for start in range(count):
+            if indexes[start] != -1:
+                continue
+            indexes[start] = low_links[start] = next_index
+            next_index += 1
+            stack.append(start)
+            on_stack[start] = True
+            work = [(start, iter(edges[start]))]
+            while len(work) > 0:
+                i, successors = work[-1]
+                for j, _ in successors:
+                    if indexes[j] == -1:
+                        indexes[j] = low_links[j] = next_index
+                        next_index += 1
+                        stack.append(j)
+                        on_stack[j] = True
+                        work.append((j, iter(edges[j])))
+                        break
+                    elif on_stack[j]:
+                        low_links[i] = min(low_links[i], indexes[j])
+                else:
+                    work.pop()
+                    if len(work) > 0:
+                        low_links[work[-1][0]] = min(low_links[work[-1][0]], low_links[i])
+                    if low_links[i] == indexes[i]:
+                        component: List[int] = []
+                        while True:
+                            j = stack.pop()
+                            on_stack[j] = False
+                            component.append(j)
+                            if j == i:
+                                break
+                        components.append(sorted(component))
+        return components
+
+
+
+    def _order_component(self, component: List[int], edges: List[List[Tuple[int, Relationship]]]) -> List[int]:
+        """
+        Orders the tables of a cyclical component with the Eades-Lin-Smyth greedy heuristic for a small feedback arc set, weighing each pair of tables by its number of relationships.
+        Tables that reference no remaining table go last, tables no remaining table references go first, otherwise the table with the largest surplus of outgoing over incoming relationships goes first.
+        """
+        members = set(component)
+        out_edges: Dict[int, Dict[int, int]] = {i: {} for i in component}
+        in_edges: Dict[int, Dict[int, int]] = {i: {} for i in component}
+        for i in component:
+            for j, _ in edges[i]:
+                if j in members:
+                    out_edges[i][j] = out_edges[i].get(j, 0) + 1
+                    in_edges[j][i] = in_edges[j].get(i, 0) + 1
+        out_weight = {i: sum(out_edges[i].values()) for i in component}
+        in_weight = {i: sum(in_edges[i].values()) for i in component}
 
-        not_visited.remove(table)
-        visiting.add(table)
+        sinks: List[int] = []
+        sources: List[int] = []
+        surplus: List[Tuple[int, int]] = [(in_weight[i] - out_weight[i], i) for i in component]
+        heapq.heapify(surplus)
+        removed: Set[int] = set()
+        first: List[int] = []
+        last: List[int] = []
 
-        for r in table.relationships:
-            if self._has_cycle(r.referenced_table, not_visited, visiting, visited, cyclic_relationships, to_delete):
-                cyclic_relationships.add(r)
+        def remove(i: int) -> None:
+            removed.add(i)
+            for j, w in out_edges[i].items():
+                if j not in removed:
+                    in_weight[j] -= w
+                    if in_weight[j] == 0:
+                        heapq.heappush(sources, j)
+                    heapq.heappush(surplus, (in_weight[j] - out_weight[j], j))
+            for j, w in in_edges[i].items():
+                if j not in removed:
+                    out_weight[j] -= w
+                    if out_weight[j] == 0:
+                        heapq.heappush(sinks, j)
+                    heapq.heappush(surplus, (in_weight[j] - out_weight[j], j))
 
-        visiting.remove(table)
-        visited.add(table)
-        to_delete.put(table)
+        while len(removed) < len(component):
+            if len(sinks) > 0:
+                i = heapq.heappop(sinks)
+                if i not in removed:
+                    last.append(i)
+                    remove(i)
+            elif len(sources) > 0:
+                i = heapq.heappop(sources)
+                if i not in removed:
+                    first.append(i)
+                    remove(i)
+            else:
+                negative_surplus, i = heapq.heappop(surplus)
+                if i not in removed and negative_surplus == in_weight[i] - out_weight[i]:
+                    first.append(i)
+                    remove(i)
 
-        return False
+        last.reverse()
+        return first + last
 
 
 
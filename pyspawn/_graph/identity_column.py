@@ -0,0 +1,18 @@
+from dataclasses import dataclass
+
+
+@dataclass(frozen=True)
+class IdentityColumn:
+    """Identity (or serial) column resolved at plan build time, with the values needed to reseed it without catalog lookups at reset time."""
+    schema: str
+    table_name: str
+    column_name: str
+    seed_value: int
+    increment_value: int
+    sequence_name: str = None
+    owned_by_table: bool = True
+
+
+    def table_to_string(self) -> str:
+        """string implementations utilized for testning"""
+        return f"{self.schema}.{self.table_name}"
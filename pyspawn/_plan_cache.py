@@ -0,0 +1,54 @@
+import hashlib
+import json
+import os
+import tempfile
+from typing import List, Optional
+
+
+_PLAN_CACHE_VERSION = 5
+
+
+class PlanCache:
+    """PlanCache stores built reset plans in a local json file so that new processes can skip metadata introspection and graph building."""
+
+    def __init__(self, path: str):
+        self.path = path
+
+
+    @staticmethod
+    def build_key(parts: List) -> str:
+        """Returns a stable key for a list of json serializable key parts (checkpoint filters, adapter, schema fingerprint etc.)."""
+        payload = json.dumps([_PLAN_CACHE_VERSION] + parts, sort_keys=True, default=str)
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+    def get(self, key: str) -> Optional[dict]:
+        """Returns the cached plan for the key, or None if the plan is not cached (or the cache file is unreadable)."""
+        return self._read().get(key)
+
+
+    def put(self, key: str, plan: dict) -> None:
+        """Stores the plan under the key. The file is replaced atomically so that concurrent readers never see a partial write."""
+        entries = self._read()
+        entries[key] = plan
+        directory = os.path.dirname(os.path.abspath(self.path))
+        os.makedirs(directory, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=".pyspawn-plan-", suffix=".tmp")
+        try:
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                json.dump(entries, f)
+            os.replace(tmp_path, self.path)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+
+
+    def _read(self) -> dict:
+        """Reads all cache entries. A missing or corrupt cache file is treated as an empty cache."""
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                entries = json.load(f)
+        except (OSError, ValueError):
+            return {}
+        return entries if isinstance(entries, dict) else {}
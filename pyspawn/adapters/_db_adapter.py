@@ -7,11 +7,16 @@ if TYPE_CHECKING:
     from pyspawn import Checkpoint
     from pyspawn._graph.graph_builder import GraphBuilder
     from pyspawn._graph.table import Table
+    from pyspawn._graph.relationship import Relationship
+    from pyspawn._graph.identity_column import IdentityColumn
     from pyspawn._graph.temporal_table import TemporalTable
+    from pyspawn._graph.cost_planner import ResetPlan
 
 
 class DbAdapter(abc.ABC):
 
+    _pyspawn_schema = "pyspawn"
+
     @property
     def _quote_char(self):
         raise NotImplementedError
@@ -21,6 +26,11 @@ class DbAdapter(abc.ABC):
         """Returns a query that yields the database name from the server"""
         pass
 
+    @abc.abstractmethod
+    def get_schema_fingerprint_command_text(self) -> str:
+        """Returns a cheap query that yields a single value which changes whenever tables, foreign keys or identities are altered."""
+        pass
+
     @abc.abstractmethod
     def get_tables_command_text(self, checkpoint: "Checkpoint") -> str:
         """Build a query that selects out all schema- and table names for selected schemas and tables."""
@@ -37,13 +47,120 @@ class DbAdapter(abc.ABC):
         pass
 
     @abc.abstractmethod
-    def get_delete_command_text(self, graph: "GraphBuilder") -> str:
-        """Build a query that drops cyclical constraints (if any) and deletes tables in an order that does not violate foreign key constraints."""
+    def get_plan_metadata_command_text(self, checkpoint: "Checkpoint", include_temporal_tables: bool) -> str:
+        """Build a single query that selects out (kind, ...) rows for the plan build: ('database', name), ('table', schema, table),
+           ('relationship', child schema, child table, parent schema, parent table, foreign key name) and ('temporal_table', schema, table, history schema, history table)."""
+        pass
+
+    @abc.abstractmethod
+    def get_delete_command_text(self, graph: "GraphBuilder", tables_to_delete: List["Table"] = None, restart_identity: bool = False) -> str:
+        """Build a query that drops cyclical constraints (if any) and deletes tables in an order that does not violate foreign key constraints.
+           If tables_to_delete is given only those tables (in graph.to_delete order) are deleted. See truncate_restarts_identity() for restart_identity."""
+        pass
+
+    @abc.abstractmethod
+    def get_planned_delete_command_text(self, graph: "GraphBuilder", reset_plan: "ResetPlan", restart_identity: bool = False) -> str:
+        """Build a query that truncates the tables planned for TRUNCATE and then (batch) deletes the remaining tables in reset_plan (graph.to_delete) order."""
+        pass
+
+    @abc.abstractmethod
+    def get_row_estimates_command_text(self, tables: List["Table"]) -> str:
+        """Build a query that selects out schema, table, estimated row count from the catalog, whether the table can be truncated and whether truncating it resets its identity."""
+        pass
+
+    @abc.abstractmethod
+    def truncate_cascades(self) -> bool:
+        """Whether truncating a table also truncates the tables referencing it."""
+        pass
+
+    @abc.abstractmethod
+    def truncate_restarts_identity(self) -> bool:
+        """Whether the delete statements, given restart_identity = True, restart the sequences owned by the truncated tables in the same statement, so those need no reseed."""
+        pass
+
+    @abc.abstractmethod
+    def supports_batched_delete(self) -> bool:
+        """Whether get_planned_delete_command_text can delete a table in batches that each commit on their own, so the cost planner may plan BATCHED_DELETE."""
+        pass
+
+    @abc.abstractmethod
+    def get_disable_cyclic_constraints_command_text(self, cyclic_relationships: List["Relationship"]) -> str:
+        """Build a query that turns off foreign key checking for the parent tables of cyclical relationships."""
+        pass
+
+    @abc.abstractmethod
+    def get_enable_cyclic_constraints_command_text(self, cyclic_relationships: List["Relationship"]) -> str:
+        """Build a query that turns foreign key checking back on for the parent tables of cyclical relationships."""
+        pass
+
+    @abc.abstractmethod
+    def get_delete_tables_command_text(self, tables_to_delete: List["Table"], restart_identity: bool = False) -> str:
+        """Build a query that deletes the tables, in the given order, without any handling of cyclical constraints."""
+        pass
+
+    @abc.abstractmethod
+    def get_reset_command_text(self, temporal_tables: List["TemporalTable"], delete_cmd_txt: str, reseed_cmd_txt: str) -> str:
+        """Build a single batch that turns off system versioning (if any temporal tables), deletes, reseeds and turns system versioning back on."""
+        pass
+
+    @abc.abstractmethod
+    def get_create_reset_procedure_command_text(self, procedure_name: str, reset_cmd_txt: str) -> str:
+        """Build a query that compiles the reset batch into a server side procedure (if it does not already exist)."""
+        pass
+
+    @abc.abstractmethod
+    def get_drop_reset_procedure_command_text(self, procedure_name: str) -> str:
+        """Build a query that drops a server side reset procedure superseded by a changed plan (if it still exists)."""
+        pass
+
+    @abc.abstractmethod
+    def get_execute_reset_procedure_command_text(self, procedure_name: str) -> str:
+        """Build a query that executes the server side reset procedure."""
+        pass
+
+    @abc.abstractmethod
+    def get_install_dirty_tracking_command_text(self, tables: List["Table"]) -> str:
+        """Build a query that creates the dirty table tracking table and a statement level trigger on every table that records writes to it."""
         pass
 
     @abc.abstractmethod
-    def get_reseed_command_text(self, tables_to_reset: List["Table"]) -> str:
-        """Build a query that turns off system versioning for system versioned temporal tables."""
+    def get_dirty_tables_command_text(self) -> str:
+        """Build a query that selects out the schema- and table names of all tables written to since the tracking table was last cleared."""
+        pass
+
+    @abc.abstractmethod
+    def get_clear_dirty_tables_command_text(self) -> str:
+        """Build a query that clears the dirty table tracking table."""
+        pass
+
+    @abc.abstractmethod
+    def get_begin_savepoint_command_text(self) -> str:
+        """Build a query that (on a connection with autocommit = False) makes sure a transaction is open and sets the pyspawn savepoint in it."""
+        pass
+
+    @abc.abstractmethod
+    def get_rollback_to_savepoint_command_text(self) -> str:
+        """Build a query that rolls the open transaction back to the pyspawn savepoint, keeping the transaction and the savepoint."""
+        pass
+
+    @abc.abstractmethod
+    def get_transaction_id_command_text(self) -> str:
+        """Build a query that selects out the id of the current transaction, used to detect a commit since the savepoint was set."""
+        pass
+
+    @abc.abstractmethod
+    def get_non_empty_tables_command_text(self, tables: List["Table"]) -> str:
+        """Build a single query that selects out the schema- and table names of the tables that have any rows."""
+        pass
+
+    @abc.abstractmethod
+    def get_identity_columns_command_text(self, tables: List["Table"]) -> str:
+        """Build a query that selects out schema, table, column, seed value, increment value, sequence name (if any) and whether the sequence is owned by the table for the identity columns of the tables."""
+        pass
+
+    @abc.abstractmethod
+    def get_reseed_identity_columns_command_text(self, identity_columns: List["IdentityColumn"]) -> str:
+        """Build a query that reseeds the identity columns resolved at plan build time, without looking them up in the catalog."""
         pass
 
     @abc.abstractmethod
@@ -55,6 +172,46 @@ class DbAdapter(abc.ABC):
         """Build a query that turns on system versioning for system versioned temporal tables."""
         pass
 
+    @abc.abstractmethod
+    def uses_database_restore(self) -> bool:
+        """Indicate if the DBAdapter resets by restoring a captured clean copy of the database instead of deleting from tables."""
+        pass
+
+    @abc.abstractmethod
+    def get_capture_database_command_texts(self, database_name: str) -> List[str]:
+        """Build the statements, executed one by one on a maintenance connection, that capture a clean copy of the database."""
+        pass
+
+    @abc.abstractmethod
+    def get_restore_database_command_texts(self, database_name: str) -> List[str]:
+        """Build the statements, executed one by one on a maintenance connection, that restore the database from the captured copy."""
+        pass
+
+    @abc.abstractmethod
+    def stores_baseline_in_files(self) -> bool:
+        """Indicate if the contents of baseline tables are copied out to local files (with the drivers COPY support) instead of into baseline tables on the server."""
+        pass
+
+    @abc.abstractmethod
+    def get_capture_baseline_command_text(self, table: "Table") -> str:
+        """Build the statement that copies out the contents of the table: to STDOUT if stores_baseline_in_files, else into a baseline table in the pyspawn schema."""
+        pass
+
+    @abc.abstractmethod
+    def get_restore_baseline_command_text(self, table: "Table") -> str:
+        """Build the statement that bulk loads the captured contents back into the (empty) table: from STDIN if stores_baseline_in_files."""
+        pass
+
+    @abc.abstractmethod
+    def get_sync_identity_columns_command_text(self, identity_columns: List["IdentityColumn"]) -> str:
+        """Build a query that moves the identity columns past the highest value in their tables (i.e. loaded by a baseline restore, or kept by a rollback to a savepoint). Empty tables are left alone."""
+        pass
+
+    @abc.abstractmethod
+    def get_baseline_checksums_command_text(self, tables: List["Table"]) -> str:
+        """Build a single query that selects out schema, table and a checksum of the contents for each of the tables."""
+        pass
+
     @abc.abstractmethod
     def supports_temporal_tables(self) -> bool:
         """Indicate if the DBAdapter supports temporal tables."""
@@ -1,49 +1,93 @@
-from typing import List
+from typing import Any, Callable, Dict, List
 from typing import TYPE_CHECKING
 if TYPE_CHECKING:
     from pyspawn._graph.graph_builder import GraphBuilder
     from pyspawn._graph.temporal_table import TemporalTable
     from pyspawn._graph.table import Table
+    from pyspawn._graph.relationship import Relationship
+    from pyspawn._graph.identity_column import IdentityColumn
+    from pyspawn._graph.cost_planner import ResetPlan
     from pyspawn import Checkpoint
 from pyspawn.adapters._db_adapter import DbAdapter
+from pyspawn._graph.cost_planner import TRUNCATE
 
 class PgAdapter(DbAdapter):
     _quote_char = '"'
 
 
-    def __init__(self):
+    def __init__(self, use_template_database: bool = False, maintenance_conn_factory: Callable[[], Any] = None):
+        """
+        With use_template_database = True the clean database is captured once as a template database, and every following reset drops
+        the database and re-creates it from the template. The template is captured after the first reset emptied the tables, so only seeded
+        data in tables the checkpoint ignores (tables_to_ignore) or restores (baseline_tables) is part of it. maintenance_conn_factory must then return an autocommit connection to another
+        database on the same server (i.e. "postgres"), as a database can't be dropped or cloned while connected to it.
+        """
         super().__init__()
+        if use_template_database and maintenance_conn_factory is None:
+            raise ValueError("maintenance_conn_factory is required when use_template_database = True")
+        self.use_template_database = use_template_database
+        self.maintenance_conn_factory = maintenance_conn_factory
 
 
     def get_database_name_command_text(self) -> str:
         return "SELECT current_database()"
 
 
+    def get_schema_fingerprint_command_text(self) -> str:
+        """
+        Returns a query that hashes the pg_catalog rows describing tables, sequences and foreign keys.
+        Row xmin is not used for pg_class as TRUNCATE assigns a new relfilenode (and thereby a new row version) on every reset.
+        Objects in the pyspawn schema (dirty tracking, compiled reset functions) are left out.
+        """
+        return f"""
+        SELECT md5(concat_ws('|',
+            (SELECT string_agg(c.oid::text || ':' || c.relname || ':' || c.relnamespace::text || ':' || c.relkind || ':' || c.relnatts::text, ',' ORDER BY c.oid)
+             FROM pg_class c
+             WHERE c.relkind IN ('r', 'p', 'S')
+             AND c.relpersistence <> 't'
+             AND c.relnamespace NOT IN (SELECT n.oid FROM pg_namespace n WHERE n.nspname = '{self._pyspawn_schema}')),
+            (SELECT string_agg(co.oid::text || ':' || co.conname || ':' || co.conrelid::text || ':' || co.confrelid::text, ',' ORDER BY co.oid)
+             FROM pg_constraint co
+             WHERE co.contype = 'f'
+             AND co.connamespace NOT IN (SELECT n.oid FROM pg_namespace n WHERE n.nspname = '{self._pyspawn_schema}'))
+        ))
+        """
+
+
     def get_tables_command_text(self, checkpoint: "Checkpoint") -> str:
-        """Build a query that selects out all schema- and table names for scoped schemas and tables."""
-        cmd_txt:str = """
+        """
+        Build a query that selects out all schema- and table names (and the table oid) for scoped schemas and tables.
+        Reads pg_class directly, as information_schema.tables checks privileges and resolves names per row and gets slow on catalogs with many relations.
+        Partitions are left out: a partitioned table is truncated, deleted and probed through its parent, which covers all of its partitions.
+        """
+        cmd_txt:str = f"""
                 select
-                       table_schema,
-                       table_name
-                from information_schema.tables
-                where table_type = 'BASE TABLE'
-                and table_schema not in('pg_catalog', 'information_schema')
+                       n.nspname table_schema,
+                       c.relname table_name,
+                       c.oid table_oid
+                from pg_catalog.pg_class c
+                inner join pg_catalog.pg_namespace n on n.oid = c.relnamespace
+                where c.relkind in ('r', 'p')
+                and not c.relispartition
+                and c.relpersistence <> 't'
+                and n.nspname not in('pg_catalog', 'information_schema', '{self._pyspawn_schema}')
+                and has_table_privilege(c.oid, 'SELECT, INSERT, UPDATE, DELETE, TRUNCATE, REFERENCES, TRIGGER')
                 """
         if len(checkpoint.tables_to_ignore) > 0:
             tables_to_ignore = ",".join(["'" + x + "'" for x in checkpoint.tables_to_ignore])
-            cmd_txt += f"and table_name not in ({tables_to_ignore})\n"
+            cmd_txt += f"and c.relname not in ({tables_to_ignore})\n"
 
         if len(checkpoint.tables_to_include) > 0:
             tables_to_include = ",".join(["'" + x + "'" for x in checkpoint.tables_to_include])
-            cmd_txt += f"and table_name in ({tables_to_include})\n"
+            cmd_txt += f"and c.relname in ({tables_to_include})\n"
 
         if len(checkpoint.schemas_to_ignore) > 0:
             schemas_to_ignore = ",".join(["'" + x + "'" for x in checkpoint.schemas_to_ignore])
-            cmd_txt += f"and table_schema not in ({schemas_to_ignore})\n"
+            cmd_txt += f"and n.nspname not in ({schemas_to_ignore})\n"
 
         if len(checkpoint.schemas_to_include) > 0:
             schemas_to_include = ",".join(["'" + x + "'" for x in checkpoint.schemas_to_include])
-            cmd_txt += f"and table_schema in ({schemas_to_include})\n"
+            cmd_txt += f"and n.nspname in ({schemas_to_include})\n"
         return cmd_txt
 
 
@@ -52,90 +96,320 @@ class PgAdapter(DbAdapter):
 
 
     def get_relationship_command_text(self, checkpoint: "Checkpoint") -> str:
-        """Build a query that selects out all ForeignKey (FK) to PrimaryKey (PK) relations for scoped schemas and tables."""
+        """
+        Build a query that selects out all ForeignKey (FK) to PrimaryKey (PK) relations for scoped schemas and tables from pg_constraint.
+        Foreign keys from or to a partition are attributed to the root of its partition tree, and the copies of a partitioned foreign key on each partition (conparentid <> 0) are skipped.
+        """
         cmd_txt:str = """
-        select 
-            tc.table_schema child_schema_name,  
-            tc.table_name child_table_name, 
-            ctu.table_schema parent_schema_name, 
-            ctu.table_name parent_table_name, 
-            rc.constraint_name foreign_key_name
-        from information_schema.referential_constraints rc
-        inner join information_schema.constraint_table_usage ctu ON ctu.constraint_name = rc.constraint_name
-        inner join information_schema.table_constraints tc ON tc.constraint_name = rc.constraint_name
-        where 1=1
+        select
+            cn.nspname child_schema_name,
+            cc.relname child_table_name,
+            pn.nspname parent_schema_name,
+            pc.relname parent_table_name,
+            co.conname foreign_key_name
+        from pg_catalog.pg_constraint co
+        inner join pg_catalog.pg_class cc on cc.oid = coalesce(pg_partition_root(co.conrelid), co.conrelid)
+        inner join pg_catalog.pg_namespace cn on cn.oid = cc.relnamespace
+        inner join pg_catalog.pg_class pc on pc.oid = coalesce(pg_partition_root(co.confrelid), co.confrelid)
+        inner join pg_catalog.pg_namespace pn on pn.oid = pc.relnamespace
+        where co.contype = 'f'
+        and co.conparentid = 0
         """
         if len(checkpoint.tables_to_ignore) > 0:
             tables_to_ignore = ",".join(["'" + x + "'" for x in checkpoint.tables_to_ignore])
-            cmd_txt += f"and ctu.table_name not in ({tables_to_ignore})\n"
+            cmd_txt += f"and pc.relname not in ({tables_to_ignore})\n"
 
         if len(checkpoint.tables_to_include) > 0:
             tables_to_include = ",".join(["'" + x + "'" for x in checkpoint.tables_to_include])
-            cmd_txt += f"and ctu.table_name in ({tables_to_include})\n"
+            cmd_txt += f"and pc.relname in ({tables_to_include})\n"
 
         if len(checkpoint.schemas_to_ignore) > 0:
             schemas_to_ignore = ",".join(["'" + x + "'" for x in checkpoint.schemas_to_ignore])
-            cmd_txt += f"and ctu.table_schema not in ({schemas_to_ignore})\n"
+            cmd_txt += f"and pn.nspname not in ({schemas_to_ignore})\n"
 
         if len(checkpoint.schemas_to_include) > 0:
             schemas_to_include = ",".join(["'" + x + "'" for x in checkpoint.schemas_to_include])
-            cmd_txt += f"and ctu.table_schema in ({schemas_to_include})\n"
+            cmd_txt += f"and pn.nspname in ({schemas_to_include})\n"
         return cmd_txt
 
 
-    def get_delete_command_text(self, graph: "GraphBuilder") -> str:
+    def get_plan_metadata_command_text(self, checkpoint: "Checkpoint", include_temporal_tables: bool) -> str:
+        """
+        Build a single query that selects out all metadata the plan is built from, one row per item with its kind in the first column:
+        the database name, the scoped tables and the foreign keys between them (attributed to partition roots, see get_relationship_command_text()). Postgres has no temporal tables.
+        """
+        cmd_txt:str = f"""
+        with scoped as ({self.get_tables_command_text(checkpoint)})
+        select 'database', current_database(), null::name, null::name, null::name, null::name
+        union all
+        select 'table', t.table_schema, t.table_name, null::name, null::name, null::name
+        from scoped t
+        union all
+        select 'relationship', ct.table_schema, ct.table_name, pt.table_schema, pt.table_name, co.conname
+        from pg_catalog.pg_constraint co
+        inner join scoped ct on ct.table_oid = coalesce(pg_partition_root(co.conrelid), co.conrelid)
+        inner join scoped pt on pt.table_oid = coalesce(pg_partition_root(co.confrelid), co.confrelid)
+        where co.contype = 'f'
+        and co.conparentid = 0
+        """
+        return cmd_txt
+
+
+    def get_delete_command_text(self, graph: "GraphBuilder", tables_to_delete: List["Table"] = None, restart_identity: bool = False) -> str:
         """Build a query that drops cyclical constraints (if any) and deletes tables in an order that does not violate foreign key constraints."""
-        cmd_txt = ""
+        tables_to_delete = graph.to_delete if tables_to_delete is None else tables_to_delete
+        cyclic_relationships = [r for r in graph.cyclic_relationships if r.parent_table in set(tables_to_delete)]
 
-        for r in graph.cyclic_relationships:
-            cmd_txt += f"ALTER TABLE {r.parent_table.get_full_name(self._quote_char)} DISABLE TRIGGER ALL;\n"
+        cmd_txt = self.get_disable_cyclic_constraints_command_text(cyclic_relationships)
+        cmd_txt += self.get_delete_tables_command_text(tables_to_delete, restart_identity)
+        cmd_txt += self.get_enable_cyclic_constraints_command_text(cyclic_relationships)
+        return cmd_txt
 
-        if len(graph.to_delete) > 0:
-            all_tables:List[str] = ",".join([t.get_full_name(self._quote_char) for t in graph.to_delete])
-            cmd_txt += f"truncate table {all_tables} cascade\n;"
 
-        for r in graph.cyclic_relationships:
-            cmd_txt += f"ALTER TABLE {r.parent_table.get_full_name(self._quote_char)} ENABLE TRIGGER ALL;\n"
+    def get_planned_delete_command_text(self, graph: "GraphBuilder", reset_plan: "ResetPlan", restart_identity: bool = False) -> str:
+        """Build a query that truncates the tables planned for TRUNCATE in one statement and then deletes the remaining tables."""
+        tables_to_delete = [t.table for t in reset_plan.tables if t.strategy != TRUNCATE]
+        cyclic_relationships = [r for r in graph.cyclic_relationships if r.parent_table in set(tables_to_delete)]
 
+        cmd_txt = self.get_delete_tables_command_text(reset_plan.get_tables(TRUNCATE), restart_identity)
+        cmd_txt += self.get_disable_cyclic_constraints_command_text(cyclic_relationships)
+        for t in reset_plan.tables:
+            if t.strategy != TRUNCATE:
+                cmd_txt += f"delete from {t.table.get_full_name(self._quote_char)};\n"
+        cmd_txt += self.get_enable_cyclic_constraints_command_text(cyclic_relationships)
         return cmd_txt
 
 
-    def get_reseed_command_text(self, tables_to_reset: List["Table"]) -> str:
+    def get_row_estimates_command_text(self, tables: List["Table"]) -> str:
         """
-        Postgres has two sequence types, the "identity" column *type* and the serial *pseudo-type*.
-        In the case of serial, some behind-the-scenes work is done to create a column of type int or
-        bigint and then place a generated sequence behind it. Since both can be reseeded we can check
-        for both, within the constraints of the tables the user wants to reset.
-        This more complex implementation accommodates use cases where the user may have renamed their
-        sequences in a manner where a regex parse would fail.
+        Build a query that selects out schema, table, estimated row count, whether the table can be truncated and whether truncating it resets its identity.
+        Like the planner, the row density from the last analyze (reltuples / relpages) is scaled to the current size of the table, since reltuples alone goes stale between analyzes.
+        Tables that were never analyzed are estimated at 100 rows per page, and a partitioned table is estimated as the sum of its leaf partitions.
+        Every table can be truncated (with cascade) and truncate does not restart sequences.
         """
-        table_names:List[str] = ",".join(["'" + x.get_full_name(self._quote_char) + "'" for x in tables_to_reset])
-        cmd_txt:str = f"""
-        CREATE OR REPLACE FUNCTION pg_temp.reset_sequence(seq text, start_val int, increment_val int) RETURNS void AS $$
-        DECLARE
+        table_names:List[str] = ",".join(["'" + self._escape_literal(x.get_full_name(self._quote_char)) + "'" for x in tables])
+        return f"""
+        SELECT
+            n.nspname,
+            c.relname,
+            (SELECT coalesce(sum(CASE
+                WHEN l.reltuples > 0 AND l.relpages > 0 THEN l.reltuples / l.relpages * (pg_relation_size(l.oid) / current_setting('block_size')::int)
+                ELSE (pg_relation_size(l.oid) / current_setting('block_size')::int) * 100
+            END), 0)
+            FROM pg_class l
+            WHERE l.oid = c.oid
+            OR l.oid IN (SELECT pt.relid FROM pg_partition_tree(c.oid) pt WHERE pt.isleaf))::bigint AS estimated_rows,
+            true AS can_truncate,
+            false AS truncate_resets_identity
+        FROM pg_class c
+        JOIN pg_namespace n ON n.oid = c.relnamespace
+        WHERE c.relkind IN ('r', 'p')
+        AND '"' || n.nspname || '"."' || c.relname || '"' IN ({table_names})
+        """
+
+
+    def truncate_cascades(self) -> bool:
+        return True
+
+
+    def truncate_restarts_identity(self) -> bool:
+        """TRUNCATE ... RESTART IDENTITY restarts the sequences owned by the truncated (and cascaded) tables."""
+        return True
+
+
+    def supports_batched_delete(self) -> bool:
+        """
+        A loop in a DO block runs in a single transaction, so it doesn't bound locks or WAL per batch, and each batch rescans the heap past the dead tuples of the batches before it.
+        Every table can be truncated on Postgres anyway, so tables that are not truncated are deleted in one statement.
+        """
+        return False
+
+
+    def get_disable_cyclic_constraints_command_text(self, cyclic_relationships: List["Relationship"]) -> str:
+        """Nothing to turn off: tables are emptied with TRUNCATE ... CASCADE, which empties cyclical relationships without disabling any constraint."""
+        return ""
+
+
+    def get_enable_cyclic_constraints_command_text(self, cyclic_relationships: List["Relationship"]) -> str:
+        """Nothing to turn back on, see get_disable_cyclic_constraints_command_text()."""
+        return ""
+
+
+    def get_delete_tables_command_text(self, tables_to_delete: List["Table"], restart_identity: bool = False) -> str:
+        """Build a query that deletes the tables, in the given order, without any handling of cyclical constraints. With restart_identity their owned sequences are restarted in the same statement."""
+        if len(tables_to_delete) == 0:
+            return ""
+        all_tables:List[str] = ",".join([t.get_full_name(self._quote_char) for t in tables_to_delete])
+        restart = " restart identity" if restart_identity else ""
+        return f"truncate table {all_tables}{restart} cascade\n;"
+
+
+    def get_reset_command_text(self, temporal_tables: List["TemporalTable"], delete_cmd_txt: str, reseed_cmd_txt: str) -> str:
+        """Build a single batch that deletes and reseeds the tables."""
+        if len(temporal_tables) > 0:
+            raise NotImplementedError("Temporal tables are not supported for Postgres")
+        return delete_cmd_txt + "\n" + (reseed_cmd_txt or "")
+
+
+    def get_create_reset_procedure_command_text(self, procedure_name: str, reset_cmd_txt: str) -> str:
+        """Build a query that compiles the reset batch into a sql function in the pyspawn schema. A sql (rather than plpgsql) function runs the batch as is, including the SELECT setval() of the reseed."""
+        schema = f"{self._quote_char}{self._pyspawn_schema}{self._quote_char}"
+        return f"""
+        CREATE SCHEMA IF NOT EXISTS {schema};
+        CREATE OR REPLACE FUNCTION {schema}.{self._quote_char}{procedure_name}{self._quote_char}() RETURNS void AS $pyspawn$
+        {reset_cmd_txt}
+        $pyspawn$ LANGUAGE sql;
+        """
+
+
+    def get_drop_reset_procedure_command_text(self, procedure_name: str) -> str:
+        """Build a query that drops the reset function."""
+        return f"DROP FUNCTION IF EXISTS {self._quote_char}{self._pyspawn_schema}{self._quote_char}.{self._quote_char}{procedure_name}{self._quote_char}();"
+
+
+    def get_execute_reset_procedure_command_text(self, procedure_name: str) -> str:
+        """Build a query that executes the reset function."""
+        return f"SELECT {self._quote_char}{self._pyspawn_schema}{self._quote_char}.{self._quote_char}{procedure_name}{self._quote_char}()"
+
+
+    def get_install_dirty_tracking_command_text(self, tables: List["Table"]) -> str:
+        """
+        Build a query that creates the dirty table tracking table and a statement level trigger on every table that records writes (and truncates) to it.
+        Statement triggers on a partitioned table only fire for statements against the parent, so every partition gets a trigger too that records the partitioned table as dirty.
+        The tracking table is a heap without a unique key written with plain inserts, so a connection writing to a table never waits for another (uncommitted) transaction
+        that recorded the same table, i.e. the transaction held open by Checkpoint.begin().
+        """
+        schema = f"{self._quote_char}{self._pyspawn_schema}{self._quote_char}"
+        cmd_txt = f"""
+        CREATE SCHEMA IF NOT EXISTS {schema};
+        CREATE TABLE IF NOT EXISTS {schema}."dirty_tables"
+        (
+            table_schema text NOT NULL,
+            table_name text NOT NULL
+        );
+        ALTER TABLE {schema}."dirty_tables" DROP CONSTRAINT IF EXISTS "dirty_tables_pkey";
+        CREATE OR REPLACE FUNCTION {schema}."track_dirty_table"() RETURNS trigger AS $$
         BEGIN
-            /* ALTER SEQUENCE doesn't work with variables, so we construct a statement and execute that instead. */
-            EXECUTE 'alter sequence ' || seq || ' restart with ' || start_val || ' increment ' || increment_val;
+            INSERT INTO {schema}."dirty_tables" (table_schema, table_name) VALUES (coalesce(TG_ARGV[0], TG_TABLE_SCHEMA), coalesce(TG_ARGV[1], TG_TABLE_NAME));
+            RETURN NULL;
         END;
         $$ LANGUAGE plpgsql;
-        
-        WITH all_sequences AS 
-        (
-            SELECT 
-                pg_get_serial_sequence(quote_ident(table_schema) || '.' || quote_ident(table_name), column_name) AS sequence_name,
-                is_identity,
-                --coalesce to handle sequences whom do not have start or increment values (fixed 1,1)
-                coalesce(identity_start, '1')::int start_val,
-                coalesce(identity_increment, '1')::int increment_val
-            FROM information_schema.columns
-            WHERE pg_get_serial_sequence(quote_ident(table_schema) || '.' || quote_ident(table_name), column_name) IS NOT NULL
-            AND  '"' || table_schema || '"."' || table_name || '"' IN ({table_names})
-        )
-        SELECT pg_temp.reset_sequence(s.sequence_name, s.start_val, s.increment_val) FROM all_sequences s;
+        """
+        for t in tables:
+            cmd_txt += f"DROP TRIGGER IF EXISTS pyspawn_track_dirty_table ON {t.get_full_name(self._quote_char)};\n"
+            cmd_txt += f"CREATE TRIGGER pyspawn_track_dirty_table AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE ON {t.get_full_name(self._quote_char)} FOR EACH STATEMENT EXECUTE FUNCTION {schema}.\"track_dirty_table\"();\n"
+        if len(tables) > 0:
+            table_names = ",".join([f"('{self._escape_literal(t.schema)}', '{self._escape_literal(t.table_name)}')" for t in tables])
+            cmd_txt += f"""
+        DO $pyspawn$
+        DECLARE p record;
+        BEGIN
+            FOR p IN SELECT pt.relid::regclass AS partition_name, t.table_schema, t.table_name
+                     FROM (VALUES {table_names}) t(table_schema, table_name)
+                     CROSS JOIN LATERAL pg_partition_tree(format('%I.%I', t.table_schema, t.table_name)::regclass) pt
+                     WHERE pt.level > 0
+            LOOP
+                EXECUTE format('DROP TRIGGER IF EXISTS pyspawn_track_dirty_table ON %s', p.partition_name);
+                EXECUTE format('CREATE TRIGGER pyspawn_track_dirty_table AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE ON %s FOR EACH STATEMENT EXECUTE FUNCTION {schema}."track_dirty_table"(%L, %L)', p.partition_name, p.table_schema, p.table_name);
+            END LOOP;
+        END
+        $pyspawn$;
         """
         return cmd_txt
 
 
+    def get_dirty_tables_command_text(self) -> str:
+        """Build a query that selects out the schema- and table names of all tables written to since the tracking table was last cleared."""
+        return f'select distinct table_schema, table_name from {self._quote_char}{self._pyspawn_schema}{self._quote_char}."dirty_tables"'
+
+
+    def get_clear_dirty_tables_command_text(self) -> str:
+        """Build a query that clears the dirty table tracking table."""
+        return f'delete from {self._quote_char}{self._pyspawn_schema}{self._quote_char}."dirty_tables";'
+
+
+    def get_begin_savepoint_command_text(self) -> str:
+        """psycopg2 opens the transaction with the first statement when autocommit = False."""
+        return f"SAVEPOINT {self._pyspawn_schema};"
+
+
+    def get_rollback_to_savepoint_command_text(self) -> str:
+        return f"ROLLBACK TO SAVEPOINT {self._pyspawn_schema};"
+
+
+    def get_transaction_id_command_text(self) -> str:
+        return "SELECT txid_current()"
+
+
+    def get_non_empty_tables_command_text(self, tables: List["Table"]) -> str:
+        """
+        Build a single query that selects out the schema- and table names of the tables that have any rows.
+        Tables without any pages on disk (i.e. truncated) are empty without scanning them, the rest are verified with EXISTS.
+        A partitioned table has no storage of its own, so the pages of all its partitions (pg_partition_tree) are summed up instead.
+        """
+        probes: List[str] = []
+        for t in tables:
+            regclass = f"'{self._escape_literal(t.get_full_name(self._quote_char))}'::regclass"
+            relation_size = f"coalesce((SELECT sum(pg_relation_size(pt.relid)) FROM pg_partition_tree({regclass}) pt), pg_relation_size({regclass}))"
+            probes.append(f"""SELECT '{self._escape_literal(t.schema)}', '{self._escape_literal(t.table_name)}' WHERE CASE WHEN {relation_size} = 0 THEN false ELSE EXISTS (SELECT 1 FROM {t.get_full_name(self._quote_char)}) END""")
+        cmd_txt = "\nUNION ALL\n".join(probes)
+        return cmd_txt
+
+
+    def get_identity_columns_command_text(self, tables: List["Table"]) -> str:
+        """
+        Build a query that selects out identity and serial columns with their start value, increment, sequence and whether the sequence is owned by the table.
+        Postgres has two sequence types, the "identity" column *type* and the serial *pseudo-type*.
+        In the case of serial, some behind-the-scenes work is done to create a column of type int or
+        bigint and then place a generated sequence behind it. Both own their sequence (pg_depend 'a' / 'i'), which
+        also accommodates sequences renamed in a manner where a regex parse would fail. Columns defaulting to nextval()
+        of a sequence that is not owned by the table (shared or hand made sequences) are found through the dependency of the column default.
+        """
+        table_names:List[str] = ",".join(["'" + self._escape_literal(x.get_full_name(self._quote_char)) + "'" for x in tables])
+        return f"""
+        WITH column_sequences AS (
+            SELECT d.refobjid AS table_oid, d.refobjsubid AS column_number, d.objid AS sequence_oid, true AS owned_by_table
+            FROM pg_depend d
+            WHERE d.classid = 'pg_class'::regclass
+            AND d.refclassid = 'pg_class'::regclass
+            AND d.refobjsubid > 0
+            AND d.deptype IN ('a', 'i')
+            UNION
+            SELECT ad.adrelid, ad.adnum, d.refobjid, false
+            FROM pg_attrdef ad
+            JOIN pg_depend d ON d.classid = 'pg_attrdef'::regclass AND d.objid = ad.oid AND d.refclassid = 'pg_class'::regclass
+            WHERE NOT EXISTS (
+                SELECT 1 FROM pg_depend o
+                WHERE o.classid = 'pg_class'::regclass AND o.objid = d.refobjid AND o.refobjid = ad.adrelid AND o.deptype IN ('a', 'i'))
+        )
+        SELECT
+            n.nspname,
+            c.relname,
+            a.attname,
+            sq.seqstart,
+            sq.seqincrement,
+            format('%I.%I', sn.nspname, s.relname) AS sequence_name,
+            cs.owned_by_table
+        FROM column_sequences cs
+        JOIN pg_sequence sq ON sq.seqrelid = cs.sequence_oid
+        JOIN pg_class s ON s.oid = cs.sequence_oid
+        JOIN pg_namespace sn ON sn.oid = s.relnamespace
+        JOIN pg_class c ON c.oid = cs.table_oid
+        JOIN pg_namespace n ON n.oid = c.relnamespace
+        JOIN pg_attribute a ON a.attrelid = cs.table_oid AND a.attnum = cs.column_number
+        WHERE '"' || n.nspname || '"."' || c.relname || '"' IN ({table_names})
+        """
+
+
+    def get_reseed_identity_columns_command_text(self, identity_columns: List["IdentityColumn"]) -> str:
+        """Build a single statement that sets the sequences resolved at plan build time back to their start value, so the next value is the start value. A sequence shared by several columns is set once."""
+        sequences = {i.sequence_name: i.seed_value for i in identity_columns}
+        if len(sequences) == 0:
+            return ""
+        setvals = ", ".join([f"setval('{self._escape_literal(name)}', {seed_value}, false)" for name, seed_value in sequences.items()])
+        return f"SELECT {setvals};\n"
+
+
     def build_turn_off_system_versioning_command_text(self, temporal_tables: List["TemporalTable"]) -> str:
         raise NotImplementedError("Temporal tables are not supported for Postgres")
 
@@ -144,8 +418,72 @@ class PgAdapter(DbAdapter):
         raise NotImplementedError("Temporal tables are not supported for Postgres")
 
 
+    def uses_database_restore(self) -> bool:
+        return self.use_template_database
+
+
+    def get_capture_database_command_texts(self, database_name: str) -> List[str]:
+        """Build the statements that (re)create the template database as a clone of the database. Cloning requires that nobody is connected to the source."""
+        template_name = self._get_template_database_name(database_name)
+        return [
+            f"SELECT pg_terminate_backend(pid) FROM pg_stat_activity WHERE datname IN ('{database_name}', '{template_name}') AND pid <> pg_backend_pid()",
+            f"DROP DATABASE IF EXISTS {self._quote_char}{template_name}{self._quote_char}",
+            f"CREATE DATABASE {self._quote_char}{template_name}{self._quote_char} TEMPLATE {self._quote_char}{database_name}{self._quote_char}",
+        ]
+
+
+    def get_restore_database_command_texts(self, database_name: str) -> List[str]:
+        """Build the statements that drop the database (evicting all connections) and re-create it from the template database."""
+        template_name = self._get_template_database_name(database_name)
+        return [
+            f"DROP DATABASE IF EXISTS {self._quote_char}{database_name}{self._quote_char} WITH (FORCE)",
+            f"CREATE DATABASE {self._quote_char}{database_name}{self._quote_char} TEMPLATE {self._quote_char}{template_name}{self._quote_char}",
+        ]
+
+
+    def _get_template_database_name(self, database_name: str) -> str:
+        """Name of the template database holding the clean copy of the database."""
+        return f"{database_name}_pyspawn_template"
+
+
+    def stores_baseline_in_files(self) -> bool:
+        return True
+
+
+    def get_capture_baseline_command_text(self, table: "Table") -> str:
+        """Build the COPY statement that streams the contents of the table in the binary format (generated columns are left out)."""
+        return f"COPY {table.get_full_name(self._quote_char)} TO STDOUT (FORMAT binary)"
+
+
+    def get_restore_baseline_command_text(self, table: "Table") -> str:
+        """Build the COPY statement that loads the binary contents into the table. COPY writes identity columns as is, also GENERATED ALWAYS ones."""
+        return f"COPY {table.get_full_name(self._quote_char)} FROM STDIN (FORMAT binary)"
+
+
+    def get_sync_identity_columns_command_text(self, identity_columns: List["IdentityColumn"]) -> str:
+        """Build a query that sets every sequence to the highest value loaded into the columns using it, so the next value doesn't collide. Empty columns leave the sequence alone."""
+        columns_by_sequence: Dict[str, List["IdentityColumn"]] = {}
+        for i in identity_columns:
+            columns_by_sequence.setdefault(i.sequence_name, []).append(i)
+
+        cmd_txt = ""
+        for sequence_name, columns in columns_by_sequence.items():
+            max_values = " UNION ALL ".join([f'SELECT max("{i.column_name}") v FROM "{i.schema}"."{i.table_name}"' for i in columns])
+            cmd_txt += f"SELECT setval('{self._escape_literal(sequence_name)}', max(m.v)) FROM ({max_values}) m HAVING max(m.v) IS NOT NULL;\n"
+        return cmd_txt
+
+
+    def get_baseline_checksums_command_text(self, tables: List["Table"]) -> str:
+        """Build a query that checksums every table as its row count and the sum of a 64 bit hash of each row, which doesn't depend on the physical row order."""
+        return "\nUNION ALL\n".join([
+            f"SELECT '{self._escape_literal(t.schema)}'::text, '{self._escape_literal(t.table_name)}'::text, count(*) || ':' || coalesce(sum(hashtextextended(r::text, 0)::numeric), 0) FROM {t.get_full_name(self._quote_char)} r"
+            for t in tables])
+
+
     def supports_temporal_tables(self) -> bool:
         return False
 
 
-
+    def _escape_literal(self, text: str) -> str:
+        """Escapes single quotes so the text can be embedded in a string literal."""
+        return text.replace("'", "''")
@@ -1,32 +1,63 @@
-from typing import List
+from typing import Any, Callable, List
 from typing import TYPE_CHECKING
 if TYPE_CHECKING:
     from pyspawn._graph.graph_builder import GraphBuilder
     from pyspawn._graph.temporal_table import TemporalTable
     from pyspawn._graph.table import Table
+    from pyspawn._graph.relationship import Relationship
+    from pyspawn._graph.identity_column import IdentityColumn
+    from pyspawn._graph.cost_planner import ResetPlan
     from pyspawn import Checkpoint
 from pyspawn.adapters._db_adapter import DbAdapter
+from pyspawn._graph.cost_planner import TRUNCATE, BATCHED_DELETE
 
 class SqlServerAdapter(DbAdapter):
     _quote_char = '"'
 
-    def __init__(self):
+    def __init__(self, use_database_snapshot: bool = False, maintenance_conn_factory: Callable[[], Any] = None):
+        """
+        With use_database_snapshot = True the clean database is captured once as a database snapshot, and every following reset
+        reverts the database to the snapshot. The snapshot is taken after the first reset emptied the tables, so only seeded data in tables
+        the checkpoint ignores (tables_to_ignore) or restores (baseline_tables) is part of it. maintenance_conn_factory must then return an autocommit connection to another
+        database on the same server (i.e. "master"), as a database can't be reverted while connected to it.
+        """
         super().__init__()
+        if use_database_snapshot and maintenance_conn_factory is None:
+            raise ValueError("maintenance_conn_factory is required when use_database_snapshot = True")
+        self.use_database_snapshot = use_database_snapshot
+        self.maintenance_conn_factory = maintenance_conn_factory
 
 
     def get_database_name_command_text(self) -> str:
         return "SELECT DB_NAME()"
 
 
+    def get_schema_fingerprint_command_text(self) -> str:
+        """
+        Returns a query that checksums the structure of tables, foreign keys, identity columns and temporal tables.
+        max(modify_date) from sys.objects is not used as it moves every time a reset runs NOCHECK CONSTRAINT or toggles SYSTEM_VERSIONING.
+        Objects in the pyspawn schema (dirty tracking, baseline tables) are left out.
+        """
+        return f"""
+        SELECT CONCAT(
+            (SELECT COUNT_BIG(*) FROM sys.objects o WHERE o.type IN ('U', 'F') AND o.schema_id <> ISNULL(SCHEMA_ID(N'{self._pyspawn_schema}'), -1)), '-',
+            (SELECT CHECKSUM_AGG(CHECKSUM(o.object_id, o.schema_id, o.parent_object_id, o.name, o.type)) FROM sys.objects o WHERE o.type IN ('U', 'F') AND o.schema_id <> ISNULL(SCHEMA_ID(N'{self._pyspawn_schema}'), -1)), '-',
+            (SELECT CHECKSUM_AGG(CHECKSUM(ic.object_id, ic.column_id, CONVERT(bigint, ic.seed_value), CONVERT(bigint, ic.increment_value))) FROM sys.identity_columns ic WHERE OBJECT_SCHEMA_NAME(ic.object_id) <> N'{self._pyspawn_schema}'), '-',
+            (SELECT CHECKSUM_AGG(CHECKSUM(t.object_id, t.temporal_type, t.history_table_id)) FROM sys.tables t WHERE t.temporal_type <> 0)
+        )
+        """
+
+
     def get_tables_command_text(self, checkpoint: "Checkpoint") -> str:
-        """Build a query that selects out all schema- and table names for scoped schemas and tables."""
-        cmd_txt = """
+        """Build a query that selects out all schema- and table names (and the table object_id) for scoped schemas and tables."""
+        cmd_txt = f"""
         select 
             s.name SchemaName
             , t.name TableName
+            , t.object_id ObjectId
         from sys.tables t
         INNER JOIN sys.schemas s ON t.schema_id = s.schema_id
-        WHERE 1=1
+        WHERE s.name <> '{self._pyspawn_schema}'
         """
         if len(checkpoint.tables_to_ignore) > 0:
             tables_to_ignore = ",".join(["'" + x + "'" for x in checkpoint.tables_to_ignore])
@@ -103,67 +134,304 @@ class SqlServerAdapter(DbAdapter):
 
 
 
-    def get_delete_command_text(self, graph: "GraphBuilder") -> str:
+    def get_plan_metadata_command_text(self, checkpoint: "Checkpoint", include_temporal_tables: bool) -> str:
+        """
+        Build a single query that selects out all metadata the plan is built from, one row per item with its kind in the first column:
+        the database name, the scoped tables, the foreign keys between them and (if include_temporal_tables) the temporal tables with their history tables.
+        """
+        cmd_txt = f"""
+        WITH scoped AS ({self.get_tables_command_text(checkpoint)})
+        SELECT 'database', DB_NAME(), NULL, NULL, NULL, NULL
+        UNION ALL
+        SELECT 'table', t.SchemaName, t.TableName, NULL, NULL, NULL
+        FROM scoped t
+        UNION ALL
+        SELECT 'relationship', ct.SchemaName, ct.TableName, pt.SchemaName, pt.TableName, sfk.name
+        FROM sys.foreign_keys sfk
+        INNER JOIN scoped ct ON ct.ObjectId = sfk.parent_object_id
+        INNER JOIN scoped pt ON pt.ObjectId = sfk.referenced_object_id
+        """
+        if include_temporal_tables:
+            cmd_txt += f"""UNION ALL
+        SELECT 'temporal_table', v.SchemaName, v.TableName, v.HistoryTableSchema, v.HistoryTableName, NULL
+        FROM ({self.get_temporal_table_command_text(checkpoint)}) v
+        """
+        return cmd_txt
+
+
+
+    def get_delete_command_text(self, graph: "GraphBuilder", tables_to_delete: List["Table"] = None, restart_identity: bool = False) -> str:
         """Build a query that drops cyclical constraints (if any) and deletes tables in an order that does not violate foreign key constraints."""
+        tables_to_delete = graph.to_delete if tables_to_delete is None else tables_to_delete
+        cyclic_relationships = [r for r in graph.cyclic_relationships if r.parent_table in set(tables_to_delete)]
+
+        cmd_txt = self.get_disable_cyclic_constraints_command_text(cyclic_relationships)
+        cmd_txt += self.get_delete_tables_command_text(tables_to_delete)
+        cmd_txt += self.get_enable_cyclic_constraints_command_text(cyclic_relationships)
+        return cmd_txt
+
+
+
+    def get_planned_delete_command_text(self, graph: "GraphBuilder", reset_plan: "ResetPlan", restart_identity: bool = False) -> str:
+        """Build a query that truncates the tables planned for TRUNCATE (which have no inbound foreign keys) and then deletes the remaining tables, in batches of DELETE TOP where planned."""
+        tables_to_delete = [t.table for t in reset_plan.tables if t.strategy != TRUNCATE]
+        cyclic_relationships = [r for r in graph.cyclic_relationships if r.parent_table in set(tables_to_delete)]
+
         cmd_txt = ""
+        for t in reset_plan.get_tables(TRUNCATE):
+            cmd_txt += f"TRUNCATE TABLE {t.get_full_name(self._quote_char)};\n"
+        cmd_txt += self.get_disable_cyclic_constraints_command_text(cyclic_relationships)
+        for t in reset_plan.tables:
+            if t.strategy == BATCHED_DELETE:
+                cmd_txt += f"WHILE 1 = 1 BEGIN DELETE TOP ({reset_plan.batch_size}) {t.table.get_full_name(self._quote_char)}; IF @@ROWCOUNT < {reset_plan.batch_size} BREAK; END;\n"
+            elif t.strategy != TRUNCATE:
+                cmd_txt += self.get_delete_tables_command_text([t.table])
+        cmd_txt += self.get_enable_cyclic_constraints_command_text(cyclic_relationships)
+        return cmd_txt
+
+
+
+    def get_row_estimates_command_text(self, tables: List["Table"]) -> str:
+        """
+        Build a query that selects out schema, table, row count from sys.partitions, whether the table can be truncated and whether truncating it resets its identity.
+        Tables referenced by a foreign key (other than a self reference) or a schema bound object, and system versioned temporal tables and their history tables can not be truncated.
+        """
+        tables_to_estimate = "', '".join([self._escape_literal(x.to_string()) for x in tables])
+        return f"""
+        SELECT
+            s.name SchemaName
+            , t.name TableName
+            , ISNULL((SELECT SUM(p.rows) FROM sys.partitions p WHERE p.object_id = t.object_id AND p.index_id IN (0, 1)), 0) EstimatedRows
+            , CASE WHEN t.temporal_type = 0
+                AND NOT EXISTS (SELECT 1 FROM sys.foreign_keys fk WHERE fk.referenced_object_id = t.object_id AND fk.parent_object_id <> t.object_id)
+                AND NOT EXISTS (SELECT 1 FROM sys.sql_expression_dependencies d WHERE d.referenced_id = t.object_id AND d.is_schema_bound_reference = 1)
+                THEN 1 ELSE 0 END CanTruncate
+            , OBJECTPROPERTY(t.object_id, 'TableHasIdentity') TruncateResetsIdentity
+        FROM sys.tables t
+        INNER JOIN sys.schemas s ON t.schema_id = s.schema_id
+        WHERE s.name + '.' + t.name IN ('{tables_to_estimate}')
+        """
+
+
+
+    def truncate_cascades(self) -> bool:
+        return False
+
+
+
+    def truncate_restarts_identity(self) -> bool:
+        """TRUNCATE always resets identities on SQL Server, but tables that are deleted are not, so the reseed batch (a no-op for truncated tables) always runs."""
+        return False
 
-        for r in graph.cyclic_relationships:
-            cmd_txt  += f"ALTER TABLE {r.parent_table.get_full_name(self._quote_char)} NOCHECK CONSTRAINT ALL;\n"
-        
-        for t in graph.to_delete:
-            cmd_txt += f"DELETE {t.get_full_name(self._quote_char)}\n;"
 
-        for r in graph.cyclic_relationships:
-            cmd_txt  += f"ALTER TABLE {r.parent_table.get_full_name(self._quote_char)} WITH CHECK CHECK CONSTRAINT ALL;\n"
-       
+
+    def supports_batched_delete(self) -> bool:
+        """Every DELETE TOP of the batch loop is a statement of its own, which commits on its own on an autocommit connection."""
+        return True
+
+
+
+    def get_disable_cyclic_constraints_command_text(self, cyclic_relationships: List["Relationship"]) -> str:
+        """Build a query that turns off checking of the named foreign key constraints of cyclical relationships (the other constraints of the tables stay enabled)."""
+        cmd_txt = ""
+        for r in self._distinct_relationships(cyclic_relationships):
+            cmd_txt  += f"ALTER TABLE {r.parent_table.get_full_name(self._quote_char)} NOCHECK CONSTRAINT {self._quote_char}{r.relationship_name}{self._quote_char};\n"
         return cmd_txt
 
 
 
-    def get_reseed_command_text(self, tables_to_reset: List["Table"]) -> str:
-        """Build a query that reseeds identity columns for tables that are to be reset."""
-        tables_to_reset = "', '".join([x.to_string() for x in tables_to_reset])
+    def get_enable_cyclic_constraints_command_text(self, cyclic_relationships: List["Relationship"]) -> str:
+        """Build a query that turns checking of the named foreign key constraints of cyclical relationships back on, re-validating only those constraints so they stay trusted."""
+        cmd_txt = ""
+        for r in self._distinct_relationships(cyclic_relationships):
+            cmd_txt  += f"ALTER TABLE {r.parent_table.get_full_name(self._quote_char)} WITH CHECK CHECK CONSTRAINT {self._quote_char}{r.relationship_name}{self._quote_char};\n"
+        return cmd_txt
+
+
+
+    def get_delete_tables_command_text(self, tables_to_delete: List["Table"], restart_identity: bool = False) -> str:
+        """Build a query that deletes the tables, in the given order, without any handling of cyclical constraints."""
+        cmd_txt = ""
+        for t in tables_to_delete:
+            cmd_txt += f"DELETE {t.get_full_name(self._quote_char)}\n;"
+        return cmd_txt
+
+
+
+    def get_reset_command_text(self, temporal_tables: List["TemporalTable"], delete_cmd_txt: str, reseed_cmd_txt: str) -> str:
+        """
+        Build a single batch that turns off system versioning (if any temporal tables), deletes, reseeds and turns system versioning back on.
+        The delete and reseed statements run as dynamic sql so they are compiled after system versioning is turned off. If they fail,
+        system versioning is turned back on (for the tables where it is still off) in the CATCH block before the error is re-thrown.
+        """
+        cmd_txt = ""
+        for sub_cmd_txt in [delete_cmd_txt, reseed_cmd_txt]:
+            if sub_cmd_txt != "" and sub_cmd_txt != None:
+                cmd_txt += f"EXEC(N'{self._escape_literal(sub_cmd_txt)}');\n"
+
+        if len(temporal_tables) == 0:
+            return cmd_txt
+
+        restore_versioning_cmd_txt = ""
+        for t in temporal_tables:
+            restore_versioning_cmd_txt += f"IF OBJECTPROPERTY(OBJECT_ID(N'[{t.schema}].[{t.table_name}]'), 'TableTemporalType') = 0\n    "
+            restore_versioning_cmd_txt += self.build_turn_on_system_versioning_command_text([t])
+
+        return f"""
+        BEGIN TRY
+        {self.build_turn_off_system_versioning_command_text(temporal_tables)}
+        {cmd_txt}
+        {self.build_turn_on_system_versioning_command_text(temporal_tables)}
+        END TRY
+        BEGIN CATCH
+        {restore_versioning_cmd_txt}
+        THROW;
+        END CATCH
+        """
+
+
+
+    def get_create_reset_procedure_command_text(self, procedure_name: str, reset_cmd_txt: str) -> str:
+        """Build a query that compiles the reset batch into a stored procedure in the pyspawn schema (if it does not already exist)."""
+        procedure = f"[{self._pyspawn_schema}].[{procedure_name}]"
+        body = f"CREATE PROCEDURE {procedure} AS\nBEGIN\nSET NOCOUNT ON;\n{reset_cmd_txt}\nEND"
+        return f"""
+        IF SCHEMA_ID(N'{self._pyspawn_schema}') IS NULL EXEC(N'CREATE SCHEMA [{self._pyspawn_schema}]');
+        IF OBJECT_ID(N'{procedure}', N'P') IS NULL EXEC(N'{self._escape_literal(body)}');
+        """
+
+
+
+    def get_drop_reset_procedure_command_text(self, procedure_name: str) -> str:
+        """Build a query that drops the reset stored procedure."""
+        return f"DROP PROCEDURE IF EXISTS [{self._pyspawn_schema}].[{procedure_name}];"
+
+
+
+    def get_execute_reset_procedure_command_text(self, procedure_name: str) -> str:
+        """Build a query that executes the reset stored procedure."""
+        return f"EXEC [{self._pyspawn_schema}].[{procedure_name}];"
+
+
+
+    def get_install_dirty_tracking_command_text(self, tables: List["Table"]) -> str:
+        """
+        Build a query that creates the dirty table tracking table and a statement level trigger on every table that records writes to it.
+        History tables of system versioned temporal tables can't have triggers and are skipped; they are dirty whenever their temporal table is.
+        The tracking table is a heap without a unique key written with plain inserts, so a connection writing to a table never blocks on the row another (uncommitted)
+        transaction recorded for the same table, i.e. the transaction held open by Checkpoint.begin().
+        A table with an enabled trigger rejects DML with an OUTPUT clause without INTO (error 334), which ORMs emit to read back generated keys, see the README.
+        """
         cmd_txt = f"""
-        DECLARE @Schema sysname = N''                                                                                                     			
-        DECLARE @TableName sysname = N''                                                                                                  			
-        DECLARE @ColumnName sysname = N''                                                                                                 			
-        DECLARE @DoReseed sql_variant = 0																											
-        DECLARE @NewSeed bigint = 0                                                                                                       			
-        DECLARE @IdentityInitialSeedValue int = 0                                                                                                  
-        DECLARE @SQL nvarchar(4000) = N''                                                                                                 			
-                                                                                                                                                    
-        -- find all non-system tables and load into a cursor                                                                              			
-        DECLARE IdentityTables CURSOR FAST_FORWARD                                                                                        			
-        FOR                                                                                                                               			
-            SELECT  OBJECT_SCHEMA_NAME(t.object_id, db_id()) as schemaName,                                                                        
-                    t.name as tableName,                                                                                                           
-                    c.name as columnName,                                                                                                          
-                    ic.last_value,                                                                                                                 
-                    IDENT_SEED(OBJECT_SCHEMA_NAME(t.object_id, db_id()) + '.' + t.name) as identityInitialSeedValue                                
-            FROM sys.tables t 																										            
-            JOIN sys.columns c ON t.object_id=c.object_id      																                	
-            JOIN sys.identity_columns ic on ic.object_id = c.object_id  												                		
-            WHERE c.is_identity = 1                                                                                    				            
-            AND OBJECT_SCHEMA_NAME(t.object_id, db_id()) + '.' + t.name in ('{tables_to_reset}')                              
-        OPEN IdentityTables                                                                                                               			
-        FETCH NEXT FROM IdentityTables INTO @Schema, @TableName, @ColumnName, @DoReseed, @IdentityInitialSeedValue                                 
-        WHILE @@FETCH_STATUS = 0                                                                                                          			
-        BEGIN                                                                                                                         			
-        -- reseed the identity only on tables that actually have had a value, otherwise next value will be off-by-one   			            
-        -- https://stackoverflow.com/questions/472578/dbcc-checkident-sets-identity-to-0                                                      
-            if (@DoReseed is not null)                                                                                                         
-                SET @SQL = N'DBCC CHECKIDENT(''' +  @Schema + '.' + @TableName + ''', RESEED, ' + Convert(varchar(max), @IdentityInitialSeedValue - 1) + ')' 
-            else                                                                                                                               
-                SET @SQL = null	                                                                                                                
-            if (@sql is not null) EXECUTE (@SQL)  																								                                                                      
-            FETCH NEXT FROM IdentityTables INTO  @Schema, @TableName, @ColumnName  , @DoReseed, @IdentityInitialSeedValue                      
-        END                                                                                                                           			
-        DEALLOCATE IdentityTables
+        IF SCHEMA_ID(N'{self._pyspawn_schema}') IS NULL EXEC(N'CREATE SCHEMA [{self._pyspawn_schema}]');
+        IF OBJECT_ID(N'[{self._pyspawn_schema}].[dirty_tables]', N'U') IS NULL
+            CREATE TABLE [{self._pyspawn_schema}].[dirty_tables]
+            (
+                table_schema sysname NOT NULL,
+                table_name sysname NOT NULL
+            );
+        IF OBJECT_ID(N'[{self._pyspawn_schema}].[PK_pyspawn_dirty_tables]', N'PK') IS NOT NULL
+            ALTER TABLE [{self._pyspawn_schema}].[dirty_tables] DROP CONSTRAINT PK_pyspawn_dirty_tables;
+        """
+        for t in tables:
+            cmd_txt += f"""
+        IF (SELECT temporal_type FROM sys.tables WHERE object_id = OBJECT_ID(N'[{t.schema}].[{t.table_name}]')) <> 1
+            EXEC(N'CREATE OR ALTER TRIGGER [{t.schema}].[pyspawn_track_dirty_{t.table_name}] ON [{t.schema}].[{t.table_name}] AFTER INSERT, UPDATE, DELETE AS
+            BEGIN
+                IF @@ROWCOUNT = 0 RETURN;
+                SET NOCOUNT ON;
+                INSERT INTO [{self._pyspawn_schema}].[dirty_tables] (table_schema, table_name) VALUES (N''{t.schema}'', N''{t.table_name}'');
+            END');
+        """
+        return cmd_txt
+
+
+
+    def get_dirty_tables_command_text(self) -> str:
+        """Build a query that selects out the schema- and table names of all tables written to since the tracking table was last cleared."""
+        return f"SELECT DISTINCT table_schema, table_name FROM [{self._pyspawn_schema}].[dirty_tables]"
+
+
+
+    def get_clear_dirty_tables_command_text(self) -> str:
+        """Build a query that clears the dirty table tracking table."""
+        return f"DELETE [{self._pyspawn_schema}].[dirty_tables];"
+
+
+
+    def get_begin_savepoint_command_text(self) -> str:
+        """
+        With autocommit = False the ODBC driver runs in implicit transaction mode, where only statements like a SELECT from a table open the transaction.
+        An explicit BEGIN TRANSACTION would open a second, nested transaction that a commit of the connection does not commit, so it is only the fallback.
+        """
+        return f"""
+        IF @@TRANCOUNT = 0 SELECT TOP (0) 1 FROM sys.objects;
+        IF @@TRANCOUNT = 0 BEGIN TRANSACTION;
+        SAVE TRANSACTION {self._pyspawn_schema};
         """
+
+
+
+    def get_rollback_to_savepoint_command_text(self) -> str:
+        return f"ROLLBACK TRANSACTION {self._pyspawn_schema};"
+
+
+
+    def get_transaction_id_command_text(self) -> str:
+        return "SELECT CURRENT_TRANSACTION_ID()"
+
+
+
+    def get_non_empty_tables_command_text(self, tables: List["Table"]) -> str:
+        """Build a single query that selects out the schema- and table names of the tables that have any rows, probing each table with EXISTS."""
+        cmd_txt = "\nUNION ALL\n".join([f"SELECT N'{self._escape_literal(t.schema)}', N'{self._escape_literal(t.table_name)}' WHERE EXISTS (SELECT 1 FROM {t.get_full_name(self._quote_char)})" for t in tables])
         return cmd_txt
 
 
 
+    def get_identity_columns_command_text(self, tables: List["Table"]) -> str:
+        """Build a query that selects out identity columns with their seed- and increment values for the tables."""
+        tables_to_reset = "', '".join([x.to_string() for x in tables])
+        return f"""
+        SELECT
+            s.name SchemaName
+            , t.name TableName
+            , ic.name ColumnName
+            , CONVERT(bigint, ic.seed_value) SeedValue
+            , CONVERT(bigint, ic.increment_value) IncrementValue
+            , NULL SequenceName
+            , CONVERT(bit, 1) OwnedByTable
+        FROM sys.identity_columns ic
+        INNER JOIN sys.tables t ON ic.object_id = t.object_id
+        INNER JOIN sys.schemas s ON t.schema_id = s.schema_id
+        WHERE s.name + '.' + t.name IN ('{tables_to_reset}')
+        """
+
+
+
+    def get_reseed_identity_columns_command_text(self, identity_columns: List["IdentityColumn"]) -> str:
+        """
+        Build a single set based batch that reseeds the identity columns resolved at plan build time to seed - increment, so the next value is the seed.
+        Only identities that actually moved are reseeded: tables that never had a value are skipped (reseeding those makes the next value off-by-one,
+        https://stackoverflow.com/questions/472578/dbcc-checkident-sets-identity-to-0) and so are tables already at the reseed value.
+        """
+        if len(identity_columns) == 0:
+            return ""
+        values = ",\n            ".join([f"(N'[{self._escape_literal(i.schema)}].[{self._escape_literal(i.table_name)}]', {i.seed_value - i.increment_value})" for i in identity_columns])
+        return f"""
+        DECLARE @SQL nvarchar(max) = N'';
+        SELECT @SQL = @SQL + N'DBCC CHECKIDENT(' + QUOTENAME(v.TableName, N'''') + N', RESEED, ' + CONVERT(nvarchar(40), v.ReseedValue) + N') WITH NO_INFOMSGS;'
+        FROM (VALUES
+            {values}
+        ) v(TableName, ReseedValue)
+        INNER JOIN sys.identity_columns ic ON ic.object_id = OBJECT_ID(v.TableName)
+        WHERE ic.last_value IS NOT NULL
+        AND IDENT_CURRENT(v.TableName) <> v.ReseedValue;
+        IF @SQL <> N'' EXEC(@SQL);
+        """
+
+
+
     def build_turn_off_system_versioning_command_text(self, temporal_tables: List["TemporalTable"]) -> str:
         """Build a query that turns off system versioning for system versioned temporal tables."""
         cmd_txt = ""
@@ -182,6 +450,161 @@ class SqlServerAdapter(DbAdapter):
 
 
 
+    def uses_database_restore(self) -> bool:
+        """Indicate if the DBAdapter resets by restoring a captured clean copy of the database instead of deleting from tables."""
+        return self.use_database_snapshot
+
+
+
+    def get_capture_database_command_texts(self, database_name: str) -> List[str]:
+        """
+        Build the statements that (re)create the snapshot of the database. A snapshot needs one sparse file per data file of the
+        source, so the CREATE DATABASE statement is built from sys.master_files and the sparse files are placed next to the data files.
+        """
+        snapshot_name = self._get_snapshot_database_name(database_name)
+        return [
+            f"IF DB_ID(N'{self._escape_literal(snapshot_name)}') IS NOT NULL DROP DATABASE [{snapshot_name}]",
+            f"""
+            DECLARE @Files nvarchar(max);
+            SELECT @Files = STRING_AGG(CAST(N'(NAME = ' + QUOTENAME(name) + N', FILENAME = ' + QUOTENAME(physical_name + N'.pyspawn_snapshot', N'''') + N')' AS nvarchar(max)), N', ')
+            FROM sys.master_files
+            WHERE database_id = DB_ID(N'{self._escape_literal(database_name)}')
+            AND type = 0;
+            EXEC(N'CREATE DATABASE [{snapshot_name}] ON ' + @Files + N' AS SNAPSHOT OF [{database_name}]');
+            """,
+        ]
+
+
+
+    def get_restore_database_command_texts(self, database_name: str) -> List[str]:
+        """
+        Build the statements that evict all connections to the database and revert it to the snapshot.
+        The database is put back in multi-user mode also when the revert fails, so a failed reset doesn't lock out the tests.
+        """
+        snapshot_name = self._get_snapshot_database_name(database_name)
+        return [
+            f"""
+            ALTER DATABASE [{database_name}] SET SINGLE_USER WITH ROLLBACK IMMEDIATE;
+            BEGIN TRY
+                RESTORE DATABASE [{database_name}] FROM DATABASE_SNAPSHOT = N'{self._escape_literal(snapshot_name)}';
+            END TRY
+            BEGIN CATCH
+                ALTER DATABASE [{database_name}] SET MULTI_USER;
+                THROW;
+            END CATCH;
+            ALTER DATABASE [{database_name}] SET MULTI_USER;
+            """,
+        ]
+
+
+
+    def _get_snapshot_database_name(self, database_name: str) -> str:
+        """Name of the database snapshot holding the clean copy of the database."""
+        return f"{database_name}_pyspawn_snapshot"
+
+
+
+    def stores_baseline_in_files(self) -> bool:
+        return False
+
+
+
+    def get_capture_baseline_command_text(self, table: "Table") -> str:
+        """
+        Build a batch that copies the contents of the table into a baseline table in the pyspawn schema. The baseline stays on the server,
+        as pyodbc has no bulk copy API and bcp would need the connection details in a separate process. SELECT INTO is minimally logged.
+        """
+        baseline_table = self._get_baseline_table_name(table)
+        return f"""
+        IF SCHEMA_ID(N'{self._pyspawn_schema}') IS NULL EXEC(N'CREATE SCHEMA [{self._pyspawn_schema}]');
+        DROP TABLE IF EXISTS {baseline_table};
+        SELECT * INTO {baseline_table} FROM [{table.schema}].[{table.table_name}];
+        """
+
+
+
+    def get_restore_baseline_command_text(self, table: "Table") -> str:
+        """
+        Build a batch that loads the baseline table back into the table with a single INSERT ... WITH (TABLOCK) ... SELECT, which is minimally logged into an empty table.
+        Computed, rowversion and temporal period columns are left out, identity values are kept with IDENTITY_INSERT.
+        """
+        table_name = f"[{table.schema}].[{table.table_name}]"
+        return f"""
+        DECLARE @Columns nvarchar(max) = (
+            SELECT STRING_AGG(CAST(QUOTENAME(c.name) AS nvarchar(max)), N', ') WITHIN GROUP (ORDER BY c.column_id)
+            FROM sys.columns c
+            WHERE c.object_id = OBJECT_ID(N'{self._escape_literal(table_name)}')
+            AND c.is_computed = 0
+            AND c.generated_always_type = 0
+            AND c.system_type_id <> 189
+        );
+        DECLARE @SQL nvarchar(max) = N'INSERT INTO {self._escape_literal(table_name)} WITH (TABLOCK) (' + @Columns + N') SELECT ' + @Columns + N' FROM {self._escape_literal(self._get_baseline_table_name(table))};';
+        IF OBJECTPROPERTY(OBJECT_ID(N'{self._escape_literal(table_name)}'), 'TableHasIdentity') = 1
+            SET @SQL = N'SET IDENTITY_INSERT {self._escape_literal(table_name)} ON; ' + @SQL + N' SET IDENTITY_INSERT {self._escape_literal(table_name)} OFF;';
+        EXEC(@SQL);
+        """
+
+
+
+    def get_sync_identity_columns_command_text(self, identity_columns: List["IdentityColumn"]) -> str:
+        """
+        Build a single batch that moves the identity columns up to the highest value in their tables with DBCC CHECKIDENT(table, RESEED), which never lowers an identity.
+        After a baseline restore this changes nothing (an explicit value inserted with IDENTITY_INSERT already becomes the current identity value), but after a rollback
+        to a savepoint the identities were reseeded below the rows the rollback kept. Tables that never had a value are skipped, as when reseeding.
+        """
+        if len(identity_columns) == 0:
+            return ""
+        table_names = sorted(set([f"[{self._escape_literal(i.schema)}].[{self._escape_literal(i.table_name)}]" for i in identity_columns]))
+        values = ",\n            ".join([f"(N'{t}')" for t in table_names])
+        return f"""
+        DECLARE @SQL nvarchar(max) = N'';
+        SELECT @SQL = @SQL + N'DBCC CHECKIDENT(' + QUOTENAME(v.TableName, N'''') + N', RESEED) WITH NO_INFOMSGS;'
+        FROM (VALUES
+            {values}
+        ) v(TableName)
+        INNER JOIN sys.identity_columns ic ON ic.object_id = OBJECT_ID(v.TableName)
+        WHERE ic.last_value IS NOT NULL;
+        IF @SQL <> N'' EXEC(@SQL);
+        """
+
+
+
+    def get_baseline_checksums_command_text(self, tables: List["Table"]) -> str:
+        """
+        Build a query that checksums every table as its row count and CHECKSUM_AGG(BINARY_CHECKSUM(*)). The row count catches what the XOR based
+        aggregate misses (the same row added twice); columns BINARY_CHECKSUM can't compare (i.e. xml, text and image) are not part of the checksum.
+        """
+        return "\nUNION ALL\n".join([
+            f"SELECT N'{self._escape_literal(t.schema)}', N'{self._escape_literal(t.table_name)}', CONCAT(COUNT_BIG(*), ':', CHECKSUM_AGG(BINARY_CHECKSUM(*))) FROM [{t.schema}].[{t.table_name}]"
+            for t in tables])
+
+
+
+    def _get_baseline_table_name(self, table: "Table") -> str:
+        """Name of the table in the pyspawn schema holding the baseline contents of the table."""
+        return f"[{self._pyspawn_schema}].[baseline.{table.schema}.{table.table_name}]"
+
+
+
     def supports_temporal_tables(self) -> bool:
         """Indicate if the DBAdapter supports temporal tables."""
-        return True
\ No newline at end of file
+        return True
+
+
+
+    def _escape_literal(self, text: str) -> str:
+        """Escapes single quotes so the text can be embedded in an N'' string literal (i.e. dynamic sql)."""
+        return text.replace("'", "''")
+
+
+
+    def _distinct_relationships(self, relationships: List["Relationship"]) -> List["Relationship"]:
+        """Removes duplicate constraints (same parent table and constraint name), keeping the order."""
+        seen = set()
+        distinct: List["Relationship"] = []
+        for r in relationships:
+            key = (r.parent_table.schema, r.parent_table.table_name, r.relationship_name)
+            if key not in seen:
+                seen.add(key)
+                distinct.append(r)
+        return distinct
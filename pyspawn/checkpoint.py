@@ -1,18 +1,29 @@
-from typing import List
+import asyncio
+import atexit
+import hashlib
+import os
+import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Awaitable, Callable, Dict, Iterable, List, Optional, Sequence, Set, Tuple
 from typing import TYPE_CHECKING
 
 if TYPE_CHECKING:
     from pyspawn.adapters._db_adapter import DbAdapter
 from pyspawn._graph.relationship import Relationship
 from pyspawn._graph.temporal_table import TemporalTable
+from pyspawn._graph.identity_column import IdentityColumn
 from pyspawn._graph.table import Table
 from pyspawn._graph.graph_builder import GraphBuilder
+from pyspawn._graph.cost_planner import CostPlanner, ResetPlan, TRUNCATE
+from pyspawn._plan_cache import PlanCache
+from pyspawn._async_connection import async_execute, async_fetch_all
 
 
 class Checkpoint:
     """Initialize Checkpoint to run reset() between all your integration tests to ensure a clean test DB."""
 
-    def __init__(self, tables_to_ignore: List[str] = [], tables_to_include: List[str] = [], schemas_to_ignore: List[str] = [], schemas_to_include: List[str] = [], check_temporal_table: bool = False, reseed_identity: bool = False, db_adapter:"DbAdapter" = None, command_timeout: int = 120):
+    def __init__(self, tables_to_ignore: List[str] = [], tables_to_include: List[str] = [], schemas_to_ignore: List[str] = [], schemas_to_include: List[str] = [], check_temporal_table: bool = False, reseed_identity: bool = False, db_adapter:"DbAdapter" = None, command_timeout: int = 120, plan_cache_path: str = None, track_dirty_tables: bool = False, compile_reset: bool = False, skip_empty_tables: bool = False, cost_planner: CostPlanner = None, detect_schema_changes: bool = False, baseline_tables: List[str] = [], baseline_path: str = None):
         self.tables_to_ignore                         = tables_to_ignore
         self.tables_to_include                        = tables_to_include
         self.schemas_to_ignore                        = schemas_to_ignore
@@ -21,103 +32,798 @@ class Checkpoint:
         self.reseed_identity                          = reseed_identity
         self.db_adapter                               = db_adapter
         self.command_timeout                          = command_timeout
+        self.plan_cache_path                          = plan_cache_path
+        self.track_dirty_tables                       = track_dirty_tables
+        self.compile_reset                            = compile_reset
+        self.skip_empty_tables                        = skip_empty_tables
+        self.cost_planner                             = cost_planner
+        self.detect_schema_changes                    = detect_schema_changes
+        self.baseline_tables                          = baseline_tables
+        self.baseline_path                            = baseline_path
         self._database_name: str                      = ""
         self._delete_sql: str                         = ""
         self._reseed_sql: str                         = ""
         self._temporal_tables: List[TemporalTable]    = []
+        self._identity_columns: List[IdentityColumn]  = []
         self._graph_builder: GraphBuilder             = None
+        self._dirty_tracking_installed: bool          = False
+        self._database_captured: bool                 = False
+        self._reset_procedure_name: str               = None
+        self._schema_fingerprint: str                 = None
+        self._uses_savepoint: bool                    = False
+        self._savepoint_transaction_id: Any           = None
+        self._baseline_captured: bool                 = False
+        self._baseline_table_list: List[Table]        = []
+        self._baseline_files: Dict[Table, str]        = {}
+        self._baseline_checksums: Dict[Table, str]    = {}
+
+
+
+    def begin(self, conn):
+        """
+        Starts savepoint mode: opens a transaction with a savepoint on the connection (setting autocommit = False), so that reset() rolls back to the savepoint instead of deleting.
+        Dirty table tracking is installed to find the writes a rollback can't undo. If the transaction was committed or other connections wrote to the tables,
+        reset() falls back to deleting the dirty tables. After reset() the connection is back at a savepoint, ready for the next test; calling begin() again is a no-op.
+        """
+        if self.db_adapter.uses_database_restore():
+            raise ValueError("begin() can't be used with an adapter that resets by restoring the database")
+        if self._savepoint_transaction_id is not None:
+            return
+        conn.autocommit = True
+        self._ensure_plan(conn)
+        self._ensure_baseline(conn)
+        self._reset_dirty_tracking(conn)
+        self._uses_savepoint = True
+        self._begin_savepoint(conn)
 
 
 
     def reset(self, conn):
-        """Resets your DB. Expects a connection with autocommit = True"""
+        """
+        Resets your DB. Expects a connection with autocommit = True, unless begin() put the connection in savepoint mode.
+        If the adapter resets by restoring a captured copy of the database the connection is closed and has to be re-established after the reset.
+        The copy is captured by the first reset after it emptied the tables, so seeded data only survives in tables listed in tables_to_ignore
+        (or baseline_tables); every other table is captured, and therefore restored, empty.
+        """
+        if self._savepoint_transaction_id is not None and self._rollback_to_savepoint(conn):
+            return
+
+        if self.db_adapter.uses_database_restore() and self._database_captured:
+            conn.close()
+            self._execute_maintenance_commands(self.db_adapter.get_restore_database_command_texts(self._database_name))
+            return
+
+        self._ensure_plan(conn)
+        if self.detect_schema_changes or self.compile_reset:
+            self._refresh_on_schema_change(conn)
+        self._ensure_baseline(conn)
+
+        tables_to_reset = self._with_baseline_tables(conn, self._get_tables_to_reset(conn))
+        tables_to_delete = self._get_non_empty_tables(conn, tables_to_reset) if self.skip_empty_tables else tables_to_reset
+        if self.cost_planner is not None:
+            tables_to_delete = self._graph_builder.to_delete if tables_to_delete is None else tables_to_delete
+            reset_plan = self._plan_reset(conn, tables_to_delete)
+            self._execute_reset(conn, *self._build_subset_sql(tables_to_delete, tables_to_reset, reset_plan))
+        elif tables_to_delete is None and self.compile_reset:
+            self._execute_reset_procedure(conn)
+        elif tables_to_delete is None:
+            self._execute_reset(conn, self._temporal_tables, self._delete_sql, self._reseed_sql)
+        elif len(tables_to_delete) > 0 or self.reseed_identity:
+            self._execute_reset(conn, *self._build_subset_sql(tables_to_delete, tables_to_reset))
+        self._restore_baseline(conn, tables_to_reset)
+
+        if self._tracks_dirty_tables():
+            self._reset_dirty_tracking(conn)
+
+        if self._uses_savepoint:
+            self._begin_savepoint(conn)
+
+        if self.db_adapter.uses_database_restore():
+            conn.close()
+            self._execute_maintenance_commands(self.db_adapter.get_capture_database_command_texts(self._database_name))
+            self._database_captured = True
+
+
+    def refresh(self, conn) -> bool:
+        """
+        Brings the plan up to date after DDL changes (i.e. a migration between test modules) without rebuilding it from scratch.
+        The tables and foreign keys in the catalog are diffed against the plan and only the components of the graph touched by a change are re-ordered.
+        Identity columns are re-read for all tables, as a migration can add, drop or alter an identity or sequence of a table that stays. Returns True if the plan changed.
+        """
+        if self._graph_builder is None:
+            self._ensure_plan(conn)
+            return True
+
+        all_tables, all_relationships, temporal_tables = self._get_plan_metadata(conn)
+        graph_changed = self._graph_builder.update(set(all_tables), all_relationships)
+        identity_columns = self._get_identity_columns(conn, self._graph_builder.to_delete) if self.reseed_identity else []
+        if not graph_changed and temporal_tables == self._temporal_tables and set(identity_columns) == set(self._identity_columns):
+            return False
+
+        self._temporal_tables = temporal_tables
+        self._identity_columns = identity_columns
+        self._delete_sql = self.db_adapter.get_delete_command_text(self._graph_builder, restart_identity=self.reseed_identity)
+        self._reseed_sql = self._build_reseed_sql(self._graph_builder.to_delete, self._graph_builder.to_delete) if self.reseed_identity else None
+        self._dirty_tracking_installed = False
+
+        if self.plan_cache_path is not None:
+            PlanCache(self.plan_cache_path).put(self._get_plan_cache_key(conn), self._dump_plan())
+        return True
+
+
+    def explain_reset(self, conn) -> ResetPlan:
+        """
+        Returns the TRUNCATE / DELETE / batched DELETE strategy the cost_planner (or a default CostPlanner) would choose for each table on the next reset, with its estimated cost.
+        Nothing is deleted.
+        """
+        self._ensure_plan(conn)
+        tables_to_reset = self._get_tables_to_reset(conn)
+        tables_to_delete = self._get_non_empty_tables(conn, tables_to_reset) if self.skip_empty_tables else tables_to_reset
+        return self._plan_reset(conn, self._graph_builder.to_delete if tables_to_delete is None else tables_to_delete)
+
+
+    def reset_parallel(self, conn_factory: Callable[[], Any], max_workers: int = 4):
+        """
+        Resets your DB like reset(), but deletes tables without foreign key dependencies between them concurrently.
+        Tables are split into depth levels and weakly connected components; each level is deleted before the next one starts,
+        while the components within a level are deleted at the same time on up to max_workers connections.
+        conn_factory is called for one control connection and one connection per worker thread. All connections are expected to have autocommit = True and are closed when the reset is done.
+        """
+        if self._uses_savepoint:
+            raise ValueError("reset_parallel() can't reset a connection in savepoint mode, use reset() on the connection passed to begin()")
+        if self.db_adapter.uses_database_restore():
+            self.reset(conn_factory())
+            return
+
+        conn = conn_factory()
+        try:
+            self._ensure_plan(conn)
+            if self.detect_schema_changes:
+                self._refresh_on_schema_change(conn)
+            self._ensure_baseline(conn)
+
+            tables_to_reset = self._with_baseline_tables(conn, self._get_tables_to_reset(conn))
+            if tables_to_reset is None:
+                tables_to_reset = self._graph_builder.to_delete
+            tables_to_delete = self._get_non_empty_tables(conn, tables_to_reset) if self.skip_empty_tables else tables_to_reset
+
+            if len(tables_to_reset) > 0:
+                before_cmd_txts, after_cmd_txts = self._get_parallel_reset_command_texts(tables_to_reset, tables_to_delete)
+                with conn.cursor() as cursor:
+                    for cmd_txt in before_cmd_txts:
+                        cursor.execute(cmd_txt)
+
+                    try:
+                        if len(tables_to_delete) > 0:
+                            self._execute_parallel_delete(conn_factory, tables_to_delete, max_workers)
+                    finally:
+                        for cmd_txt in after_cmd_txts:
+                            cursor.execute(cmd_txt)
+            self._restore_baseline(conn, tables_to_reset)
+
+            if self._tracks_dirty_tables():
+                self._reset_dirty_tracking(conn)
+        finally:
+            conn.close()
+
+
+    async def areset(self, conn, conn_factory: Callable[[], Awaitable[Any]] = None, max_workers: int = 4):
+        """
+        Resets your DB like reset() from asyncio code, without blocking the event loop. Expects an async connection with autocommit: an asyncpg connection,
+        or an aioodbc / psycopg AsyncConnection. With a conn_factory (a coroutine function returning a new connection) tables are deleted like reset_parallel(),
+        the components of each level concurrently on up to max_workers connections, which are closed when the reset is done.
+        Restoring the database, begin(), baseline_tables, compile_reset, cost_planner, detect_schema_changes and plan_cache_path are not supported.
+        """
+        self._validate_async_reset()
+        if self._delete_sql == "":
+            await self._abuild_delete_tables(conn)
+
+        tables_to_reset = None
+        if self._reads_dirty_tables():
+            tables_to_reset = self._read_dirty_tables(await async_fetch_all(conn, self.db_adapter.get_dirty_tables_command_text()))
+        tables_to_delete = await self._aget_non_empty_tables(conn, tables_to_reset) if self.skip_empty_tables else tables_to_reset
+
+        if conn_factory is not None:
+            tables_to_reset = self._graph_builder.to_delete if tables_to_reset is None else tables_to_reset
+            tables_to_delete = tables_to_reset if tables_to_delete is None else tables_to_delete
+            if len(tables_to_reset) > 0:
+                before_cmd_txts, after_cmd_txts = self._get_parallel_reset_command_texts(tables_to_reset, tables_to_delete)
+                for cmd_txt in before_cmd_txts:
+                    await async_execute(conn, cmd_txt)
+                try:
+                    if len(tables_to_delete) > 0:
+                        await self._aexecute_parallel_delete(conn_factory, tables_to_delete, max_workers)
+                finally:
+                    for cmd_txt in after_cmd_txts:
+                        await async_execute(conn, cmd_txt)
+        elif tables_to_delete is None:
+            await self._aexecute_reset(conn, self._temporal_tables, self._delete_sql, self._reseed_sql)
+        elif len(tables_to_delete) > 0 or self.reseed_identity:
+            await self._aexecute_reset(conn, *self._build_subset_sql(tables_to_delete, tables_to_reset))
+
+        if self._tracks_dirty_tables():
+            for cmd_txt in self._get_reset_dirty_tracking_command_texts():
+                await async_execute(conn, cmd_txt)
+            self._dirty_tracking_installed = True
+
+
+    def _execute_maintenance_commands(self, cmd_txts: List[str]) -> None:
+        """Executes the statements one by one on a new connection from the adapters maintenance_conn_factory."""
+        conn = self.db_adapter.maintenance_conn_factory()
+        try:
+            for cmd_txt in cmd_txts:
+                with conn.cursor() as cursor:
+                    cursor.execute(cmd_txt)
+        finally:
+            conn.close()
+
+
+    def _ensure_plan(self, conn) -> None:
+        """Builds (or restores from the plan cache) the ordered delete plan the first time the checkpoint is reset."""
         if self._delete_sql == "":
-            with conn.cursor() as cur:
-                cur.execute(self.db_adapter.get_database_name_command_text())
-                self._database_name = cur.fetchone()[0]
-            self._build_delete_tables(conn)
-        
-        if len(self._temporal_tables) > 0:
-            turn_off_versioning_cmd_txt = self.db_adapter.build_turn_off_system_versioning_command_text(self._temporal_tables)
+            if self.plan_cache_path is not None:
+                with conn.cursor() as cur:
+                    cur.execute(self.db_adapter.get_database_name_command_text())
+                    self._database_name = cur.fetchone()[0]
+                self._build_delete_tables_from_cache(conn)
+            else:
+                self._build_delete_tables(conn)
+
+
+    def _refresh_on_schema_change(self, conn) -> None:
+        """Compares the schema fingerprint to the one seen on the previous reset (one catalog query) and patches the plan with refresh() if it moved."""
+        fingerprint = self._get_schema_fingerprint(conn)
+        if self._schema_fingerprint is not None and fingerprint != self._schema_fingerprint:
+            self.refresh(conn)
+        self._schema_fingerprint = fingerprint
+
+
+    def _get_tables_to_reset(self, conn) -> Optional[List[Table]]:
+        """Returns the subset of tables that needs to be reset (in delete order), or None if all planned tables are to be reset."""
+        if self._reads_dirty_tables():
+            return self._get_dirty_tables(conn)
+        return None
+
+
+    def _tracks_dirty_tables(self) -> bool:
+        """Whether writes are tracked in the dirty tables table, with track_dirty_tables or in savepoint mode (to find what a rollback can't undo)."""
+        return self.track_dirty_tables or self._uses_savepoint
+
+
+    def _reads_dirty_tables(self) -> bool:
+        """Whether the tables to reset are read from the dirty tables table, i.e. writes are tracked and the tracking is installed for the current plan."""
+        return self._tracks_dirty_tables() and self._dirty_tracking_installed
+
+
+    def _ensure_baseline(self, conn) -> None:
+        """Captures the contents of the baseline tables the first time the checkpoint is reset, before anything is deleted."""
+        if len(self.baseline_tables) == 0 or self._baseline_captured:
+            return
+
+        self._baseline_table_list = [t for t in self._graph_builder.to_delete if t.table_name in self.baseline_tables]
+        missing = set(self.baseline_tables) - set([t.table_name for t in self._baseline_table_list])
+        if len(missing) > 0:
+            raise ValueError(f"baseline_tables are not part of the reset: {', '.join(sorted(missing))}")
+        baseline_tables = set(self._baseline_table_list)
+        referenced = set([r.referenced_table for t in self._baseline_table_list for r in t.relationships]) - baseline_tables
+        if len(referenced) > 0:
+            raise ValueError(f"baseline_tables reference tables that are not baseline_tables, their rows would be deleted from under the baseline: {', '.join(sorted([t.to_string() for t in referenced]))}")
+
+        if self.db_adapter.stores_baseline_in_files():
+            atexit.register(self._remove_baseline_files)
+        with conn.cursor() as cursor:
+            for t in self._baseline_table_list:
+                cmd_txt = self.db_adapter.get_capture_baseline_command_text(t)
+                if self.db_adapter.stores_baseline_in_files():
+                    fd, path = tempfile.mkstemp(prefix="pyspawn_baseline_", suffix=".bin", dir=self.baseline_path)
+                    with os.fdopen(fd, "wb") as f:
+                        cursor.copy_expert(cmd_txt, f)
+                    self._baseline_files[t] = path
+                else:
+                    cursor.execute(cmd_txt)
+        self._baseline_checksums = self._get_baseline_checksums(conn)
+        self._baseline_captured = True
+
+
+    def _remove_baseline_files(self) -> None:
+        """Removes the files the baseline tables were captured to. Registered to run at process exit when the baseline is captured."""
+        for path in self._baseline_files.values():
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+        self._baseline_files = {}
+
+
+    def _with_baseline_tables(self, conn, tables: Optional[List[Table]]) -> Optional[List[Table]]:
+        """
+        Adjusts the tables to reset (None for all planned tables) for the baseline: baseline tables whose checksum still matches the captured one are left alone,
+        changed baseline tables are added. Tables referencing a table that is reset are reset too, also unchanged baseline tables, which then get reloaded.
+        """
+        if len(self._baseline_table_list) == 0:
+            return tables
+
+        changed_tables = self._get_changed_baseline_tables(conn)
+        unchanged_tables = set(self._baseline_table_list) - set(changed_tables)
+        tables = self._graph_builder.to_delete if tables is None else tables
+        tables_to_reset = self._graph_builder.get_delete_subset((set(tables) - unchanged_tables) | set(changed_tables))
+        return None if len(tables_to_reset) == len(self._graph_builder.to_delete) else tables_to_reset
+
+
+    def _get_changed_baseline_tables(self, conn) -> List[Table]:
+        """Returns the baseline tables whose contents no longer match the captured baseline, compared by checksum in one round trip."""
+        checksums = self._get_baseline_checksums(conn)
+        return [t for t in self._baseline_table_list if checksums.get(t) != self._baseline_checksums.get(t)]
+
+
+    def _get_baseline_checksums(self, conn, tables: List[Table] = None) -> Dict[Table, str]:
+        """Returns a checksum of the contents of the tables (every baseline table if None)."""
+        with conn.cursor() as cursor:
+            cursor.execute(self.db_adapter.get_baseline_checksums_command_text(self._baseline_table_list if tables is None else tables))
+            return {Table(i[0], i[1]): str(i[2]) for i in cursor.fetchall()}
+
+
+    def _restore_baseline(self, conn, tables_to_reset: Optional[List[Table]]) -> None:
+        """
+        Bulk loads the captured contents back into the emptied baseline tables (all if tables_to_reset is None), parents before children (reverse delete order), and syncs their identities.
+        The checksums of the restored tables are taken again, as a reload doesn't reproduce every value (i.e. a SQL Server rowversion column).
+        """
+        reset_tables = set(self._graph_builder.to_delete if tables_to_reset is None else tables_to_reset)
+        tables_to_restore = [t for t in self._baseline_table_list if t in reset_tables]
+        if len(tables_to_restore) == 0:
+            return
+
+        with conn.cursor() as cursor:
+            for t in reversed(tables_to_restore):
+                cmd_txt = self.db_adapter.get_restore_baseline_command_text(t)
+                if self.db_adapter.stores_baseline_in_files():
+                    with open(self._baseline_files[t], "rb") as f:
+                        cursor.copy_expert(cmd_txt, f)
+                else:
+                    cursor.execute(cmd_txt)
+
+            if self.reseed_identity:
+                restored_tables = set(tables_to_restore)
+                sync_cmd_txt = self.db_adapter.get_sync_identity_columns_command_text([i for i in self._identity_columns if Table(i.schema, i.table_name) in restored_tables])
+                if sync_cmd_txt.strip() != "":
+                    cursor.execute(sync_cmd_txt)
+        self._baseline_checksums.update(self._get_baseline_checksums(conn, tables_to_restore))
+
+
+    def _begin_savepoint(self, conn) -> None:
+        """Opens a transaction with a savepoint and remembers the transaction id, to tell on reset whether the transaction was committed in between."""
+        conn.autocommit = False
+        with conn.cursor() as cursor:
+            cursor.execute(self.db_adapter.get_begin_savepoint_command_text())
+            cursor.execute(self.db_adapter.get_transaction_id_command_text())
+            self._savepoint_transaction_id = cursor.fetchone()[0]
+
+
+    def _rollback_to_savepoint(self, conn) -> bool:
+        """
+        Rolls back to the savepoint set by begin() and reseeds the identities, as sequences are not rolled back. Returns False if a rollback does not reset the DB,
+        because the transaction was committed (or failed) since the savepoint, or other connections wrote to the tables; the connection is then rolled back and set to autocommit = True.
+        """
+        try:
             with conn.cursor() as cursor:
-                cursor.execute(turn_off_versioning_cmd_txt)
+                cursor.execute(self.db_adapter.get_transaction_id_command_text())
+                same_transaction = cursor.fetchone()[0] == self._savepoint_transaction_id
+                if same_transaction:
+                    cursor.execute(self.db_adapter.get_rollback_to_savepoint_command_text())
+        except Exception:
+            same_transaction = False
+
+        if same_transaction and len(self._get_dirty_tables(conn)) == 0:
+            if self.reseed_identity:
+                self._reseed_after_rollback(conn)
+            return True
+
+        conn.rollback()
+        conn.autocommit = True
+        self._savepoint_transaction_id = None
+        return False
 
-        self._execute_delete_sql(conn)
 
-        if len(self._temporal_tables) > 0:
-            turn_on_versioning_cmd_txt = self.db_adapter.build_turn_on_system_versioning_command_text(self._temporal_tables)
+    def _reseed_after_rollback(self, conn) -> None:
+        """
+        Reseeds the identities after a rollback to the savepoint. The rollback keeps the rows the tables held at begin() (i.e. baseline tables),
+        so every identity is then synced past the rows of its table; identities of empty tables stay at their seed.
+        """
+        cmd_txts = [
+            self.db_adapter.get_reseed_identity_columns_command_text(self._identity_columns),
+            self.db_adapter.get_sync_identity_columns_command_text(self._identity_columns)]
+        with conn.cursor() as cursor:
+            for cmd_txt in cmd_txts:
+                if cmd_txt.strip() != "":
+                    cursor.execute(cmd_txt)
+
+
+    def _get_non_empty_tables(self, conn, tables: Optional[List[Table]]) -> List[Table]:
+        """Probes the tables (all planned tables if None) in one round trip and returns the ones that have any rows, in delete order."""
+        tables = self._graph_builder.to_delete if tables is None else tables
+        if len(tables) == 0:
+            return []
+        non_empty_tables: Set[Table] = set()
+        with conn.cursor() as cursor:
+            cursor.execute(self.db_adapter.get_non_empty_tables_command_text(tables))
+            for i in cursor.fetchall():
+                non_empty_tables.add(Table(i[0], i[1]))
+        return [t for t in tables if t in non_empty_tables]
+
+
+    def _execute_parallel_delete(self, conn_factory: Callable[[], Any], tables_to_delete: List[Table], max_workers: int) -> None:
+        """Deletes the tables level by level, running the batches of each level concurrently on one connection per worker thread."""
+        connections = []
+        connections_lock = threading.Lock()
+        worker_state = threading.local()
+
+        def delete_batch(batch: List[Table]) -> None:
+            if not hasattr(worker_state, "conn"):
+                worker_state.conn = conn_factory()
+                with connections_lock:
+                    connections.append(worker_state.conn)
+            with worker_state.conn.cursor() as cursor:
+                cursor.execute(self.db_adapter.get_delete_tables_command_text(batch, self.reseed_identity))
+
+        try:
+            with ThreadPoolExecutor(max_workers=max_workers) as executor:
+                for batches in self._get_parallel_batches(tables_to_delete):
+                    list(executor.map(delete_batch, batches))
+        finally:
+            for c in connections:
+                c.close()
+
+
+    def _validate_async_reset(self) -> None:
+        """Raises a ValueError naming the options areset() doesn't support."""
+        unsupported = [name for name, enabled in [
+            ("restoring the database", self.db_adapter.uses_database_restore()),
+            ("begin()", self._uses_savepoint),
+            ("baseline_tables", len(self.baseline_tables) > 0),
+            ("compile_reset", self.compile_reset),
+            ("cost_planner", self.cost_planner is not None),
+            ("detect_schema_changes", self.detect_schema_changes),
+            ("plan_cache_path", self.plan_cache_path is not None)] if enabled]
+        if len(unsupported) > 0:
+            raise ValueError(f"areset() doesn't support {', '.join(unsupported)}")
+
+
+    async def _abuild_delete_tables(self, conn) -> None:
+        """Builds the plan like _build_delete_tables() on an async connection. The identity columns query needs the planned tables, so the two queries run one after the other."""
+        all_tables, all_relationships, temporal_tables = self._read_plan_metadata(await async_fetch_all(conn, self._get_plan_metadata_command_text()))
+        self._build_graph(all_tables, all_relationships, temporal_tables)
+        identity_columns: List[IdentityColumn] = []
+        if self.reseed_identity and len(self._graph_builder.to_delete) > 0:
+            identity_columns = self._read_identity_columns(await async_fetch_all(conn, self.db_adapter.get_identity_columns_command_text(self._graph_builder.to_delete)))
+        self._build_plan_sql(identity_columns)
+
+
+    async def _aget_non_empty_tables(self, conn, tables: Optional[List[Table]]) -> List[Table]:
+        """Probes the tables (all planned tables if None) like _get_non_empty_tables() on an async connection."""
+        tables = self._graph_builder.to_delete if tables is None else tables
+        if len(tables) == 0:
+            return []
+        rows = await async_fetch_all(conn, self.db_adapter.get_non_empty_tables_command_text(tables))
+        non_empty_tables = set([Table(i[0], i[1]) for i in rows])
+        return [t for t in tables if t in non_empty_tables]
+
+
+    async def _aexecute_reset(self, conn, temporal_tables: List[TemporalTable], delete_sql: str, reseed_sql: str) -> None:
+        """Sends the reset as a single batch like _execute_reset() on an async connection."""
+        reset_cmd_txt = self.db_adapter.get_reset_command_text(temporal_tables, delete_sql, reseed_sql)
+        if reset_cmd_txt.strip() != "":
+            await async_execute(conn, reset_cmd_txt)
+
+
+    async def _aexecute_parallel_delete(self, conn_factory: Callable[[], Awaitable[Any]], tables_to_delete: List[Table], max_workers: int) -> None:
+        """Deletes the tables level by level, running the batches of each level concurrently on the event loop with one connection per worker."""
+        connections = []
+        try:
+            for batches in self._get_parallel_batches(tables_to_delete):
+                workers = min(max_workers, len(batches))
+                while len(connections) < workers:
+                    connections.append(await conn_factory())
+
+                pending = list(batches)
+                async def delete_batches(worker_conn) -> None:
+                    while len(pending) > 0:
+                        await async_execute(worker_conn, self.db_adapter.get_delete_tables_command_text(pending.pop(0), self.reseed_identity))
+
+                await asyncio.gather(*[delete_batches(c) for c in connections[:workers]])
+        finally:
+            for c in connections:
+                await c.close()
+
+
+    def _get_parallel_reset_command_texts(self, tables_to_reset: List[Table], tables_to_delete: List[Table]) -> Tuple[List[str], List[str]]:
+        """
+        Returns the statements run on the control connection before the parallel delete (turn off system versioning, disable cyclic constraints)
+        and after it (enable cyclic constraints, reseed identities, turn system versioning back on).
+        """
+        subset = set(tables_to_delete)
+        temporal_tables = self._get_temporal_tables(tables_to_delete)
+        cyclic_relationships = [r for r in self._graph_builder.cyclic_relationships if r.parent_table in subset]
+
+        before_cmd_txts: List[str] = []
+        after_cmd_txts: List[str] = []
+        if len(temporal_tables) > 0:
+            before_cmd_txts.append(self.db_adapter.build_turn_off_system_versioning_command_text(temporal_tables))
+        before_cmd_txts.append(self.db_adapter.get_disable_cyclic_constraints_command_text(cyclic_relationships))
+        after_cmd_txts.append(self.db_adapter.get_enable_cyclic_constraints_command_text(cyclic_relationships))
+        if self.reseed_identity:
+            after_cmd_txts.append(self._build_reseed_sql(tables_to_reset, tables_to_delete))
+        if len(temporal_tables) > 0:
+            after_cmd_txts.append(self.db_adapter.build_turn_on_system_versioning_command_text(temporal_tables))
+        return [x for x in before_cmd_txts if x.strip() != ""], [x for x in after_cmd_txts if x.strip() != ""]
+
+
+    def _get_parallel_batches(self, tables_to_delete: List[Table]) -> List[List[List[Table]]]:
+        """Splits the tables into the depth levels of the graph, and each level into one batch per weakly connected component."""
+        component_index: Dict[Table, int] = {}
+        for i, component in enumerate(self._graph_builder.get_components()):
+            for t in component:
+                component_index[t] = i
+
+        batches: List[List[List[Table]]] = []
+        for level in self._graph_builder.get_levels(tables_to_delete):
+            level_batches: Dict[int, List[Table]] = {}
+            for t in level:
+                level_batches.setdefault(component_index[t], []).append(t)
+            batches.append(list(level_batches.values()))
+        return batches
+
+
+    def _execute_reset(self, conn, temporal_tables: List[TemporalTable], delete_sql: str, reseed_sql: str) -> None:
+        """Turns off system versioning (if any temporal tables), deletes and reseeds the tables and turns system versioning back on, in one round trip."""
+        reset_cmd_txt = self.db_adapter.get_reset_command_text(temporal_tables, delete_sql, reseed_sql)
+        if reset_cmd_txt.strip() != "":
             with conn.cursor() as cursor:
-                cursor.execute(turn_on_versioning_cmd_txt)
+                cursor.execute(reset_cmd_txt)
 
 
-    def _execute_alter_system_versioning(self, conn, cmd_txt: str) -> None:
-        """Turn on/off system versioning for temporal tables."""
+    def _execute_reset_procedure(self, conn) -> None:
+        """
+        Executes the reset as a single call to a server side procedure, named by a hash of its body. reset() checks the schema fingerprint first and refreshes the plan after DDL changes,
+        so a changed plan gets a new procedure, which replaces (drops) the procedure compiled before it.
+        """
+        reset_cmd_txt = self.db_adapter.get_reset_command_text(self._temporal_tables, self._delete_sql, self._reseed_sql)
+        procedure_name = "reset_" + hashlib.sha1(reset_cmd_txt.encode("utf-8")).hexdigest()[:16]
         with conn.cursor() as cursor:
-            cursor.execute(cmd_txt)
-        
+            if procedure_name != self._reset_procedure_name:
+                if self._reset_procedure_name is not None:
+                    cursor.execute(self.db_adapter.get_drop_reset_procedure_command_text(self._reset_procedure_name))
+                cursor.execute(self.db_adapter.get_create_reset_procedure_command_text(procedure_name, reset_cmd_txt))
+                self._reset_procedure_name = procedure_name
+            cursor.execute(self.db_adapter.get_execute_reset_procedure_command_text(self._reset_procedure_name))
+
+
+    def _build_subset_sql(self, tables_to_delete: List[Table], tables_to_reseed: Optional[List[Table]] = None, reset_plan: Optional[ResetPlan] = None) -> Tuple[List[TemporalTable], str, str]:
+        """
+        Builds the temporal tables, delete- and reseed statements for a subset of the planned tables (in graph.to_delete order), using the strategies of the reset_plan if given.
+        Identities are reseeded for tables_to_reseed (all planned tables if None), since an identity can have moved on a table that is empty again.
+        """
+        tables_to_reseed = self._graph_builder.to_delete if tables_to_reseed is None else tables_to_reseed
+        temporal_tables = self._get_temporal_tables(tables_to_delete)
+        if reset_plan is None:
+            delete_sql = self.db_adapter.get_delete_command_text(self._graph_builder, tables_to_delete, self.reseed_identity)
+            truncated_tables = tables_to_delete
+        else:
+            delete_sql = self.db_adapter.get_planned_delete_command_text(self._graph_builder, reset_plan, self.reseed_identity)
+            truncated_tables = reset_plan.get_tables(TRUNCATE)
+        reseed_sql = self._build_reseed_sql(tables_to_reseed, truncated_tables) if self.reseed_identity else None
+        return temporal_tables, delete_sql, reseed_sql
+
+
+    def _plan_reset(self, conn, tables_to_delete: List[Table]) -> ResetPlan:
+        """Plans the cheapest strategy for each table from the row estimates in the catalog. Truncating is only allowed if it does not reset an identity that is not to be reseeded."""
+        row_estimates: Dict[Table, int] = {}
+        truncatable_tables: Set[Table] = set()
+        if len(tables_to_delete) > 0:
+            with conn.cursor() as cursor:
+                cursor.execute(self.db_adapter.get_row_estimates_command_text(tables_to_delete))
+                for i in cursor.fetchall():
+                    table = Table(i[0], i[1])
+                    row_estimates[table] = int(i[2])
+                    if i[3] and (self.reseed_identity or not i[4]):
+                        truncatable_tables.add(table)
+
+        cost_planner = self.cost_planner or CostPlanner()
+        return cost_planner.plan(self._graph_builder, tables_to_delete, row_estimates, truncatable_tables, self.db_adapter.truncate_cascades(), self.db_adapter.supports_batched_delete())
+
+
+    def _get_temporal_tables(self, tables: List[Table]) -> List[TemporalTable]:
+        """Returns the temporal tables whose system versioning has to be turned off to delete the tables, i.e. where either the table or its history table is deleted."""
+        subset = set(tables)
+        return [t for t in self._temporal_tables if Table(t.schema, t.table_name) in subset or Table(t.history_table_schema, t.history_table_name) in subset]
 
-    def _execute_delete_sql(self, conn) -> None:
-        """Execute the batch delete statement, comprised of one or many "delete from", to remove data from tables."""
+
+    def _build_reseed_sql(self, tables_to_reset: List[Table], truncated_tables: List[Table] = []) -> str:
+        """
+        Builds the reseed statement for the identity columns (resolved when the plan was built) of the tables.
+        If the adapter restarts owned sequences while truncating, the owned identities of the truncated_tables are left out, so only the rest is reseeded explicitly.
+        """
+        subset = set(tables_to_reset)
+        restarted = set(truncated_tables) if self.db_adapter.truncate_restarts_identity() else set()
+        identity_columns = [i for i in self._identity_columns if Table(i.schema, i.table_name) in subset and not (i.owned_by_table and Table(i.schema, i.table_name) in restarted)]
+        return self.db_adapter.get_reseed_identity_columns_command_text(identity_columns)
+
+
+    def _get_dirty_tables(self, conn) -> List[Table]:
+        """Returns the tables written to since the last reset, including their history tables and all tables referencing them, in delete order."""
+        with conn.cursor() as cursor:
+            cursor.execute(self.db_adapter.get_dirty_tables_command_text())
+            return self._read_dirty_tables(cursor.fetchall())
+
+
+    def _read_dirty_tables(self, rows: Iterable[Sequence]) -> List[Table]:
+        """Expands the (schema, table) rows of the dirty tracking table with their history tables and all tables referencing them, in delete order."""
+        dirty_tables: Set[Table] = set([Table(i[0], i[1]) for i in rows])
+        for t in self._temporal_tables:
+            if Table(t.schema, t.table_name) in dirty_tables:
+                dirty_tables.add(Table(t.history_table_schema, t.history_table_name))
+
+        return self._graph_builder.get_delete_subset(dirty_tables)
+
+
+    def _reset_dirty_tracking(self, conn) -> None:
+        """
+        Installs the dirty table tracking triggers (once per plan) and clears the tracking table, including the writes made by the reset itself.
+        A failed or rolled back insert records nothing but still consumes an identity value, so that identity is not reseeded by the next reset.
+        """
         with conn.cursor() as cursor:
-            cursor.execute(self._delete_sql)
-            if self._reseed_sql != "" and self._reseed_sql != None:
-                cursor.execute(self._reseed_sql)
+            for cmd_txt in self._get_reset_dirty_tracking_command_texts():
+                cursor.execute(cmd_txt)
+        self._dirty_tracking_installed = True
+
+
+    def _get_reset_dirty_tracking_command_texts(self) -> List[str]:
+        """Returns the statements of _reset_dirty_tracking(), shared by reset() and areset(): the install (if not installed for the current plan) and the clear."""
+        cmd_txts: List[str] = []
+        if not self._dirty_tracking_installed:
+            cmd_txts.append(self.db_adapter.get_install_dirty_tracking_command_text(self._graph_builder.to_delete))
+        cmd_txts.append(self.db_adapter.get_clear_dirty_tables_command_text())
+        return cmd_txts
 
 
     def _build_delete_tables(self, conn) -> None:
         """Main function to create an ordered multiline delete statement that handles system versioned temporal tables and foreign key constraints."""
-        all_tables: List[Table] = self._get_all_tables(conn)
+        all_tables, all_relationships, temporal_tables = self._get_plan_metadata(conn)
+        self._build_graph(all_tables, all_relationships, temporal_tables)
+        identity_columns = self._get_identity_columns(conn, self._graph_builder.to_delete) if self.reseed_identity else []
+        self._build_plan_sql(identity_columns)
 
-        if self.check_temporal_table and self.db_adapter.supports_temporal_tables():
-            self._temporal_tables = self._get_all_temporal_tables(conn)
-        
-        all_relationships = self._get_relationships(conn)
 
-        self._graph_builder = GraphBuilder(all_tables, all_relationships)
+    def _build_graph(self, tables: List[Table], relationships: List[Relationship], temporal_tables: List[TemporalTable]) -> None:
+        """Orders the tables read from the database metadata into a fresh plan."""
+        self._graph_builder = GraphBuilder(tables, relationships)
+        self._temporal_tables = temporal_tables
+        self._dirty_tracking_installed = False
 
-        self._delete_sql = self.db_adapter.get_delete_command_text(self._graph_builder)
-        self._reseed_sql = self.db_adapter.get_reseed_command_text(self._graph_builder.to_delete) if self.reseed_identity else None
 
+    def _build_plan_sql(self, identity_columns: List[IdentityColumn]) -> None:
+        """Generates the delete- and reseed statements for all planned tables."""
+        self._delete_sql = self.db_adapter.get_delete_command_text(self._graph_builder, restart_identity=self.reseed_identity)
+        self._identity_columns = identity_columns
+        self._reseed_sql = self._build_reseed_sql(self._graph_builder.to_delete, self._graph_builder.to_delete) if self.reseed_identity else None
 
 
-    def _get_relationships(self, conn) -> List[Relationship]:
-        """Get relationships consisting of a parent_table (the table with the FK-reference) referencing the referenced_table primary key or unique constrained column."""
-        relationships: List[Relationship] = []
-        cmd_txt = self.db_adapter.get_relationship_command_text(self)
+
+    def _build_delete_tables_from_cache(self, conn) -> None:
+        """Restores the plan from the on-disk plan cache if the schema fingerprint is unchanged, otherwise builds the plan and caches it."""
+        plan_cache = PlanCache(self.plan_cache_path)
+        key = self._get_plan_cache_key(conn)
+
+        plan = plan_cache.get(key)
+        if plan is not None:
+            self._load_plan(plan)
+            return
+
+        self._build_delete_tables(conn)
+        plan_cache.put(key, self._dump_plan())
+
+
+
+    def _get_plan_cache_key(self, conn) -> str:
+        """Returns the plan cache key for the checkpoint configuration and the current schema fingerprint."""
+        return PlanCache.build_key([
+            type(self.db_adapter).__name__,
+            self._database_name,
+            sorted(self.tables_to_ignore),
+            sorted(self.tables_to_include),
+            sorted(self.schemas_to_ignore),
+            sorted(self.schemas_to_include),
+            self.check_temporal_table,
+            self.reseed_identity,
+            self._get_schema_fingerprint(conn)])
+
+
+
+    def _dump_plan(self) -> dict:
+        """Serializes the built plan (delete order, relationships, temporal tables and generated sql) to a json serializable dict."""
+        relationships = [r for t in self._graph_builder.to_delete for r in t.relationships]
+        return {
+            "to_delete": [[t.schema, t.table_name] for t in self._graph_builder.to_delete],
+            "relationships": [[r.parent_table.schema, r.parent_table.table_name, r.referenced_table.schema, r.referenced_table.table_name, r.relationship_name] for r in relationships],
+            "cyclic_relationships": [list(GraphBuilder._relationship_key(r)) for r in self._graph_builder.cyclic_relationships],
+            "temporal_tables": [[t.schema, t.table_name, t.history_table_schema, t.history_table_name] for t in self._temporal_tables],
+            "delete_sql": self._delete_sql,
+            "reseed_sql": self._reseed_sql,
+            "identity_columns": [[i.schema, i.table_name, i.column_name, i.seed_value, i.increment_value, i.sequence_name, i.owned_by_table] for i in self._identity_columns],
+        }
+
+
+
+    def _load_plan(self, plan: dict) -> None:
+        """Restores a plan serialized by _dump_plan() without querying the database metadata."""
+        to_delete = [Table(i[0], i[1]) for i in plan["to_delete"]]
+        relationships = [Relationship(Table(i[0], i[1]), Table(i[2], i[3]), i[4]) for i in plan["relationships"]]
+        cyclic_relationship_keys = set(tuple(i) for i in plan["cyclic_relationships"])
+        cyclic_relationships = [r for r in relationships if GraphBuilder._relationship_key(r) in cyclic_relationship_keys]
+        self._graph_builder = GraphBuilder.from_plan(to_delete, relationships, cyclic_relationships)
+        self._temporal_tables = [TemporalTable(i[0], i[1], i[2], i[3]) for i in plan["temporal_tables"]]
+        self._delete_sql = plan["delete_sql"]
+        self._reseed_sql = plan["reseed_sql"]
+        self._identity_columns = [IdentityColumn(*i) for i in plan.get("identity_columns", [])]
+        self._reset_procedure_name = None
+
+
+
+    def _get_schema_fingerprint(self, conn) -> str:
+        """Returns the adapters cheap schema version fingerprint, used to detect DDL changes since a plan was built."""
         with conn.cursor() as cursor:
-            cursor.execute(cmd_txt)
-            res = cursor.fetchall()
-            for i in res:
-                relationships.append(Relationship(
-                    Table(i[0], i[1]),
-                    Table(i[2], i[3]),
-                    i[4]))
-        return set(relationships)
+            cursor.execute(self.db_adapter.get_schema_fingerprint_command_text())
+            return str(cursor.fetchone()[0])
 
 
 
-    def _get_all_tables(self, conn) -> List[Table]:
-        """Returns all tables in scope from the checkpoint (include/exclude schemas & tables)."""
-        tables: List[Table] = []
-        cmd_txt = self.db_adapter.get_tables_command_text(self)
+    def _get_plan_metadata(self, conn) -> Tuple[List[Table], List[Relationship], List[TemporalTable]]:
+        """
+        Reads the database name, all tables in scope from the checkpoint (include/exclude schemas & tables), the relationships between them and the temporal tables in one round trip.
+        A relationship consists of a parent_table (the table with the FK-reference) referencing the referenced_table primary key or unique constrained column.
+        Rows are consumed from the cursor as they arrive instead of being fetched into a list first.
+        """
         with conn.cursor() as cursor:
-            cursor.execute(cmd_txt)
-            res = cursor.fetchall()
-            for i in res:
-                tables.append(Table(i[0], i[1]))
-        return tables
+            cursor.execute(self._get_plan_metadata_command_text())
+            return self._read_plan_metadata(cursor)
 
 
-    def _get_all_temporal_tables(self, conn) -> List[TemporalTable]:
-        """Returns all temporal tables in scope from the checkpoint (include/exclude schemas & tables)."""
+    def _get_plan_metadata_command_text(self) -> str:
+        """Returns the adapters plan metadata query, including temporal tables if they are checked and supported."""
+        include_temporal_tables = self.check_temporal_table and self.db_adapter.supports_temporal_tables()
+        return self.db_adapter.get_plan_metadata_command_text(self, include_temporal_tables)
+
+
+    def _read_plan_metadata(self, rows: Iterable[Sequence]) -> Tuple[List[Table], List[Relationship], List[TemporalTable]]:
+        """Reads the (kind, c1..c5) rows of the plan metadata query into tables, relationships and temporal tables (and the database name)."""
+        tables: List[Table] = []
+        relationships: List[Relationship] = []
         temporal_tables: List[TemporalTable] = []
-        cmd_txt = self.db_adapter.get_temporal_table_command_text(self)
+        for i in rows:
+            if i[0] == "table":
+                tables.append(Table(i[1], i[2]))
+            elif i[0] == "relationship":
+                relationships.append(Relationship(Table(i[1], i[2]), Table(i[3], i[4]), i[5]))
+            elif i[0] == "temporal_table":
+                temporal_tables.append(TemporalTable(i[1], i[2], i[3], i[4]))
+            elif i[0] == "database":
+                self._database_name = i[1]
+        temporal_tables.sort(key=lambda t: (t.schema, t.table_name))
+        return tables, relationships, temporal_tables
+
+
+    def _get_identity_columns(self, conn, tables: List[Table]) -> List[IdentityColumn]:
+        """Returns the identity columns (and their sequences) of the tables, resolved once when the plan is built."""
+        if len(tables) == 0:
+            return []
+        cmd_txt = self.db_adapter.get_identity_columns_command_text(tables)
         with conn.cursor() as cursor:
             cursor.execute(cmd_txt)
-            res = cursor.fetchall()
-            for i in res:
-                temporal_tables.append(TemporalTable(i[0], i[1], i[2], i[3]))
-        return temporal_tables
+            return self._read_identity_columns(cursor.fetchall())
+
+
+    def _read_identity_columns(self, rows: Iterable[Sequence]) -> List[IdentityColumn]:
+        """Reads the rows of the identity columns query."""
+        return [IdentityColumn(i[0], i[1], i[2], int(i[3]), int(i[4]), i[5], bool(i[6])) for i in rows]
 
 
     def _does_db_support_temporal_tables(self, conn) -> bool:
@@ -0,0 +1,92 @@
+import copy
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from queue import Queue
+from typing import Any, Callable, List
+
+from pyspawn.checkpoint import Checkpoint
+
+
+class CheckpointPool:
+    """
+    Initialize CheckpointPool with a Checkpoint and one connection factory per identical test DB.
+    Tests lease a clean DB, and when the lease is released the DB is reset in a background worker while the next test runs on another clean DB.
+    """
+
+    def __init__(self, checkpoint: Checkpoint, conn_factories: List[Callable[[], Any]], max_workers: int = None):
+        if len(conn_factories) == 0:
+            raise ValueError("CheckpointPool requires at least one connection factory")
+        self.checkpoint                               = checkpoint
+        self.conn_factories                           = conn_factories
+        self._checkpoints: List[Checkpoint]           = [copy.deepcopy(checkpoint) for _ in conn_factories]
+        self._clean: Queue                            = Queue()
+        self._executor: ThreadPoolExecutor            = ThreadPoolExecutor(max_workers=max_workers or len(conn_factories))
+
+        for i in range(len(conn_factories)):
+            self._executor.submit(self._reset, i)
+
+
+
+    @contextmanager
+    def lease(self, timeout: float = None):
+        """
+        Blocks until a clean DB is available and yields a new connection to it. The connection is closed and the DB is reset in the background when the context exits.
+        Raises queue.Empty if no DB became clean within the timeout, or the exception of the background reset if the DB could not be reset.
+        A DB whose reset failed is reset again in the background, and a DB that could not be connected to stays clean, so a later lease can still get it.
+        """
+        index, error = self._clean.get(timeout=timeout)
+        if error is not None:
+            self._executor.submit(self._reset, index)
+            raise error
+
+        try:
+            conn = self.conn_factories[index]()
+        except BaseException:
+            self._clean.put((index, None))
+            raise
+        try:
+            yield conn
+        finally:
+            self._close(conn)
+            self._executor.submit(self._reset, index)
+
+
+
+    def close(self) -> None:
+        """Waits for all pending background resets to finish and stops the workers."""
+        self._executor.shutdown(wait=True)
+
+
+
+    def __enter__(self) -> "CheckpointPool":
+        return self
+
+
+
+    def __exit__(self, exc_type, exc_value, traceback) -> None:
+        self.close()
+
+
+
+    def _reset(self, index: int) -> None:
+        """Resets the DB on a new connection and hands it back to the pool of clean DBs, together with the exception if the reset failed."""
+        try:
+            conn = self.conn_factories[index]()
+            try:
+                self._checkpoints[index].reset(conn)
+            finally:
+                self._close(conn)
+        except BaseException as e:
+            self._clean.put((index, e))
+            return
+        self._clean.put((index, None))
+
+
+
+    @staticmethod
+    def _close(conn) -> None:
+        """Closes the connection, ignoring connections already closed by the test or by the reset (i.e. database restore strategies)."""
+        try:
+            conn.close()
+        except Exception:
+            pass
@@ -0,0 +1,10 @@
+import asyncio
+
+
+def _run(coroutine):
+    """Runs the coroutine on a new event loop (asyncio.run needs Python 3.7)."""
+    loop = asyncio.new_event_loop()
+    try:
+        return loop.run_until_complete(coroutine)
+    finally:
+        loop.close()
@@ -0,0 +1,38 @@
+"""
+Benchmarks GraphBuilder construction on synthetic schemas. Not collected by pytest, run with:
+python -m pyspawn.tests.benchmarks.benchmark_graph_builder
+"""
+import random
+import time
+from typing import List, Set, Tuple
+
+from pyspawn._graph.graph_builder import GraphBuilder
+from pyspawn._graph.relationship import Relationship
+from pyspawn._graph.table import Table
+
+
+def build_schema(table_count: int, relationships_per_table: float, seed: int = 42) -> Tuple[Set[Table], Set[Relationship]]:
+    """Builds a synthetic acyclic schema where every table references on average relationships_per_table tables created before it."""
+    rnd = random.Random(seed)
+    tables: List[Table] = [Table("dbo", f"table_{i}") for i in range(table_count)]
+    relationships: Set[Relationship] = set()
+    for i in range(1, table_count):
+        for j in range(rnd.randint(0, int(relationships_per_table * 2))):
+            referenced = tables[rnd.randrange(0, i)]
+            relationships.add(Relationship(Table("dbo", tables[i].table_name), Table("dbo", referenced.table_name), f"fk_{i}_{j}"))
+    return set(tables), relationships
+
+
+def benchmark(table_count: int, relationships_per_table: float = 2.7) -> float:
+    """Returns the seconds it takes to build the graph for a synthetic schema."""
+    tables, relationships = build_schema(table_count, relationships_per_table)
+    start = time.perf_counter()
+    GraphBuilder(tables, relationships)
+    return time.perf_counter() - start
+
+
+if __name__ == "__main__":
+    print(f"{'tables':>8} {'seconds':>10} {'us/table':>10}")
+    for table_count in [1250, 2500, 5000, 10000, 20000]:
+        seconds = benchmark(table_count)
+        print(f"{table_count:>8} {seconds:>10.3f} {seconds / table_count * 1000000:>10.1f}")
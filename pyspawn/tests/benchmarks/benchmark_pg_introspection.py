@@ -0,0 +1,84 @@
+"""
+Benchmarks the Postgres metadata introspection of the information_schema views against the pg_catalog queries of the PgAdapter
+on a catalog of schema_count * tables_per_schema tables, each referencing the previous table in its schema.
+Needs the PGSQL_HOST, PGSQL_DB, PGSQL_UID and PGSQL_PWD variables of the integration tests. Not collected by pytest, run with:
+python -m pyspawn.tests.benchmarks.benchmark_pg_introspection
+"""
+import os
+import statistics
+import time
+from typing import List
+
+import psycopg2
+
+from pyspawn import Checkpoint
+from pyspawn.adapters import PgAdapter
+
+
+BENCHMARK_DB = "pyspawn_benchmark"
+
+INFORMATION_SCHEMA_TABLES = """
+select table_schema, table_name
+from information_schema.tables
+where table_type = 'BASE TABLE'
+and table_schema not in('pg_catalog', 'information_schema', 'pyspawn')
+"""
+
+INFORMATION_SCHEMA_RELATIONSHIPS = """
+select tc.table_schema, tc.table_name, ctu.table_schema, ctu.table_name, rc.constraint_name
+from information_schema.referential_constraints rc
+inner join information_schema.constraint_table_usage ctu ON ctu.constraint_name = rc.constraint_name
+inner join information_schema.table_constraints tc ON tc.constraint_name = rc.constraint_name
+"""
+
+
+def connect(dbname: str):
+    conn = psycopg2.connect(host=os.getenv("PGSQL_HOST"), dbname=dbname, user=os.getenv("PGSQL_UID"), password=os.getenv("PGSQL_PWD"), port=5432)
+    conn.autocommit = True
+    return conn
+
+
+def create_catalog(schema_count: int, tables_per_schema: int) -> None:
+    """(Re)creates the benchmark database with schema_count * tables_per_schema tables chained together by foreign keys."""
+    conn = connect(os.getenv("PGSQL_DB"))
+    with conn.cursor() as cur:
+        cur.execute(f"drop database if exists {BENCHMARK_DB}")
+        cur.execute(f"create database {BENCHMARK_DB}")
+    conn.close()
+
+    conn = connect(BENCHMARK_DB)
+    with conn.cursor() as cur:
+        for s in range(schema_count):
+            cmd_txt = f"create schema s_{s};\n"
+            for t in range(tables_per_schema):
+                reference = f" references s_{s}.t_{t - 1} (id)" if t > 0 else ""
+                cmd_txt += f"create table s_{s}.t_{t} (id int primary key, ref int{reference});\n"
+            cur.execute(cmd_txt)
+    conn.close()
+
+
+def measure(conn, cmd_txts: List[str], repetitions: int) -> float:
+    """Returns the median seconds it takes to execute and fetch all the queries."""
+    timings: List[float] = []
+    for _ in range(repetitions):
+        start = time.perf_counter()
+        with conn.cursor() as cur:
+            for cmd_txt in cmd_txts:
+                cur.execute(cmd_txt)
+                cur.fetchall()
+        timings.append(time.perf_counter() - start)
+    return statistics.median(timings)
+
+
+if __name__ == "__main__":
+    create_catalog(schema_count=100, tables_per_schema=100)
+    adapter = PgAdapter()
+    checkpoint = Checkpoint(db_adapter=adapter)
+    conn = connect(BENCHMARK_DB)
+    print(f"{'introspection':>32} {'seconds':>10}")
+    for name, cmd_txts in [
+        ("information_schema", [INFORMATION_SCHEMA_TABLES, INFORMATION_SCHEMA_RELATIONSHIPS]),
+        ("pg_catalog", [adapter.get_tables_command_text(checkpoint), adapter.get_relationship_command_text(checkpoint)]),
+        ("pg_catalog (single round trip)", [adapter.get_plan_metadata_command_text(checkpoint, include_temporal_tables=False)])]:
+        print(f"{name:>32} {measure(conn, cmd_txts, repetitions=5):>10.3f}")
+    conn.close()
@@ -40,4 +40,4 @@ def _create_foreign_key_relationship(pg_conn, child_table: Table, parent_table:
     alter table {child_table.to_string()}
     add constraint fk_{child_table.table_name.upper()}_reffing_{parent_table.table_name} foreign key (val) references {parent_table.to_string()} (id)
     """
-    _execute_query(pg_conn, query)
\ No newline at end of file
+    _execute_query(pg_conn, query)
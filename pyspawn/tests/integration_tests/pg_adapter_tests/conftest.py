@@ -2,6 +2,7 @@ import os
 from pytest import fixture
 from psycopg2._psycopg import connection, cursor
 import psycopg2
+import asyncpg
 
 #Region PgSecrets
 PG_HOST = os.getenv("PGSQL_HOST")
@@ -29,4 +30,31 @@ def pg_conn(nuke_pg_server) -> connection:
     """Server is DNS resolved to service name of PG SQL-container"""
     conn:connection = psycopg2.connect(host=PG_HOST, dbname=TESTING_DB, user=PG_UID, password=PG_PWD, port=5432)
     conn.autocommit = True
-    return conn
\ No newline at end of file
+    return conn
+
+@fixture()
+def pg_conn_factory(nuke_pg_server):
+    """Returns a function that opens a new autocommit connection to the testing DB."""
+    def factory() -> connection:
+        conn:connection = psycopg2.connect(host=PG_HOST, dbname=TESTING_DB, user=PG_UID, password=PG_PWD, port=5432)
+        conn.autocommit = True
+        return conn
+    return factory
+
+
+@fixture()
+def pg_maintenance_conn_factory():
+    """Returns a function that opens a new autocommit connection to the default DB, used to drop and clone the testing DB."""
+    def factory() -> connection:
+        conn:connection = psycopg2.connect(host=PG_HOST, dbname=PG_DB, user=PG_UID, password=PG_PWD, port=5432)
+        conn.autocommit = True
+        return conn
+    return factory
+
+
+@fixture()
+def pg_async_conn_factory(nuke_pg_server):
+    """Returns a coroutine function that opens a new asyncpg connection to the testing DB."""
+    async def factory() -> asyncpg.Connection:
+        return await asyncpg.connect(host=PG_HOST, database=TESTING_DB, user=PG_UID, password=PG_PWD, port=5432)
+    return factory
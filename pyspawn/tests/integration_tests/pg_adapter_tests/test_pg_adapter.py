@@ -1,6 +1,9 @@
+import threading
+
 from pyspawn import Checkpoint
 from pyspawn.adapters import PgAdapter
 from pyspawn._graph.table import Table
+from pyspawn._graph.cost_planner import CostPlanner, TRUNCATE
 
 from pyspawn.tests.integration_tests.pg_adapter_tests._pgsql_utilities import (
     _execute_query,
@@ -10,6 +13,7 @@ from pyspawn.tests.integration_tests.pg_adapter_tests._pgsql_utilities import (
     _create_table,
     _create_foreign_key_relationship
 )
+from pyspawn.tests._async_utilities import _run
 
 def test_pg_connection(pg_conn):
     query = "select version()"
@@ -507,4 +511,574 @@ def test_pg_reseed_serial_with_table(pg_conn):
     assert inserted_a == 100, "100 records were not inserted to DB"
     assert inserted_b == 100, "100 records were not inserted to DB"
     assert _execute_scalar(pg_conn, f"select max(id) from {a.to_string()}") == 1, "Serial did not reset correctly"
-    assert _execute_scalar(pg_conn, f"select max(id) from {b.to_string()}") == 101, "Serial did not reset correctly"
\ No newline at end of file
+    assert _execute_scalar(pg_conn, f"select max(id) from {b.to_string()}") == 101, "Serial did not reset correctly"
+
+def test_pg_plan_cache_warm_start(pg_conn, tmp_path):
+    ### Arrange ###
+    a = Table("public", "a")
+    b = Table("public", "b")
+    plan_cache_path = str(tmp_path / "plan.json")
+    _create_table(pg_conn, a)
+    _create_table(pg_conn, b)
+    _create_foreign_key_relationship(pg_conn, a, b)
+    Checkpoint(db_adapter=PgAdapter(), plan_cache_path=plan_cache_path).reset(pg_conn)
+    _insert_bulk(pg_conn, f"INSERT INTO {b.to_string()}(id) values(%s)", [[i] for i in range(0, 100)])
+    _insert_bulk(pg_conn, f"INSERT INTO {a.to_string()}(id, val) values(%s, %s)", [[i, i] for i in range(0, 100)])
+
+    ### Act ###
+    checkpoint = Checkpoint(db_adapter=PgAdapter(), plan_cache_path=plan_cache_path)
+    checkpoint.reset(pg_conn)
+
+    ### Assert ###
+    assert checkpoint._graph_builder.to_delete == [a, b], "Cached delete order was not restored"
+    assert _execute_scalar(pg_conn, f"SELECT COUNT(1) FROM {a.to_string()}") == 0, "All records were not deleted"
+    assert _execute_scalar(pg_conn, f"SELECT COUNT(1) FROM {b.to_string()}") == 0, "All records were not deleted"
+    pg_conn.close()
+
+
+def test_pg_plan_cache_invalidated_by_ddl(pg_conn, tmp_path):
+    ### Arrange ###
+    a = Table("public", "a")
+    b = Table("public", "b")
+    plan_cache_path = str(tmp_path / "plan.json")
+    _create_table(pg_conn, a)
+    Checkpoint(db_adapter=PgAdapter(), plan_cache_path=plan_cache_path).reset(pg_conn)
+    _create_table(pg_conn, b)
+    _insert_bulk(pg_conn, f"INSERT INTO {b.to_string()}(id) values(%s)", [[i] for i in range(0, 100)])
+
+    ### Act ###
+    checkpoint = Checkpoint(db_adapter=PgAdapter(), plan_cache_path=plan_cache_path)
+    checkpoint.reset(pg_conn)
+
+    ### Assert ###
+    assert _execute_scalar(pg_conn, f"SELECT COUNT(1) FROM {b.to_string()}") == 0, "Stale cached plan was used after DDL change"
+    pg_conn.close()
+
+
+def test_pg_track_dirty_tables_only_resets_written_tables(pg_conn):
+    ### Arrange ###
+    a = Table("public", "a")
+    b = Table("public", "b")
+    _create_table(pg_conn, a)
+    _create_table(pg_conn, b)
+    checkpoint = Checkpoint(db_adapter=PgAdapter(), track_dirty_tables=True)
+    checkpoint.reset(pg_conn)
+    _execute_query(pg_conn, f"alter table {b.to_string()} disable trigger pyspawn_track_dirty_table")
+    _insert_bulk(pg_conn, f"INSERT INTO {a.to_string()}(id) values(%s)", [[i] for i in range(0, 100)])
+    _insert_bulk(pg_conn, f"INSERT INTO {b.to_string()}(id) values(%s)", [[i] for i in range(0, 100)])
+
+    ### Act ###
+    checkpoint.reset(pg_conn)
+
+    ### Assert ###
+    assert _execute_scalar(pg_conn, f"SELECT COUNT(1) FROM {a.to_string()}") == 0, "Written table was not reset"
+    assert _execute_scalar(pg_conn, f"SELECT COUNT(1) FROM {b.to_string()}") == 100, "Untracked table was reset"
+    assert _execute_scalar(pg_conn, "SELECT COUNT(1) FROM pyspawn.dirty_tables") == 0, "Tracking table was not cleared"
+    pg_conn.close()
+
+
+def test_pg_track_dirty_tables_resets_referencing_tables(pg_conn):
+    ### Arrange ###
+    a = Table("public", "a")
+    b = Table("public", "b")
+    _create_table(pg_conn, a)
+    _create_table(pg_conn, b)
+    _create_foreign_key_relationship(pg_conn, a, b)
+    checkpoint = Checkpoint(db_adapter=PgAdapter(), track_dirty_tables=True)
+    checkpoint.reset(pg_conn)
+    _insert_bulk(pg_conn, f"INSERT INTO {b.to_string()}(id) values(%s)", [[i] for i in range(0, 100)])
+    _execute_query(pg_conn, f"alter table {a.to_string()} disable trigger pyspawn_track_dirty_table")
+    _insert_bulk(pg_conn, f"INSERT INTO {a.to_string()}(id, val) values(%s, %s)", [[i, i] for i in range(0, 100)])
+
+    ### Act ###
+    checkpoint.reset(pg_conn)
+
+    ### Assert ###
+    assert _execute_scalar(pg_conn, f"SELECT COUNT(1) FROM {a.to_string()}") == 0, "Referencing table was not reset"
+    assert _execute_scalar(pg_conn, f"SELECT COUNT(1) FROM {b.to_string()}") == 0, "Written table was not reset"
+    pg_conn.close()
+
+
+def test_pg_reset_parallel(pg_conn_factory):
+    ### Arrange ###
+    pg_conn = pg_conn_factory()
+    a = Table("public", "a")
+    b = Table("public", "b")
+    c = Table("public", "c")
+    d = Table("public", "d")
+    for t in [a, b, c, d]:
+        _create_table(pg_conn, t)
+    _create_foreign_key_relationship(pg_conn, a, b)
+    _create_foreign_key_relationship(pg_conn, c, d)
+    _create_foreign_key_relationship(pg_conn, d, c)
+    _insert_bulk(pg_conn, f"INSERT INTO {b.to_string()}(id) values(%s)", [[i] for i in range(0, 100)])
+    _insert_bulk(pg_conn, f"INSERT INTO {a.to_string()}(id, val) values(%s, %s)", [[i, i] for i in range(0, 100)])
+    _insert_bulk(pg_conn, f"INSERT INTO {c.to_string()}(id) values(%s)", [[i] for i in range(0, 100)])
+    _insert_bulk(pg_conn, f"INSERT INTO {d.to_string()}(id, val) values(%s, %s)", [[i, i] for i in range(0, 100)])
+
+    ### Act ###
+    checkpoint = Checkpoint(db_adapter=PgAdapter())
+    checkpoint.reset_parallel(pg_conn_factory, max_workers=2)
+
+    ### Assert ###
+    for t in [a, b, c, d]:
+        assert _execute_scalar(pg_conn, f"SELECT COUNT(1) FROM {t.to_string()}") == 0, "All records were not deleted"
+    pg_conn.close()
+
+
+def test_pg_areset(pg_conn, pg_async_conn_factory):
+    ### Arrange ###
+    a = Table("public", "a")
+    b = Table("public", "b")
+    c = Table("public", "c")
+    for t in [a, b, c]:
+        _create_table(pg_conn, t)
+    _create_foreign_key_relationship(pg_conn, a, b)
+    _insert_bulk(pg_conn, f"INSERT INTO {b.to_string()}(id) values(%s)", [[i] for i in range(0, 100)])
+    _insert_bulk(pg_conn, f"INSERT INTO {a.to_string()}(id, val) values(%s, %s)", [[i, i] for i in range(0, 100)])
+    _insert_bulk(pg_conn, f"INSERT INTO {c.to_string()}(id) values(%s)", [[i] for i in range(0, 100)])
+    checkpoint = Checkpoint(db_adapter=PgAdapter())
+
+    async def reset():
+        conn = await pg_async_conn_factory()
+        try:
+            await checkpoint.areset(conn)
+            await conn.execute(f"INSERT INTO {c.to_string()}(id) values(1)")
+            await checkpoint.areset(conn, pg_async_conn_factory, max_workers=2)
+        finally:
+            await conn.close()
+
+    ### Act ###
+    _run(reset())
+
+    ### Assert ###
+    for t in [a, b, c]:
+        assert _execute_scalar(pg_conn, f"SELECT COUNT(1) FROM {t.to_string()}") == 0, "All records were not deleted"
+
+
+def test_pg_template_database_reset(pg_conn_factory, pg_maintenance_conn_factory):
+    ### Arrange ###
+    a = Table("public", "a")
+    pg_conn = pg_conn_factory()
+    _execute_query(pg_conn, f"create table {a.to_string()} (id serial, val int)")
+    _insert_bulk(pg_conn, f"insert into {a.to_string()} (val) values(%s)", [[i] for i in range(0, 100)])
+    checkpoint = Checkpoint(db_adapter=PgAdapter(use_template_database=True, maintenance_conn_factory=pg_maintenance_conn_factory), reseed_identity=True)
+    checkpoint.reset(pg_conn)
+    pg_conn = pg_conn_factory()
+    _insert_bulk(pg_conn, f"insert into {a.to_string()} (val) values(%s)", [[i] for i in range(0, 100)])
+
+    ### Act ###
+    checkpoint.reset(pg_conn)
+    pg_conn = pg_conn_factory()
+    _execute_query(pg_conn, f"insert into {a.to_string()} (val) values(1234)")
+
+    ### Assert ###
+    assert pg_conn.closed == 0, "Reconnecting after a template reset failed"
+    assert _execute_scalar(pg_conn, f"select count(1) from {a.to_string()}") == 1, "Database was not restored from the template"
+    assert _execute_scalar(pg_conn, f"select max(id) from {a.to_string()}") == 1, "Serial was not restored from the template"
+    pg_conn.close()
+
+
+def test_pg_baseline_reset(pg_conn):
+    ### Arrange ###
+    ref = Table("public", "ref")
+    a = Table("public", "a")
+    _execute_query(pg_conn, f"create table {ref.to_string()} (id serial primary key, val int)")
+    _execute_query(pg_conn, f"create table {a.to_string()} (id serial, ref_id int references {ref.to_string()} (id))")
+    _insert_bulk(pg_conn, f"insert into {ref.to_string()} (val) values(%s)", [[i] for i in range(0, 100)])
+    checkpoint = Checkpoint(db_adapter=PgAdapter(), reseed_identity=True, baseline_tables=["ref"])
+    for _ in range(0, 2):
+        _execute_query(pg_conn, f"insert into {ref.to_string()} (val) values(1234)")
+        _execute_query(pg_conn, f"insert into {a.to_string()} (ref_id) select id from {ref.to_string()}")
+
+        ### Act ###
+        checkpoint.reset(pg_conn)
+
+    _execute_query(pg_conn, f"insert into {ref.to_string()} (val) values(1234)")
+
+    ### Assert ###
+    assert _execute_scalar(pg_conn, f"select count(1) from {a.to_string()}") == 0, "All records were not deleted"
+    assert _execute_scalar(pg_conn, f"select count(1) from {ref.to_string()} where val < 100") == 100, "Baseline was not restored"
+    assert _execute_scalar(pg_conn, f"select max(id) from {ref.to_string()}") == 101, "Sequence was not moved past the baseline"
+
+def test_pg_savepoint_reset_syncs_baseline_identity(pg_conn):
+    ### Arrange ###
+    ref = Table("public", "ref")
+    _execute_query(pg_conn, f"create table {ref.to_string()} (id serial primary key, val int)")
+    _insert_bulk(pg_conn, f"insert into {ref.to_string()} (val) values(%s)", [[i] for i in range(0, 100)])
+    checkpoint = Checkpoint(db_adapter=PgAdapter(), reseed_identity=True, baseline_tables=["ref"])
+    checkpoint.begin(pg_conn)
+    _execute_query(pg_conn, f"insert into {ref.to_string()} (val) values(1234)")
+
+    ### Act ###
+    checkpoint.reset(pg_conn)
+    _execute_query(pg_conn, f"insert into {ref.to_string()} (val) values(1234)")
+
+    ### Assert ###
+    assert _execute_scalar(pg_conn, f"select count(1) from {ref.to_string()}") == 101, "Baseline was not kept by the rollback"
+    assert _execute_scalar(pg_conn, f"select max(id) from {ref.to_string()}") == 101, "Sequence was not synced to the baseline"
+
+def test_pg_baseline_reset_only_reloads_changed_tables(pg_conn):
+    ### Arrange ###
+    ref = Table("public", "ref")
+    lookup = Table("public", "lookup")
+    _execute_query(pg_conn, f"create table {ref.to_string()} (id int primary key, val int)")
+    _execute_query(pg_conn, f"create table {lookup.to_string()} (id int primary key, val int)")
+    for t in [ref, lookup]:
+        _insert_bulk(pg_conn, f"insert into {t.to_string()} (id, val) values(%s, %s)", [[i, i] for i in range(0, 100)])
+    checkpoint = Checkpoint(db_adapter=PgAdapter(), baseline_tables=["ref", "lookup"])
+    checkpoint.reset(pg_conn)
+    ref_filenode = _execute_scalar(pg_conn, f"select pg_relation_filenode('{ref.to_string()}')")
+    lookup_filenode = _execute_scalar(pg_conn, f"select pg_relation_filenode('{lookup.to_string()}')")
+    _execute_query(pg_conn, f"update {lookup.to_string()} set val = val + 1 where id = 50")
+
+    ### Act ###
+    checkpoint.reset(pg_conn)
+
+    ### Assert ###
+    assert _execute_scalar(pg_conn, f"select pg_relation_filenode('{ref.to_string()}')") == ref_filenode, "Unchanged baseline table was reloaded"
+    assert _execute_scalar(pg_conn, f"select pg_relation_filenode('{lookup.to_string()}')") != lookup_filenode, "Changed baseline table was not reloaded"
+    assert _execute_scalar(pg_conn, f"select val from {lookup.to_string()} where id = 50") == 50, "Changed baseline table was not restored"
+
+def test_pg_compile_reset(pg_conn):
+    ### Arrange ###
+    a = Table("public", "a")
+    b = Table("public", "b")
+    _execute_query(pg_conn, f"CREATE TABLE {a.to_string()} (id INT GENERATED ALWAYS AS IDENTITY(START WITH 4 INCREMENT BY 7) PRIMARY KEY, Val INT)")
+    _execute_query(pg_conn, f"CREATE TABLE {b.to_string()} (id serial, a_id INT REFERENCES {a.to_string()} (id))")
+    checkpoint = Checkpoint(db_adapter=PgAdapter(), reseed_identity=True, compile_reset=True)
+    for _ in range(0, 2):
+        _insert_bulk(pg_conn, f"INSERT INTO {a.to_string()} (Val) values(%s)", [[i] for i in range(0, 100)])
+        _execute_query(pg_conn, f"INSERT INTO {b.to_string()} (a_id) SELECT id FROM {a.to_string()}")
+
+        ### Act ###
+        checkpoint.reset(pg_conn)
+
+    _execute_query(pg_conn, f"insert into {a.to_string()} (val) values(1234)")
+    _execute_query(pg_conn, f"insert into {b.to_string()} (a_id) values(4)")
+
+    ### Assert ###
+    assert _execute_scalar(pg_conn, f"select count(1) from pg_proc p join pg_namespace n on n.oid = p.pronamespace where n.nspname = 'pyspawn' and p.proname like 'reset_%'") == 1, "Reset function was not compiled exactly once"
+    assert _execute_scalar(pg_conn, f"select max(id) from {a.to_string()}") == 4, "Identity did not reset correctly"
+    assert _execute_scalar(pg_conn, f"select max(id) from {b.to_string()}") == 1, "Serial did not reset correctly"
+
+
+def test_pg_compile_reset_after_migration(pg_conn):
+    ### Arrange ###
+    a = Table("public", "a")
+    b = Table("public", "b")
+    _create_table(pg_conn, a)
+    checkpoint = Checkpoint(db_adapter=PgAdapter(), compile_reset=True)
+    checkpoint.reset(pg_conn)
+    _create_table(pg_conn, b)
+    _create_foreign_key_relationship(pg_conn, b, a)
+    _insert_bulk(pg_conn, f"INSERT INTO {a.to_string()}(id) values(%s)", [[i] for i in range(0, 100)])
+    _insert_bulk(pg_conn, f"INSERT INTO {b.to_string()}(id, val) values(%s, %s)", [[i, i] for i in range(0, 100)])
+
+    ### Act ###
+    checkpoint.reset(pg_conn)
+
+    ### Assert ###
+    for t in [a, b]:
+        assert _execute_scalar(pg_conn, f"SELECT COUNT(1) FROM {t.to_string()}") == 0, "All records were not deleted"
+    assert _execute_scalar(pg_conn, f"select count(1) from pg_proc p join pg_namespace n on n.oid = p.pronamespace where n.nspname = 'pyspawn' and p.proname like 'reset_%'") == 1, "Superseded reset function was not dropped"
+
+
+def test_pg_skip_empty_tables(pg_conn):
+    ### Arrange ###
+    a = Table("public", "a")
+    b = Table("public", "b")
+    c = Table("public", "c")
+    _execute_query(pg_conn, f"create table {a.to_string()} (id serial primary key, val int)")
+    _execute_query(pg_conn, f"create table {b.to_string()} (id serial, a_id int references {a.to_string()} (id))")
+    _execute_query(pg_conn, f"create table {c.to_string()} (id serial, val int)")
+    _insert_bulk(pg_conn, f"insert into {a.to_string()} (val) values(%s)", [[i] for i in range(0, 100)])
+    _execute_query(pg_conn, f"insert into {b.to_string()} (a_id) select id from {a.to_string()}")
+    _execute_query(pg_conn, f"insert into {c.to_string()} (val) values(1)")
+    _execute_query(pg_conn, f"delete from {c.to_string()}")
+
+    ### Act ###
+    checkpoint = Checkpoint(db_adapter=PgAdapter(), reseed_identity=True, skip_empty_tables=True)
+    checkpoint.reset(pg_conn)
+    _execute_query(pg_conn, f"insert into {c.to_string()} (val) values(1234)")
+
+    ### Assert ###
+    assert _execute_scalar(pg_conn, f"select count(1) from {a.to_string()}") == 0, "Non-empty table was not deleted"
+    assert _execute_scalar(pg_conn, f"select count(1) from {b.to_string()}") == 0, "Non-empty table was not deleted"
+    assert _execute_scalar(pg_conn, f"select max(id) from {c.to_string()}") == 1, "Serial of empty table was not reseeded"
+
+
+def test_pg_cost_planner(pg_conn):
+    ### Arrange ###
+    a = Table("public", "a")
+    b = Table("public", "b")
+    _create_table(pg_conn, a)
+    _create_table(pg_conn, b)
+    _create_foreign_key_relationship(pg_conn, a, b)
+    _insert_bulk(pg_conn, f"INSERT INTO {b.to_string()}(id) values(%s)", [[i] for i in range(0, 10000)])
+    _insert_bulk(pg_conn, f"INSERT INTO {a.to_string()}(id, val) values(%s, %s)", [[i, i] for i in range(0, 10)])
+    _execute_query(pg_conn, f"ANALYZE {a.to_string()}, {b.to_string()}")
+    checkpoint = Checkpoint(db_adapter=PgAdapter(), cost_planner=CostPlanner(truncate_cost=10))
+
+    ### Act ###
+    reset_plan = checkpoint.explain_reset(pg_conn)
+    checkpoint.reset(pg_conn)
+
+    ### Assert ###
+    assert reset_plan.get_tables(TRUNCATE) == [a, b], "Large table and the table referencing it were not planned as truncated"
+    assert reset_plan.estimated_cost > 0, "Reset plan has no estimated cost"
+    for t in [a, b]:
+        assert _execute_scalar(pg_conn, f"SELECT COUNT(1) FROM {t.to_string()}") == 0, "All records were not deleted"
+
+
+def test_pg_refresh_after_migration(pg_conn):
+    ### Arrange ###
+    a = Table("public", "a")
+    b = Table("public", "b")
+    c = Table("public", "c")
+    _create_table(pg_conn, a)
+    _create_table(pg_conn, c)
+    checkpoint = Checkpoint(db_adapter=PgAdapter())
+    checkpoint.reset(pg_conn)
+    _create_table(pg_conn, b)
+    _create_foreign_key_relationship(pg_conn, b, a)
+    _insert_bulk(pg_conn, f"INSERT INTO {a.to_string()}(id) values(%s)", [[i] for i in range(0, 100)])
+    _insert_bulk(pg_conn, f"INSERT INTO {b.to_string()}(id, val) values(%s, %s)", [[i, i] for i in range(0, 100)])
+
+    ### Act ###
+    changed = checkpoint.refresh(pg_conn)
+    unchanged = checkpoint.refresh(pg_conn)
+    checkpoint.reset(pg_conn)
+
+    ### Assert ###
+    assert changed and not unchanged, "Migration was not detected"
+    assert checkpoint._graph_builder.to_delete == [c, b, a], "Plan was not patched"
+    for t in [a, b]:
+        assert _execute_scalar(pg_conn, f"SELECT COUNT(1) FROM {t.to_string()}") == 0, "All records were not deleted"
+
+
+def test_pg_refresh_after_identity_migration(pg_conn):
+    ### Arrange ###
+    a = Table("public", "a")
+    _execute_query(pg_conn, f"CREATE TABLE {a.to_string()} (id INT GENERATED ALWAYS AS IDENTITY(START WITH 4 INCREMENT BY 7) PRIMARY KEY, val INT)")
+    checkpoint = Checkpoint(db_adapter=PgAdapter(), reseed_identity=True)
+    checkpoint.reset(pg_conn)
+    _execute_query(pg_conn, f"ALTER TABLE {a.to_string()} ALTER COLUMN id SET START WITH 10 SET INCREMENT BY 5")
+    _execute_query(pg_conn, f"INSERT INTO {a.to_string()} (val) values(1)")
+
+    ### Act ###
+    changed = checkpoint.refresh(pg_conn)
+    checkpoint.reset(pg_conn)
+    _execute_query(pg_conn, f"INSERT INTO {a.to_string()} (val) values(1)")
+
+    ### Assert ###
+    assert changed, "Identity migration was not detected"
+    assert _execute_scalar(pg_conn, f"SELECT id FROM {a.to_string()}") == 10, "Identity was not reseeded to the migrated start value"
+
+
+def test_pg_schema_fingerprint_ignores_dirty_tracking(pg_conn):
+    ### Arrange ###
+    a = Table("public", "a")
+    _create_table(pg_conn, a)
+    checkpoint = Checkpoint(db_adapter=PgAdapter(), track_dirty_tables=True)
+    fingerprint = checkpoint._get_schema_fingerprint(pg_conn)
+
+    ### Act ###
+    checkpoint.reset(pg_conn)
+
+    ### Assert ###
+    assert checkpoint._dirty_tracking_installed, "Dirty tracking was not installed"
+    assert checkpoint._get_schema_fingerprint(pg_conn) == fingerprint, "Dirty tracking moved the schema fingerprint"
+
+
+def test_pg_detect_schema_changes(pg_conn):
+    ### Arrange ###
+    a = Table("public", "a")
+    b = Table("public", "b")
+    _create_table(pg_conn, a)
+    checkpoint = Checkpoint(db_adapter=PgAdapter(), track_dirty_tables=True, detect_schema_changes=True)
+    checkpoint.reset(pg_conn)
+    checkpoint.reset(pg_conn)
+    _create_table(pg_conn, b)
+    _create_foreign_key_relationship(pg_conn, b, a)
+    _insert_bulk(pg_conn, f"INSERT INTO {a.to_string()}(id) values(%s)", [[i] for i in range(0, 100)])
+    _insert_bulk(pg_conn, f"INSERT INTO {b.to_string()}(id, val) values(%s, %s)", [[i, i] for i in range(0, 100)])
+
+    ### Act ###
+    checkpoint.reset(pg_conn)
+
+    ### Assert ###
+    assert checkpoint._graph_builder.to_delete == [b, a], "Plan was not refreshed"
+    for t in [a, b]:
+        assert _execute_scalar(pg_conn, f"SELECT COUNT(1) FROM {t.to_string()}") == 0, "All records were not deleted"
+
+
+def test_pg_same_constraint_name_in_two_schemas(pg_conn):
+    ### Arrange ###
+    _create_schema(pg_conn, "tenant_1")
+    _create_schema(pg_conn, "tenant_2")
+    tables = []
+    for schema in ["tenant_1", "tenant_2"]:
+        a = Table(schema, "a")
+        b = Table(schema, "b")
+        _create_table(pg_conn, a)
+        _create_table(pg_conn, b)
+        _create_foreign_key_relationship(pg_conn, b, a)
+        _insert_bulk(pg_conn, f"INSERT INTO {a.to_string()}(id) values(%s)", [[i] for i in range(0, 100)])
+        _insert_bulk(pg_conn, f"INSERT INTO {b.to_string()}(id, val) values(%s, %s)", [[i, i] for i in range(0, 100)])
+        tables += [a, b]
+    checkpoint = Checkpoint(db_adapter=PgAdapter(), schemas_to_include=["tenant_1", "tenant_2"])
+
+    ### Act ###
+    checkpoint.reset(pg_conn)
+
+    ### Assert ###
+    relationships = [r for t in checkpoint._graph_builder.to_delete for r in t.relationships]
+    assert len(relationships) == 2, "Foreign keys with the same name were mixed up between schemas"
+    assert all([r.parent_table.schema == r.referenced_table.schema for r in relationships]), "Foreign keys with the same name were mixed up between schemas"
+    for t in tables:
+        assert _execute_scalar(pg_conn, f"SELECT COUNT(1) FROM {t.to_string()}") == 0, "All records were not deleted"
+
+
+def test_pg_partitioned_tables_are_reset_through_their_parent(pg_conn):
+    ### Arrange ###
+    events = Table("public", "events")
+    readers = Table("public", "readers")
+    _execute_query(pg_conn, f"CREATE TABLE {events.to_string()} (id int NOT NULL PRIMARY KEY, val int) PARTITION BY RANGE (id)")
+    for i in range(0, 4):
+        _execute_query(pg_conn, f"CREATE TABLE public.events_{i} PARTITION OF {events.to_string()} FOR VALUES FROM ({i * 100}) TO ({(i + 1) * 100})")
+    _create_table(pg_conn, readers)
+    _create_foreign_key_relationship(pg_conn, readers, events)
+    _insert_bulk(pg_conn, f"INSERT INTO {events.to_string()}(id) values(%s)", [[i] for i in range(0, 150)])
+    _insert_bulk(pg_conn, f"INSERT INTO {readers.to_string()}(id, val) values(%s, %s)", [[i, i] for i in range(0, 150)])
+    checkpoint = Checkpoint(db_adapter=PgAdapter(), skip_empty_tables=True, track_dirty_tables=True)
+
+    ### Act ###
+    checkpoint.reset(pg_conn)
+    _execute_query(pg_conn, "INSERT INTO public.events_3(id) values(350)")
+    dirty_tables = checkpoint._get_tables_to_reset(pg_conn)
+    checkpoint.reset(pg_conn)
+
+    ### Assert ###
+    assert checkpoint._graph_builder.to_delete == [readers, events], "Partitions were planned as tables of their own"
+    assert events in dirty_tables, "A write to a partition did not mark the partitioned table dirty"
+    assert _execute_scalar(pg_conn, f"SELECT COUNT(1) FROM {events.to_string()}") == 0, "All records were not deleted"
+    assert _execute_scalar(pg_conn, f"SELECT COUNT(1) FROM {readers.to_string()}") == 0, "All records were not deleted"
+
+
+def test_pg_reseed_owned_and_shared_sequences(pg_conn):
+    ### Arrange ###
+    _execute_query(pg_conn, "CREATE SEQUENCE public.shared_seq START WITH 1000")
+    _execute_query(pg_conn, "CREATE TABLE public.a (id serial PRIMARY KEY, shared int NOT NULL DEFAULT nextval('public.shared_seq'))")
+    _execute_query(pg_conn, "CREATE TABLE public.b (id int GENERATED ALWAYS AS IDENTITY (START WITH 10 INCREMENT BY 5) PRIMARY KEY, shared int NOT NULL DEFAULT nextval('public.shared_seq'))")
+    _execute_query(pg_conn, "ALTER SEQUENCE public.a_id_seq RENAME TO renamed_seq")
+    for i in range(0, 10):
+        _execute_query(pg_conn, "INSERT INTO public.a DEFAULT VALUES; INSERT INTO public.b DEFAULT VALUES;")
+    checkpoint = Checkpoint(db_adapter=PgAdapter(), reseed_identity=True)
+
+    ### Act ###
+    checkpoint.reset(pg_conn)
+    _execute_query(pg_conn, "INSERT INTO public.a DEFAULT VALUES")
+    _execute_query(pg_conn, "INSERT INTO public.b DEFAULT VALUES")
+
+    ### Assert ###
+    assert "restart identity" in checkpoint._delete_sql, "Owned sequences were not restarted by the truncate"
+    assert "renamed_seq" not in checkpoint._reseed_sql, "An owned sequence was reseeded explicitly"
+    assert _execute_scalar(pg_conn, "SELECT id FROM public.a") == 1, "Renamed serial sequence was not restarted"
+    assert _execute_scalar(pg_conn, "SELECT id FROM public.b") == 10, "Identity was not restarted"
+    assert _execute_scalar(pg_conn, "SELECT shared FROM public.a") == 1000, "Shared sequence was not reseeded"
+    assert _execute_scalar(pg_conn, "SELECT shared FROM public.b") == 1001, "Shared sequence was not reseeded"
+
+
+def test_pg_savepoint_reset(pg_conn):
+    ### Arrange ###
+    a = Table("public", "a")
+    b = Table("public", "b")
+    _create_table(pg_conn, a)
+    _create_table(pg_conn, b)
+    _create_foreign_key_relationship(pg_conn, b, a)
+    checkpoint = Checkpoint(db_adapter=PgAdapter())
+    checkpoint.begin(pg_conn)
+    transaction_id = checkpoint._savepoint_transaction_id
+    _insert_bulk(pg_conn, f"INSERT INTO {a.to_string()}(id) values(%s)", [[i] for i in range(0, 100)])
+    _insert_bulk(pg_conn, f"INSERT INTO {b.to_string()}(id, val) values(%s, %s)", [[i, i] for i in range(0, 100)])
+
+    ### Act ###
+    checkpoint.reset(pg_conn)
+
+    ### Assert ###
+    assert checkpoint._savepoint_transaction_id == transaction_id, "Reset did not roll back to the savepoint"
+    for t in [a, b]:
+        assert _execute_scalar(pg_conn, f"SELECT COUNT(1) FROM {t.to_string()}") == 0, "All records were not rolled back"
+
+
+def test_pg_savepoint_reset_syncs_identity_of_non_empty_tables(pg_conn):
+    ### Arrange ###
+    a = Table("public", "a")
+    _execute_query(pg_conn, f"create table {a.to_string()} (id serial primary key, val int)")
+    _insert_bulk(pg_conn, f"insert into {a.to_string()} (val) values(%s)", [[i] for i in range(0, 100)])
+    checkpoint = Checkpoint(db_adapter=PgAdapter(), reseed_identity=True)
+    checkpoint.begin(pg_conn)
+    _execute_query(pg_conn, f"insert into {a.to_string()} (val) values(1234)")
+
+    ### Act ###
+    checkpoint.reset(pg_conn)
+    _execute_query(pg_conn, f"insert into {a.to_string()} (val) values(1234)")
+
+    ### Assert ###
+    assert _execute_scalar(pg_conn, f"select max(id) from {a.to_string()}") == 101, "Sequence was not synced past the rows kept by the rollback"
+
+
+def test_pg_savepoint_reset_falls_back_after_commit_and_other_connections(pg_conn, pg_conn_factory):
+    ### Arrange ###
+    a = Table("public", "a")
+    b = Table("public", "b")
+    _create_table(pg_conn, a)
+    _create_table(pg_conn, b)
+    checkpoint = Checkpoint(db_adapter=PgAdapter())
+    checkpoint.begin(pg_conn)
+    _insert_bulk(pg_conn, f"INSERT INTO {a.to_string()}(id) values(%s)", [[i] for i in range(0, 100)])
+    pg_conn.commit()
+    other_conn = pg_conn_factory()
+    _insert_bulk(other_conn, f"INSERT INTO {b.to_string()}(id) values(%s)", [[i] for i in range(0, 100)])
+    other_conn.close()
+
+    ### Act ###
+    checkpoint.reset(pg_conn)
+    counts = [_execute_scalar(pg_conn, f"SELECT COUNT(1) FROM {t.to_string()}") for t in [a, b]]
+    checkpoint.begin(pg_conn)
+    other_conn = pg_conn_factory()
+    _insert_bulk(other_conn, f"INSERT INTO {b.to_string()}(id) values(%s)", [[i] for i in range(0, 100)])
+    other_conn.close()
+    checkpoint.reset(pg_conn)
+
+    ### Assert ###
+    assert counts == [0, 0], "Committed records were not deleted"
+    assert _execute_scalar(pg_conn, f"SELECT COUNT(1) FROM {b.to_string()}") == 0, "Records of another connection were not deleted"
+    assert not pg_conn.autocommit and checkpoint._savepoint_transaction_id is not None, "Connection was not left at a new savepoint"
+
+
+def test_pg_savepoint_reset_does_not_block_other_connections(pg_conn, pg_conn_factory):
+    ### Arrange ###
+    a = Table("public", "a")
+    _create_table(pg_conn, a)
+    checkpoint = Checkpoint(db_adapter=PgAdapter())
+    checkpoint.begin(pg_conn)
+    _insert_bulk(pg_conn, f"INSERT INTO {a.to_string()}(id) values(%s)", [[i] for i in range(0, 100)])
+
+    def insert_from_other_connection():
+        other_conn = pg_conn_factory()
+        _insert_bulk(other_conn, f"INSERT INTO {a.to_string()}(id) values(%s)", [[i] for i in range(100, 200)])
+        other_conn.close()
+
+    ### Act ###
+    other = threading.Thread(target=insert_from_other_connection)
+    other.start()
+    other.join(timeout=10)
+    blocked = other.is_alive()
+    checkpoint.reset(pg_conn)
+    other.join()
+
+    ### Assert ###
+    assert not blocked, "Write of another connection waited for the savepoint transaction"
+    assert _execute_scalar(pg_conn, f"SELECT COUNT(1) FROM {a.to_string()}") == 0, "Records of another connection were not deleted"
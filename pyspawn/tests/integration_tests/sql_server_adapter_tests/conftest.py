@@ -1,16 +1,19 @@
 import os
 from pytest import fixture
 import pyodbc
+import aioodbc
 
 @fixture()
 def nuke_sql_server():
     """Server is DNS resolved to service name of MS SQL-container"""
+    q0 = "DROP DATABASE IF EXISTS [SqlServerTests_pyspawn_snapshot];"
     q1 = "IF EXISTS (SELECT name FROM master.dbo.sysdatabases WHERE name = N'SqlServerTests') alter database SqlServerTests set single_user with rollback immediate;"
     q2 = "DROP DATABASE IF EXISTS [SqlServerTests];"
     q3 = "CREATE DATABASE [SqlServerTests];"
     with pyodbc.connect(f"DRIVER=ODBC Driver 17 for SQL Server;SERVER=mssql;DATABASE=tempdb;UID=sa;PWD={os.getenv('MSSQL_PWD')}") as conn:
         conn.autocommit  = True
         with conn.cursor() as cur:
+            cur.execute(q0)
             cur.execute(q1)
             cur.execute(q2)
             cur.execute(q3)
@@ -18,4 +21,25 @@ def nuke_sql_server():
 @fixture()
 def sql_server_conn(nuke_sql_server):
     """Server is DNS resolved to service name of MS SQL-container"""
-    return pyodbc.connect(f"DRIVER=ODBC Driver 17 for SQL Server;SERVER=mssql;DATABASE=SqlServerTests;UID=sa;PWD={os.getenv('MSSQL_PWD')}", autocommit=True)
\ No newline at end of file
+    return pyodbc.connect(f"DRIVER=ODBC Driver 17 for SQL Server;SERVER=mssql;DATABASE=SqlServerTests;UID=sa;PWD={os.getenv('MSSQL_PWD')}", autocommit=True)
+
+@fixture()
+def sql_server_conn_factory(nuke_sql_server):
+    """Returns a function that opens a new autocommit connection to the testing DB."""
+    def factory():
+        return pyodbc.connect(f"DRIVER=ODBC Driver 17 for SQL Server;SERVER=mssql;DATABASE=SqlServerTests;UID=sa;PWD={os.getenv('MSSQL_PWD')}", autocommit=True)
+    return factory
+
+@fixture()
+def sql_server_maintenance_conn_factory():
+    """Returns a function that opens a new autocommit connection to the master DB, used to snapshot and revert the testing DB."""
+    def factory():
+        return pyodbc.connect(f"DRIVER=ODBC Driver 17 for SQL Server;SERVER=mssql;DATABASE=master;UID=sa;PWD={os.getenv('MSSQL_PWD')}", autocommit=True)
+    return factory
+
+@fixture()
+def sql_server_async_conn_factory(nuke_sql_server):
+    """Returns a coroutine function that opens a new autocommit aioodbc connection to the testing DB."""
+    async def factory():
+        return await aioodbc.connect(dsn=f"DRIVER=ODBC Driver 17 for SQL Server;SERVER=mssql;DATABASE=SqlServerTests;UID=sa;PWD={os.getenv('MSSQL_PWD')}", autocommit=True)
+    return factory
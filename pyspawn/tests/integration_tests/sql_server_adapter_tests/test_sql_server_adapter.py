@@ -1,7 +1,10 @@
+import threading
+
 from pyspawn import Checkpoint
 from pyspawn.adapters import SqlServerAdapter
 from pyspawn._graph.table import Table
 from pyspawn._graph.temporal_table import TemporalTable
+from pyspawn._graph.cost_planner import CostPlanner, TRUNCATE, DELETE, BATCHED_DELETE
 
 from pyspawn.tests.integration_tests.sql_server_adapter_tests._mssql_utilities import (
     _execute_query,
@@ -12,6 +15,7 @@ from pyspawn.tests.integration_tests.sql_server_adapter_tests._mssql_utilities i
     _create_foreign_key_relationship,
     _create_temporal_table
 )
+from pyspawn.tests._async_utilities import _run
 
 
 def test_mssql_connection(sql_server_conn):
@@ -390,24 +394,24 @@ def test_mssql_reseed_identity_non_default_start_value(sql_server_conn):
     assert _execute_scalar(sql_server_conn,  f"SELECT MAX(id) FROM {a.to_string()}") == identity_start_value, "Wrong reseed of Identity compared to initial seed value"
 
 
-# def test_mssql_reseed_identity_non_default_increment_value(sql_server_conn):
-#     ### Arrange ###
-#     a = Table("dbo", "A")
-#     identity_start_value: int = 4
-#     identity_increment_value: int = 7
-#     _execute_query(sql_server_conn, f"CREATE TABLE {a.to_string()} (Id INT IDENTITY({identity_start_value},{identity_increment_value}), Val INT)")
-#     _insert_bulk(sql_server_conn, f"INSERT INTO {a.to_string()} (Val) values(?)", [[i] for i in range(0, 100)])
-#     inserted_a = _execute_scalar(sql_server_conn,  f"SELECT COUNT(1) FROM {a.to_string()}")
-#
-#     ### Act ###
-#     checkpoint = Checkpoint(db_adapter=SqlServerAdapter(), reseed_identity=True)
-#     checkpoint.reset(sql_server_conn)
-#     _execute_query(sql_server_conn, f"INSERT INTO {a.to_string()} (Val) values(1234)")
-#     _execute_query(sql_server_conn, f"INSERT INTO {a.to_string()} (Val) values(4321)")
-#
-#     ### Assert ###
-#     assert inserted_a == 100, "100 records were not inserted to DB"
-#     assert _execute_scalar(sql_server_conn,  f"SELECT MAX(id) FROM {a.to_string()}") == (identity_start_value + identity_increment_value), "Wrong reseed of Identity compared to initial seed value"
+def test_mssql_reseed_identity_non_default_increment_value(sql_server_conn):
+    ### Arrange ###
+    a = Table("dbo", "A")
+    identity_start_value: int = 4
+    identity_increment_value: int = 7
+    _execute_query(sql_server_conn, f"CREATE TABLE {a.to_string()} (Id INT IDENTITY({identity_start_value},{identity_increment_value}), Val INT)")
+    _insert_bulk(sql_server_conn, f"INSERT INTO {a.to_string()} (Val) values(?)", [[i] for i in range(0, 100)])
+    inserted_a = _execute_scalar(sql_server_conn,  f"SELECT COUNT(1) FROM {a.to_string()}")
+
+    ### Act ###
+    checkpoint = Checkpoint(db_adapter=SqlServerAdapter(), reseed_identity=True)
+    checkpoint.reset(sql_server_conn)
+    _execute_query(sql_server_conn, f"INSERT INTO {a.to_string()} (Val) values(1234)")
+    _execute_query(sql_server_conn, f"INSERT INTO {a.to_string()} (Val) values(4321)")
+
+    ### Assert ###
+    assert inserted_a == 100, "100 records were not inserted to DB"
+    assert _execute_scalar(sql_server_conn,  f"SELECT MAX(id) FROM {a.to_string()}") == (identity_start_value + identity_increment_value), "Wrong reseed of Identity compared to initial seed value"
 
 
 def test_mssql_reseed_identity_non_default_start_value_with_schema(sql_server_conn):
@@ -518,4 +522,528 @@ def test_mssql_delete_temporal_tables_data_different_table_schemas(sql_server_co
     assert records_at == 1, "Records in main table not as expected"
     assert records_ath == 2, "Records in history table not as expected"
     assert _execute_scalar(sql_server_conn, f"SELECT COUNT(1) FROM {at.table_to_string()}") == 0, "Records were not deleted from temporal table"
-    assert _execute_scalar(sql_server_conn, f"SELECT COUNT(1) FROM {at.history_table_to_string()}") == 0, "Records were not deleted from temporal history table"
\ No newline at end of file
+    assert _execute_scalar(sql_server_conn, f"SELECT COUNT(1) FROM {at.history_table_to_string()}") == 0, "Records were not deleted from temporal history table"
+
+
+def test_mssql_plan_cache_warm_start(sql_server_conn, tmp_path):
+    ### Arrange ###
+    a = Table("dbo", "A")
+    b = Table("dbo", "B")
+    plan_cache_path = str(tmp_path / "plan.json")
+    _create_table(sql_server_conn, a)
+    _create_table(sql_server_conn, b)
+    _create_foreign_key_relationship(sql_server_conn, a, b)
+    Checkpoint(db_adapter=SqlServerAdapter(), plan_cache_path=plan_cache_path).reset(sql_server_conn)
+    _insert_bulk(sql_server_conn, f"INSERT INTO {b.to_string()}(Id) values(?)", [[i] for i in range(0, 100)])
+    _insert_bulk(sql_server_conn, f"INSERT INTO {a.to_string()}(Id, Val) values(?, ?)", [[i, i] for i in range(0, 100)])
+
+    ### Act ###
+    checkpoint = Checkpoint(db_adapter=SqlServerAdapter(), plan_cache_path=plan_cache_path)
+    checkpoint.reset(sql_server_conn)
+
+    ### Assert ###
+    assert checkpoint._graph_builder.to_delete == [a, b], "Cached delete order was not restored"
+    assert _execute_scalar(sql_server_conn, f"SELECT COUNT(1) FROM {a.to_string()}") == 0, "All records were not deleted"
+    assert _execute_scalar(sql_server_conn, f"SELECT COUNT(1) FROM {b.to_string()}") == 0, "All records were not deleted"
+    sql_server_conn.close()
+
+
+
+def test_mssql_plan_cache_invalidated_by_ddl(sql_server_conn, tmp_path):
+    ### Arrange ###
+    a = Table("dbo", "A")
+    b = Table("dbo", "B")
+    plan_cache_path = str(tmp_path / "plan.json")
+    _create_table(sql_server_conn, a)
+    Checkpoint(db_adapter=SqlServerAdapter(), plan_cache_path=plan_cache_path).reset(sql_server_conn)
+    _create_table(sql_server_conn, b)
+    _insert_bulk(sql_server_conn, f"INSERT INTO {b.to_string()}(Id) values(?)", [[i] for i in range(0, 100)])
+
+    ### Act ###
+    checkpoint = Checkpoint(db_adapter=SqlServerAdapter(), plan_cache_path=plan_cache_path)
+    checkpoint.reset(sql_server_conn)
+
+    ### Assert ###
+    assert _execute_scalar(sql_server_conn, f"SELECT COUNT(1) FROM {b.to_string()}") == 0, "Stale cached plan was used after DDL change"
+    sql_server_conn.close()
+
+
+
+def test_mssql_track_dirty_tables_only_resets_written_tables(sql_server_conn):
+    ### Arrange ###
+    a = Table("dbo", "A")
+    b = Table("dbo", "B")
+    _create_table(sql_server_conn, a)
+    _create_table(sql_server_conn, b)
+    checkpoint = Checkpoint(db_adapter=SqlServerAdapter(), track_dirty_tables=True)
+    checkpoint.reset(sql_server_conn)
+    _execute_query(sql_server_conn, f"DISABLE TRIGGER [dbo].[pyspawn_track_dirty_B] ON {b.to_string()}")
+    _insert_bulk(sql_server_conn, f"INSERT INTO {a.to_string()}(Id) values(?)", [[i] for i in range(0, 100)])
+    _insert_bulk(sql_server_conn, f"INSERT INTO {b.to_string()}(Id) values(?)", [[i] for i in range(0, 100)])
+
+    ### Act ###
+    checkpoint.reset(sql_server_conn)
+
+    ### Assert ###
+    assert _execute_scalar(sql_server_conn, f"SELECT COUNT(1) FROM {a.to_string()}") == 0, "Written table was not reset"
+    assert _execute_scalar(sql_server_conn, f"SELECT COUNT(1) FROM {b.to_string()}") == 100, "Untracked table was reset"
+    assert _execute_scalar(sql_server_conn, "SELECT COUNT(1) FROM [pyspawn].[dirty_tables]") == 0, "Tracking table was not cleared"
+    sql_server_conn.close()
+
+
+
+def test_mssql_track_dirty_tables_temporal_table(sql_server_conn):
+    ### Arrange ###
+    at = TemporalTable("dbo", "Foo", "dbo", "FooHistory")
+    _create_temporal_table(sql_server_conn, at)
+    checkpoint = Checkpoint(db_adapter=SqlServerAdapter(), check_temporal_table=True, track_dirty_tables=True)
+    checkpoint.reset(sql_server_conn)
+    _execute_query(sql_server_conn, f"INSERT INTO {at.schema}.{at.table_name} (Id) VALUES (1)")
+    _execute_query(sql_server_conn, f"UPDATE {at.schema}.{at.table_name} SET Id = 2 Where Id = 1")
+
+    ### Act ###
+    checkpoint.reset(sql_server_conn)
+
+    ### Assert ###
+    assert _execute_scalar(sql_server_conn, f"SELECT COUNT(1) FROM {at.table_to_string()}") == 0, "Records were not deleted from temporal table"
+    assert _execute_scalar(sql_server_conn, f"SELECT COUNT(1) FROM {at.history_table_to_string()}") == 0, "Records were not deleted from temporal history table"
+    sql_server_conn.close()
+
+
+
+def test_mssql_reset_parallel(sql_server_conn_factory):
+    ### Arrange ###
+    sql_server_conn = sql_server_conn_factory()
+    a = Table("dbo", "A")
+    b = Table("dbo", "B")
+    c = Table("dbo", "C")
+    d = Table("dbo", "D")
+    for t in [a, b, c, d]:
+        _create_table(sql_server_conn, t)
+    _create_foreign_key_relationship(sql_server_conn, a, b)
+    _create_foreign_key_relationship(sql_server_conn, c, d)
+    _create_foreign_key_relationship(sql_server_conn, d, c)
+    _insert_bulk(sql_server_conn, f"INSERT INTO {b.to_string()}(Id) values(?)", [[i] for i in range(0, 100)])
+    _insert_bulk(sql_server_conn, f"INSERT INTO {a.to_string()}(Id, Val) values(?, ?)", [[i, i] for i in range(0, 100)])
+    _insert_bulk(sql_server_conn, f"INSERT INTO {c.to_string()}(Id) values(?)", [[i] for i in range(0, 100)])
+    _insert_bulk(sql_server_conn, f"INSERT INTO {d.to_string()}(Id, Val) values(?, ?)", [[i, i] for i in range(0, 100)])
+
+    ### Act ###
+    checkpoint = Checkpoint(db_adapter=SqlServerAdapter())
+    checkpoint.reset_parallel(sql_server_conn_factory, max_workers=2)
+
+    ### Assert ###
+    for t in [a, b, c, d]:
+        assert _execute_scalar(sql_server_conn, f"SELECT COUNT(1) FROM {t.to_string()}") == 0, "All records were not deleted"
+    sql_server_conn.close()
+
+
+
+def test_mssql_reset_parallel_enables_constraints_after_failed_delete(sql_server_conn_factory):
+    ### Arrange ###
+    sql_server_conn = sql_server_conn_factory()
+    c = Table("dbo", "C")
+    d = Table("dbo", "D")
+    for t in [c, d]:
+        _create_table(sql_server_conn, t)
+    _create_foreign_key_relationship(sql_server_conn, c, d)
+    _create_foreign_key_relationship(sql_server_conn, d, c)
+    _insert_bulk(sql_server_conn, f"INSERT INTO {c.to_string()}(Id) values(?)", [[i] for i in range(0, 100)])
+    _insert_bulk(sql_server_conn, f"INSERT INTO {d.to_string()}(Id, Val) values(?, ?)", [[i, i] for i in range(0, 100)])
+    conns = []
+    def conn_factory():
+        conns.append(None)
+        if len(conns) > 1:
+            raise RuntimeError("connect failed")
+        return sql_server_conn_factory()
+
+    ### Act ###
+    checkpoint = Checkpoint(db_adapter=SqlServerAdapter())
+    try:
+        checkpoint.reset_parallel(conn_factory, max_workers=2)
+        raised = None
+    except RuntimeError as e:
+        raised = e
+
+    ### Assert ###
+    assert raised is not None, "Failed delete was not raised"
+    assert _execute_scalar(sql_server_conn, "SELECT COUNT(1) FROM sys.foreign_keys WHERE is_disabled = 1 OR is_not_trusted = 1") == 0, "Cyclic constraints were not enabled again"
+    sql_server_conn.close()
+
+
+
+def test_mssql_compile_reset_temporal_tables(sql_server_conn):
+    ### Arrange ###
+    at = TemporalTable("dbo", "Foo", "dbo", "FooHistory")
+    _create_temporal_table(sql_server_conn, at)
+    checkpoint = Checkpoint(db_adapter=SqlServerAdapter(), check_temporal_table=True, compile_reset=True)
+    checkpoint.reset(sql_server_conn)
+    _execute_query(sql_server_conn, f"INSERT INTO {at.schema}.{at.table_name} (Id) VALUES (1)")
+    _execute_query(sql_server_conn, f"UPDATE {at.schema}.{at.table_name} SET Id = 2 Where Id = 1")
+
+    ### Act ###
+    checkpoint.reset(sql_server_conn)
+
+    ### Assert ###
+    assert _execute_scalar(sql_server_conn, "SELECT COUNT(1) FROM sys.procedures WHERE SCHEMA_NAME(schema_id) = 'pyspawn'") == 1, "Reset procedure was not created once"
+    assert _execute_scalar(sql_server_conn, f"SELECT COUNT(1) FROM {at.table_to_string()}") == 0, "Records were not deleted from temporal table"
+    assert _execute_scalar(sql_server_conn, f"SELECT COUNT(1) FROM {at.history_table_to_string()}") == 0, "Records were not deleted from temporal history table"
+    assert _execute_scalar(sql_server_conn, f"SELECT temporal_type FROM sys.tables WHERE name = '{at.table_name}'") == 2, "System versioning was not turned back on"
+    sql_server_conn.close()
+
+
+
+def test_mssql_failed_reset_turns_system_versioning_back_on(sql_server_conn):
+    ### Arrange ###
+    at = TemporalTable("dbo", "Foo", "dbo", "FooHistory")
+    b = Table("dbo", "B")
+    _create_temporal_table(sql_server_conn, at)
+    _create_table(sql_server_conn, b)
+    _execute_query(sql_server_conn, f"ALTER TABLE {b.to_string()} ADD CONSTRAINT FK_B_REFFING_Foo FOREIGN KEY (Val) REFERENCES {at.table_to_string()} (Id)")
+    _execute_query(sql_server_conn, f"INSERT INTO {at.table_to_string()} (Id) VALUES (1)")
+    _execute_query(sql_server_conn, f"INSERT INTO {b.to_string()} (Id, Val) VALUES (1, 1)")
+
+    ### Act ###
+    checkpoint = Checkpoint(db_adapter=SqlServerAdapter(), check_temporal_table=True, tables_to_ignore=["B"])
+    try:
+        checkpoint.reset(sql_server_conn)
+        raised = False
+    except Exception:
+        raised = True
+
+    ### Assert ###
+    assert raised, "Reset did not raise the foreign key violation"
+    assert _execute_scalar(sql_server_conn, f"SELECT temporal_type FROM sys.tables WHERE name = '{at.table_name}'") == 2, "System versioning was not turned back on"
+    sql_server_conn.close()
+
+
+def test_mssql_reseed_only_moved_identities(sql_server_conn):
+    ### Arrange ###
+    a = Table("dbo", "A")
+    b = Table("dbo", "B")
+    _execute_query(sql_server_conn, f"CREATE TABLE {a.to_string()} (Id INT IDENTITY(1,1), Val INT)")
+    _execute_query(sql_server_conn, f"CREATE TABLE {b.to_string()} (Id INT IDENTITY(1,1), Val INT)")
+    _insert_bulk(sql_server_conn, f"INSERT INTO {a.to_string()} (Val) values(?)", [[i] for i in range(0, 100)])
+    checkpoint = Checkpoint(db_adapter=SqlServerAdapter(), reseed_identity=True)
+    checkpoint.reset(sql_server_conn)
+    _insert_bulk(sql_server_conn, f"INSERT INTO {b.to_string()} (Val) values(?)", [[i] for i in range(0, 100)])
+
+    ### Act ###
+    checkpoint.reset(sql_server_conn)
+    _execute_query(sql_server_conn, f"INSERT INTO {a.to_string()} (Val) values(1234)")
+    _execute_query(sql_server_conn, f"INSERT INTO {b.to_string()} (Val) values(1234)")
+
+    ### Assert ###
+    assert _execute_scalar(sql_server_conn, f"SELECT MAX(Id) FROM {a.to_string()}") == 1, "Identity of the untouched table did not stay reseeded"
+    assert _execute_scalar(sql_server_conn, f"SELECT MAX(Id) FROM {b.to_string()}") == 1, "Identity of the written table was not reseeded"
+
+
+def test_mssql_skip_empty_tables(sql_server_conn):
+    ### Arrange ###
+    a = Table("dbo", "A")
+    b = Table("dbo", "B")
+    c = Table("dbo", "C")
+    _execute_query(sql_server_conn, f"CREATE TABLE {a.to_string()} (Id INT IDENTITY(1,1) PRIMARY KEY, Val INT)")
+    _execute_query(sql_server_conn, f"CREATE TABLE {b.to_string()} (Id INT IDENTITY(1,1), AId INT REFERENCES {a.to_string()} (Id))")
+    _execute_query(sql_server_conn, f"CREATE TABLE {c.to_string()} (Id INT IDENTITY(1,1), Val INT)")
+    _insert_bulk(sql_server_conn, f"INSERT INTO {a.to_string()} (Val) values(?)", [[i] for i in range(0, 100)])
+    _execute_query(sql_server_conn, f"INSERT INTO {b.to_string()} (AId) SELECT Id FROM {a.to_string()}")
+    _execute_query(sql_server_conn, f"INSERT INTO {c.to_string()} (Val) values(1)")
+    _execute_query(sql_server_conn, f"DELETE {c.to_string()}")
+
+    ### Act ###
+    checkpoint = Checkpoint(db_adapter=SqlServerAdapter(), reseed_identity=True, skip_empty_tables=True)
+    checkpoint.reset(sql_server_conn)
+    _execute_query(sql_server_conn, f"INSERT INTO {c.to_string()} (Val) values(1234)")
+
+    ### Assert ###
+    assert _execute_scalar(sql_server_conn, f"SELECT COUNT(1) FROM {a.to_string()}") == 0, "Non-empty table was not deleted"
+    assert _execute_scalar(sql_server_conn, f"SELECT COUNT(1) FROM {b.to_string()}") == 0, "Non-empty table was not deleted"
+    assert _execute_scalar(sql_server_conn, f"SELECT MAX(Id) FROM {c.to_string()}") == 1, "Identity of empty table was not reseeded"
+
+
+def test_mssql_cost_planner(sql_server_conn):
+    ### Arrange ###
+    a = Table("dbo", "A")
+    b = Table("dbo", "B")
+    c = Table("dbo", "C")
+    for t in [a, b, c]:
+        _create_table(sql_server_conn, t)
+    _create_foreign_key_relationship(sql_server_conn, a, b)
+    _insert_bulk(sql_server_conn, f"INSERT INTO {b.to_string()}(Id) values(?)", [[i] for i in range(0, 10000)])
+    _insert_bulk(sql_server_conn, f"INSERT INTO {a.to_string()}(Id, Val) values(?, ?)", [[i, i] for i in range(0, 10)])
+    _insert_bulk(sql_server_conn, f"INSERT INTO {c.to_string()}(Id) values(?)", [[i] for i in range(0, 10000)])
+    checkpoint = Checkpoint(db_adapter=SqlServerAdapter(), cost_planner=CostPlanner(truncate_cost=10, batched_delete_threshold=1000, batch_size=3000))
+
+    ### Act ###
+    reset_plan = checkpoint.explain_reset(sql_server_conn)
+    checkpoint.reset(sql_server_conn)
+
+    ### Assert ###
+    assert reset_plan.get_tables(TRUNCATE) == [c], "Large table without inbound foreign keys was not planned as truncated"
+    assert reset_plan.get_tables(BATCHED_DELETE) == [b], "Large referenced table was not planned as batch deleted"
+    assert reset_plan.get_tables(DELETE) == [a], "Small table was not planned as deleted"
+    for t in [a, b, c]:
+        assert _execute_scalar(sql_server_conn, f"SELECT COUNT(1) FROM {t.to_string()}") == 0, "All records were not deleted"
+
+
+def test_mssql_cycle_only_disables_named_constraints(sql_server_conn):
+    ### Arrange ###
+    a = Table("dbo", "A")
+    b = Table("dbo", "B")
+    c = Table("dbo", "C")
+    for t in [a, b, c]:
+        _create_table(sql_server_conn, t)
+    _create_foreign_key_relationship(sql_server_conn, a, b)
+    _create_foreign_key_relationship(sql_server_conn, b, a)
+    _execute_query(sql_server_conn, f"ALTER TABLE {b.to_string()} ADD CId INT CONSTRAINT FK_B_REFFING_C_CId FOREIGN KEY REFERENCES {c.to_string()} (Id)")
+    _insert_bulk(sql_server_conn, f"INSERT INTO {c.to_string()}(Id) values(?)", [[i] for i in range(0, 100)])
+    _insert_bulk(sql_server_conn, f"INSERT INTO {a.to_string()}(Id) values(?)", [[i] for i in range(0, 100)])
+    _insert_bulk(sql_server_conn, f"INSERT INTO {b.to_string()}(Id, Val, CId) values(?, ?, ?)", [[i, i, i] for i in range(0, 100)])
+    _execute_query(sql_server_conn, f"UPDATE {a.to_string()} SET Val = Id")
+
+    ### Act ###
+    checkpoint = Checkpoint(db_adapter=SqlServerAdapter())
+    checkpoint.reset(sql_server_conn)
+
+    ### Assert ###
+    assert [r.relationship_name for r in checkpoint._graph_builder.cyclic_relationships] == ["FK_B_REFFING_A"], "Not only the constraint closing the cycle was disabled"
+    for t in [a, b, c]:
+        assert _execute_scalar(sql_server_conn, f"SELECT COUNT(1) FROM {t.to_string()}") == 0, "All records were not deleted"
+    assert _execute_scalar(sql_server_conn, "SELECT COUNT(1) FROM sys.foreign_keys WHERE is_disabled = 1 OR is_not_trusted = 1") == 0, "Foreign keys were not re-enabled as trusted"
+
+
+def test_mssql_refresh_after_migration(sql_server_conn):
+    ### Arrange ###
+    a = Table("dbo", "A")
+    b = Table("dbo", "B")
+    _execute_query(sql_server_conn, f"CREATE TABLE {a.to_string()} (Id INT IDENTITY(1,1) PRIMARY KEY, Val INT)")
+    checkpoint = Checkpoint(db_adapter=SqlServerAdapter(), reseed_identity=True)
+    checkpoint.reset(sql_server_conn)
+    _execute_query(sql_server_conn, f"CREATE TABLE {b.to_string()} (Id INT IDENTITY(1,1), AId INT REFERENCES {a.to_string()} (Id))")
+    _insert_bulk(sql_server_conn, f"INSERT INTO {a.to_string()} (Val) values(?)", [[i] for i in range(0, 100)])
+    _execute_query(sql_server_conn, f"INSERT INTO {b.to_string()} (AId) SELECT Id FROM {a.to_string()}")
+
+    ### Act ###
+    changed = checkpoint.refresh(sql_server_conn)
+    checkpoint.reset(sql_server_conn)
+    _execute_query(sql_server_conn, f"INSERT INTO {a.to_string()} (Val) values(1234)")
+    _execute_query(sql_server_conn, f"INSERT INTO {b.to_string()} (AId) values(1)")
+
+    ### Assert ###
+    assert changed, "Migration was not detected"
+    assert _execute_scalar(sql_server_conn, f"SELECT MAX(Id) FROM {b.to_string()}") == 1, "Identity of the added table was not reseeded"
+    assert _execute_scalar(sql_server_conn, f"SELECT COUNT(1) FROM {a.to_string()}") == 1, "All records were not deleted"
+
+
+def test_mssql_detect_schema_changes(sql_server_conn):
+    ### Arrange ###
+    a = Table("dbo", "A")
+    b = Table("dbo", "B")
+    _create_table(sql_server_conn, a)
+    checkpoint = Checkpoint(db_adapter=SqlServerAdapter(), detect_schema_changes=True)
+    checkpoint.reset(sql_server_conn)
+    _create_table(sql_server_conn, b)
+    _create_foreign_key_relationship(sql_server_conn, b, a)
+    _insert_bulk(sql_server_conn, f"INSERT INTO {a.to_string()} (Id) values(?)", [[i] for i in range(0, 100)])
+    _insert_bulk(sql_server_conn, f"INSERT INTO {b.to_string()} (Id, Val) values(?, ?)", [[i, i] for i in range(0, 100)])
+
+    ### Act ###
+    checkpoint.reset(sql_server_conn)
+
+    ### Assert ###
+    assert checkpoint._graph_builder.to_delete == [b, a], "Plan was not refreshed"
+    for t in [a, b]:
+        assert _execute_scalar(sql_server_conn, f"SELECT COUNT(1) FROM {t.to_string()}") == 0, "All records were not deleted"
+
+
+def test_mssql_savepoint_reset(sql_server_conn):
+    ### Arrange ###
+    a = Table("dbo", "A")
+    b = Table("dbo", "B")
+    _create_table(sql_server_conn, a)
+    _create_table(sql_server_conn, b)
+    _create_foreign_key_relationship(sql_server_conn, b, a)
+    checkpoint = Checkpoint(db_adapter=SqlServerAdapter())
+    checkpoint.begin(sql_server_conn)
+    transaction_id = checkpoint._savepoint_transaction_id
+    _insert_bulk(sql_server_conn, f"INSERT INTO {a.to_string()} (Id) values(?)", [[i] for i in range(0, 100)])
+    _insert_bulk(sql_server_conn, f"INSERT INTO {b.to_string()} (Id, Val) values(?, ?)", [[i, i] for i in range(0, 100)])
+
+    ### Act ###
+    checkpoint.reset(sql_server_conn)
+    rolled_back = checkpoint._savepoint_transaction_id == transaction_id
+    _insert_bulk(sql_server_conn, f"INSERT INTO {a.to_string()} (Id) values(?)", [[i] for i in range(0, 100)])
+    sql_server_conn.commit()
+    checkpoint.reset(sql_server_conn)
+
+    ### Assert ###
+    assert rolled_back, "Reset did not roll back to the savepoint"
+    assert _execute_scalar(sql_server_conn, f"SELECT COUNT(1) FROM {a.to_string()}") == 0, "Committed records were not deleted"
+    assert _execute_scalar(sql_server_conn, f"SELECT COUNT(1) FROM {b.to_string()}") == 0, "All records were not rolled back"
+
+
+def test_mssql_savepoint_reset_does_not_block_other_connections(sql_server_conn, sql_server_conn_factory):
+    ### Arrange ###
+    a = Table("dbo", "A")
+    _create_table(sql_server_conn, a)
+    checkpoint = Checkpoint(db_adapter=SqlServerAdapter())
+    checkpoint.begin(sql_server_conn)
+    _insert_bulk(sql_server_conn, f"INSERT INTO {a.to_string()} (Id) values(?)", [[i] for i in range(0, 100)])
+
+    def insert_from_other_connection():
+        other_conn = sql_server_conn_factory()
+        _insert_bulk(other_conn, f"INSERT INTO {a.to_string()} (Id) values(?)", [[i] for i in range(100, 200)])
+        other_conn.close()
+
+    ### Act ###
+    other = threading.Thread(target=insert_from_other_connection)
+    other.start()
+    other.join(timeout=10)
+    blocked = other.is_alive()
+    checkpoint.reset(sql_server_conn)
+    other.join()
+
+    ### Assert ###
+    assert not blocked, "Write of another connection waited for the savepoint transaction"
+    assert _execute_scalar(sql_server_conn, f"SELECT COUNT(1) FROM {a.to_string()}") == 0, "Records of another connection were not deleted"
+
+
+def test_mssql_baseline_reset(sql_server_conn):
+    ### Arrange ###
+    ref = Table("dbo", "Ref")
+    a = Table("dbo", "A")
+    _execute_query(sql_server_conn, f"CREATE TABLE {ref.to_string()} ([Id] int IDENTITY(1, 1) NOT NULL CONSTRAINT PK_Ref PRIMARY KEY, [Val] int, [Double] AS [Val] * 2)")
+    _create_table(sql_server_conn, a)
+    _create_foreign_key_relationship(sql_server_conn, a, ref)
+    _insert_bulk(sql_server_conn, f"INSERT INTO {ref.to_string()} (Val) values(?)", [[i] for i in range(0, 100)])
+    checkpoint = Checkpoint(db_adapter=SqlServerAdapter(), reseed_identity=True, baseline_tables=["Ref"])
+    for _ in range(0, 2):
+        _execute_query(sql_server_conn, f"INSERT INTO {ref.to_string()} (Val) values(1234)")
+        _execute_query(sql_server_conn, f"INSERT INTO {a.to_string()} (Id, Val) SELECT Id, Id FROM {ref.to_string()}")
+
+        ### Act ###
+        checkpoint.reset(sql_server_conn)
+
+    _execute_query(sql_server_conn, f"INSERT INTO {ref.to_string()} (Val) values(1234)")
+
+    ### Assert ###
+    assert _execute_scalar(sql_server_conn, f"SELECT COUNT(1) FROM {a.to_string()}") == 0, "All records were not deleted"
+    assert _execute_scalar(sql_server_conn, f"SELECT COUNT(1) FROM {ref.to_string()} WHERE Val < 100 AND [Double] = Val * 2") == 100, "Baseline was not restored"
+    assert _execute_scalar(sql_server_conn, f"SELECT MAX(Id) FROM {ref.to_string()}") == 101, "Identity was not moved past the baseline"
+
+def test_mssql_savepoint_reset_syncs_baseline_identity(sql_server_conn):
+    ### Arrange ###
+    ref = Table("dbo", "Ref")
+    _execute_query(sql_server_conn, f"CREATE TABLE {ref.to_string()} ([Id] int IDENTITY(1, 1) NOT NULL CONSTRAINT PK_Ref PRIMARY KEY, [Val] int)")
+    _insert_bulk(sql_server_conn, f"INSERT INTO {ref.to_string()} (Val) values(?)", [[i] for i in range(0, 100)])
+    checkpoint = Checkpoint(db_adapter=SqlServerAdapter(), reseed_identity=True, baseline_tables=["Ref"])
+    checkpoint.begin(sql_server_conn)
+    _execute_query(sql_server_conn, f"INSERT INTO {ref.to_string()} (Val) values(1234)")
+
+    ### Act ###
+    checkpoint.reset(sql_server_conn)
+    _execute_query(sql_server_conn, f"INSERT INTO {ref.to_string()} (Val) values(1234)")
+
+    ### Assert ###
+    assert _execute_scalar(sql_server_conn, f"SELECT COUNT(1) FROM {ref.to_string()}") == 101, "Baseline was not kept by the rollback"
+    assert _execute_scalar(sql_server_conn, f"SELECT MAX(Id) FROM {ref.to_string()}") == 101, "Identity was not synced to the baseline"
+
+def test_mssql_baseline_reset_only_reloads_changed_tables(sql_server_conn):
+    ### Arrange ###
+    ref = Table("dbo", "Ref")
+    lookup = Table("dbo", "Lookup")
+    ref_log = Table("dbo", "RefLog")
+    for t in [ref, lookup]:
+        _create_table(sql_server_conn, t)
+        _insert_bulk(sql_server_conn, f"INSERT INTO {t.to_string()} (Id, Val) values(?, ?)", [[i, i] for i in range(0, 100)])
+    _execute_query(sql_server_conn, f"CREATE TABLE {ref_log.to_string()} ([Id] int IDENTITY(1, 1))")
+    _execute_query(sql_server_conn, f"CREATE TRIGGER [dbo].[RefDeleted] ON {ref.to_string()} AFTER DELETE AS INSERT INTO {ref_log.to_string()} DEFAULT VALUES")
+    checkpoint = Checkpoint(db_adapter=SqlServerAdapter(), tables_to_ignore=["RefLog"], baseline_tables=["Ref", "Lookup"])
+    checkpoint.reset(sql_server_conn)
+    _execute_query(sql_server_conn, f"UPDATE {lookup.to_string()} SET Val = Val + 1 WHERE Id = 50")
+
+    ### Act ###
+    checkpoint.reset(sql_server_conn)
+
+    ### Assert ###
+    assert _execute_scalar(sql_server_conn, f"SELECT COUNT(1) FROM {ref_log.to_string()}") == 0, "Unchanged baseline table was reloaded"
+    assert _execute_scalar(sql_server_conn, f"SELECT Val FROM {lookup.to_string()} WHERE Id = 50") == 50, "Changed baseline table was not restored"
+    assert _execute_scalar(sql_server_conn, f"SELECT COUNT(1) FROM {lookup.to_string()}") == 100, "Changed baseline table was not restored"
+
+def test_mssql_baseline_reset_with_rowversion_only_reloads_changed_tables(sql_server_conn):
+    ### Arrange ###
+    ref = Table("dbo", "Ref")
+    ref_log = Table("dbo", "RefLog")
+    _execute_query(sql_server_conn, f"CREATE TABLE {ref.to_string()} ([Id] int NOT NULL CONSTRAINT PK_Ref PRIMARY KEY, [Val] int, [Version] rowversion)")
+    _insert_bulk(sql_server_conn, f"INSERT INTO {ref.to_string()} (Id, Val) values(?, ?)", [[i, i] for i in range(0, 100)])
+    _execute_query(sql_server_conn, f"CREATE TABLE {ref_log.to_string()} ([Id] int IDENTITY(1, 1))")
+    _execute_query(sql_server_conn, f"CREATE TRIGGER [dbo].[RefDeleted] ON {ref.to_string()} AFTER DELETE AS INSERT INTO {ref_log.to_string()} DEFAULT VALUES")
+    checkpoint = Checkpoint(db_adapter=SqlServerAdapter(), tables_to_ignore=["RefLog"], baseline_tables=["Ref"])
+    checkpoint.reset(sql_server_conn)
+    _execute_query(sql_server_conn, f"UPDATE {ref.to_string()} SET Val = Val + 1 WHERE Id = 50")
+    checkpoint.reset(sql_server_conn)
+    reloads = _execute_scalar(sql_server_conn, f"SELECT COUNT(1) FROM {ref_log.to_string()}")
+
+    ### Act ###
+    checkpoint.reset(sql_server_conn)
+
+    ### Assert ###
+    assert reloads == 1, "Changed baseline table was not reloaded"
+    assert _execute_scalar(sql_server_conn, f"SELECT COUNT(1) FROM {ref_log.to_string()}") == 1, "Reloaded baseline table with a rowversion column was reloaded again"
+
+def test_mssql_areset(sql_server_conn, sql_server_async_conn_factory):
+    ### Arrange ###
+    a = Table("dbo", "A")
+    b = Table("dbo", "B")
+    c = Table("dbo", "C")
+    for t in [a, b, c]:
+        _create_table(sql_server_conn, t)
+    _create_foreign_key_relationship(sql_server_conn, a, b)
+    _insert_bulk(sql_server_conn, f"INSERT INTO {b.to_string()}(Id) values(?)", [[i] for i in range(0, 100)])
+    _insert_bulk(sql_server_conn, f"INSERT INTO {a.to_string()}(Id, Val) values(?, ?)", [[i, i] for i in range(0, 100)])
+    _insert_bulk(sql_server_conn, f"INSERT INTO {c.to_string()}(Id) values(?)", [[i] for i in range(0, 100)])
+    checkpoint = Checkpoint(db_adapter=SqlServerAdapter())
+
+    async def reset():
+        conn = await sql_server_async_conn_factory()
+        try:
+            await checkpoint.areset(conn)
+            async with conn.cursor() as cur:
+                await cur.execute(f"INSERT INTO {c.to_string()}(Id) values(1)")
+            await checkpoint.areset(conn, sql_server_async_conn_factory, max_workers=2)
+        finally:
+            await conn.close()
+
+    ### Act ###
+    _run(reset())
+
+    ### Assert ###
+    for t in [a, b, c]:
+        assert _execute_scalar(sql_server_conn, f"SELECT COUNT(1) FROM {t.to_string()}") == 0, "All records were not deleted"
+
+
+def test_mssql_snapshot_reset(sql_server_conn_factory, sql_server_maintenance_conn_factory):
+    ### Arrange ###
+    a = Table("dbo", "A")
+    ref = Table("dbo", "Ref")
+    sql_server_conn = sql_server_conn_factory()
+    _create_table(sql_server_conn, a)
+    _create_table(sql_server_conn, ref)
+    _insert_bulk(sql_server_conn, f"INSERT INTO {ref.to_string()} (Id) values(?)", [[i] for i in range(0, 100)])
+    _insert_bulk(sql_server_conn, f"INSERT INTO {a.to_string()} (Id) values(?)", [[i] for i in range(0, 100)])
+    checkpoint = Checkpoint(db_adapter=SqlServerAdapter(use_database_snapshot=True, maintenance_conn_factory=sql_server_maintenance_conn_factory), tables_to_ignore=["Ref"])
+    checkpoint.reset(sql_server_conn)
+    sql_server_conn = sql_server_conn_factory()
+    _insert_bulk(sql_server_conn, f"INSERT INTO {a.to_string()} (Id) values(?)", [[i] for i in range(0, 100)])
+    _execute_query(sql_server_conn, f"DELETE FROM {ref.to_string()} WHERE Id < 50")
+
+    ### Act ###
+    checkpoint.reset(sql_server_conn)
+    sql_server_conn = sql_server_conn_factory()
+
+    ### Assert ###
+    assert _execute_scalar(sql_server_conn, f"SELECT COUNT(1) FROM {a.to_string()}") == 0, "Database was not reverted to the snapshot"
+    assert _execute_scalar(sql_server_conn, f"SELECT COUNT(1) FROM {ref.to_string()}") == 100, "Seeded reference data was not kept in the snapshot"
+    assert _execute_scalar(sql_server_conn, "SELECT user_access_desc FROM sys.databases WHERE name = DB_NAME()") == "MULTI_USER", "Database was left in single-user mode"
+    sql_server_conn.close()
@@ -0,0 +1,153 @@
+import asyncio
+
+from pyspawn import Checkpoint
+from pyspawn.adapters import PgAdapter, SqlServerAdapter
+from pyspawn._graph.table import Table
+from pyspawn.tests._async_utilities import _run
+
+
+PLAN_METADATA = [
+    ("database", "tests", None, None, None, None),
+    ("table", "public", "a", None, None, None),
+    ("table", "public", "b", None, None, None),
+    ("table", "public", "c", None, None, None),
+    ("table", "public", "d", None, None, None),
+    ("relationship", "public", "b", "public", "a", "fk_b_a"),
+]
+
+
+class _AsyncpgConnection:
+    """Connection with the asyncpg API that records the statements instead of talking to a DB. Every statement yields to the event loop."""
+    def __init__(self, state: dict, metadata: list = PLAN_METADATA, fail: bool = False):
+        self.state = state
+        self.metadata = metadata
+        self.fail = fail
+        self.executed = []
+        self.closed = False
+
+    async def execute(self, cmd_txt: str):
+        if self.fail:
+            raise RuntimeError("delete failed")
+        self.state["running"] += 1
+        self.state["max_running"] = max(self.state["max_running"], self.state["running"])
+        await asyncio.sleep(0)
+        self.executed.append(cmd_txt)
+        self.state["running"] -= 1
+
+    async def fetch(self, cmd_txt: str):
+        self.executed.append(cmd_txt)
+        return self.metadata if "'relationship'" in cmd_txt else []
+
+    async def close(self):
+        self.closed = True
+
+
+class _AsyncCursor:
+    def __init__(self, conn):
+        self.conn = conn
+        self.rows = []
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *args):
+        pass
+
+    async def execute(self, cmd_txt: str):
+        self.conn.executed.append(cmd_txt)
+        self.rows = PLAN_METADATA if "'relationship'" in cmd_txt else []
+
+    async def fetchall(self):
+        return self.rows
+
+
+class _AioodbcConnection:
+    """Connection with the async DB-API cursor API of aioodbc that records the statements instead of talking to a DB."""
+    def __init__(self):
+        self.executed = []
+
+    def cursor(self):
+        return _AsyncCursor(self)
+
+
+def test_areset_on_asyncpg_connection():
+    ### Arrange ###
+    conn = _AsyncpgConnection({"running": 0, "max_running": 0})
+    checkpoint = Checkpoint(db_adapter=PgAdapter())
+
+    ### Act ###
+    _run(checkpoint.areset(conn))
+
+    ### Assert ###
+    to_delete = checkpoint._graph_builder.to_delete
+    assert to_delete.index(Table("public", "b")) < to_delete.index(Table("public", "a")), "Plan was not built from the async metadata"
+    assert conn.executed[-1] == checkpoint.db_adapter.get_reset_command_text([], checkpoint._delete_sql, None), "Reset was not sent as a single batch"
+
+
+def test_areset_on_aioodbc_connection():
+    ### Arrange ###
+    conn = _AioodbcConnection()
+    checkpoint = Checkpoint(db_adapter=SqlServerAdapter())
+
+    ### Act ###
+    _run(checkpoint.areset(conn))
+
+    ### Assert ###
+    assert len(checkpoint._graph_builder.to_delete) == 4, "Plan was not built from the async metadata"
+    assert conn.executed[-1] == checkpoint.db_adapter.get_reset_command_text([], checkpoint._delete_sql, None), "Reset was not sent as a single batch"
+
+
+def test_areset_deletes_components_concurrently():
+    ### Arrange ###
+    state = {"running": 0, "max_running": 0}
+    worker_conns = []
+    async def conn_factory():
+        worker_conns.append(_AsyncpgConnection(state))
+        return worker_conns[-1]
+    checkpoint = Checkpoint(db_adapter=PgAdapter())
+
+    ### Act ###
+    _run(checkpoint.areset(_AsyncpgConnection(state), conn_factory, max_workers=3))
+
+    ### Assert ###
+    deleted = [cmd_txt for c in worker_conns for cmd_txt in c.executed]
+    assert len(worker_conns) == 3, "Components were not spread over max_workers connections"
+    assert state["max_running"] == 3, "Components were not deleted concurrently"
+    assert len(deleted) == 4, "All tables were not deleted"
+    assert all([c.closed for c in worker_conns]), "Worker connections were not closed"
+
+
+def test_areset_enables_constraints_after_failed_delete():
+    ### Arrange ###
+    state = {"running": 0, "max_running": 0}
+    metadata = PLAN_METADATA + [("relationship", "public", "a", "public", "b", "fk_a_b")]
+    async def conn_factory():
+        return _AsyncpgConnection(state, fail=True)
+    conn = _AsyncpgConnection(state, metadata)
+    checkpoint = Checkpoint(db_adapter=SqlServerAdapter())
+
+    ### Act ###
+    try:
+        _run(checkpoint.areset(conn, conn_factory))
+        raised = None
+    except RuntimeError as e:
+        raised = e
+
+    ### Assert ###
+    assert raised is not None, "Failed delete was not raised"
+    assert conn.executed[-1] == checkpoint.db_adapter.get_enable_cyclic_constraints_command_text(checkpoint._graph_builder.cyclic_relationships), "Cyclic constraints were not enabled again"
+
+
+def test_areset_rejects_unsupported_options():
+    ### Arrange ###
+    checkpoint = Checkpoint(db_adapter=PgAdapter(), compile_reset=True, baseline_tables=["a"])
+
+    ### Act ###
+    try:
+        _run(checkpoint.areset(_AsyncpgConnection({"running": 0, "max_running": 0})))
+        raised = None
+    except ValueError as e:
+        raised = e
+
+    ### Assert ###
+    assert raised is not None and "baseline_tables" in str(raised) and "compile_reset" in str(raised), "Unsupported options were not rejected"
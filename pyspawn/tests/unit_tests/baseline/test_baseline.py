@@ -0,0 +1,68 @@
+from pyspawn import Checkpoint
+from pyspawn.adapters import PgAdapter
+
+
+PLAN_METADATA = [
+    ("table", "public", "a", None, None, None),
+    ("table", "public", "b", None, None, None),
+    ("table", "public", "c", None, None, None),
+    ("relationship", "public", "b", "public", "a", "fk_b_a"),
+    ("relationship", "public", "c", "public", "b", "fk_c_b"),
+]
+
+
+def test_baseline_rejects_reference_to_non_baseline_table():
+    ### Arrange ###
+    checkpoint = Checkpoint(db_adapter=PgAdapter(), baseline_tables=["b", "c"])
+    checkpoint._build_graph(*checkpoint._read_plan_metadata(PLAN_METADATA))
+
+    ### Act ###
+    try:
+        checkpoint._ensure_baseline(None)
+        raised = None
+    except ValueError as e:
+        raised = e
+
+    ### Assert ###
+    assert raised is not None and "public.a" in str(raised) and "public.b" not in str(raised), "Referenced table missing from baseline_tables was not rejected"
+
+
+class _Cursor:
+    """Cursor that writes a few bytes for every COPY ... TO STDOUT instead of talking to a DB."""
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        pass
+
+    def copy_expert(self, cmd_txt: str, f):
+        f.write(b"baseline")
+
+    def execute(self, cmd_txt: str):
+        pass
+
+    def fetchall(self):
+        return []
+
+
+class _Connection:
+    def cursor(self):
+        return _Cursor()
+
+
+def test_baseline_files_are_removed_at_exit(tmp_path, monkeypatch):
+    ### Arrange ###
+    exit_handlers = []
+    monkeypatch.setattr("atexit.register", exit_handlers.append)
+    checkpoint = Checkpoint(db_adapter=PgAdapter(), baseline_tables=["a", "b"], baseline_path=str(tmp_path))
+    checkpoint._build_graph(*checkpoint._read_plan_metadata(PLAN_METADATA))
+    checkpoint._ensure_baseline(_Connection())
+    captured = len(list(tmp_path.iterdir()))
+
+    ### Act ###
+    for handler in exit_handlers:
+        handler()
+
+    ### Assert ###
+    assert captured == 2, "Baseline tables were not captured to files"
+    assert len(list(tmp_path.iterdir())) == 0, "Baseline files were not removed at exit"
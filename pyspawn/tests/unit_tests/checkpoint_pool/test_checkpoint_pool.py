@@ -0,0 +1,124 @@
+import threading
+
+from pyspawn import Checkpoint, CheckpointPool
+
+
+class _Connection:
+    def __init__(self, database: str):
+        self.database = database
+        self.closed = False
+
+    def close(self):
+        self.closed = True
+
+
+class _RecordingCheckpoint(Checkpoint):
+    """Checkpoint that records which databases were reset instead of talking to a DB."""
+    resets = []
+    lock = threading.Lock()
+
+    def reset(self, conn):
+        with self.lock:
+            self.resets.append(conn.database)
+
+
+def test_pool_resets_all_databases_before_lease():
+    ### Arrange ###
+    _RecordingCheckpoint.resets = []
+    factories = [lambda: _Connection("db_1"), lambda: _Connection("db_2")]
+
+    ### Act ###
+    with CheckpointPool(_RecordingCheckpoint(), factories) as pool:
+        with pool.lease(timeout=5) as conn:
+            leased = conn.database
+
+    ### Assert ###
+    assert leased in ["db_1", "db_2"], "Leased connection is not to a pooled DB"
+    assert sorted(_RecordingCheckpoint.resets[:2]) == ["db_1", "db_2"], "Not all DBs were reset up front"
+
+
+def test_pool_resets_released_database_in_background():
+    ### Arrange ###
+    _RecordingCheckpoint.resets = []
+    factories = [lambda: _Connection("db_1")]
+
+    ### Act ###
+    with CheckpointPool(_RecordingCheckpoint(), factories) as pool:
+        with pool.lease(timeout=5) as first:
+            pass
+        with pool.lease(timeout=5) as second:
+            pass
+
+    ### Assert ###
+    assert first.closed and second.closed, "Leased connections were not closed on release"
+    assert _RecordingCheckpoint.resets == ["db_1", "db_1", "db_1"], "Released DB was not reset before it was leased again"
+
+
+def test_pool_raises_failed_reset_on_lease():
+    ### Arrange ###
+    class _FailingCheckpoint(Checkpoint):
+        def reset(self, conn):
+            raise RuntimeError("reset failed")
+
+    ### Act ###
+    with CheckpointPool(_FailingCheckpoint(), [lambda: _Connection("db_1")]) as pool:
+        try:
+            with pool.lease(timeout=5):
+                pass
+            raised = None
+        except RuntimeError as e:
+            raised = e
+
+    ### Assert ###
+    assert raised is not None and str(raised) == "reset failed", "Failed background reset was not raised on lease"
+
+
+def test_pool_retries_failed_reset():
+    ### Arrange ###
+    class _FailingOnceCheckpoint(Checkpoint):
+        failed = False
+        def reset(self, conn):
+            if not self.failed:
+                self.failed = True
+                raise RuntimeError("reset failed")
+
+    ### Act ###
+    with CheckpointPool(_FailingOnceCheckpoint(), [lambda: _Connection("db_1")]) as pool:
+        try:
+            with pool.lease(timeout=5):
+                pass
+            raised = None
+        except RuntimeError as e:
+            raised = e
+        with pool.lease(timeout=5) as conn:
+            leased = conn.database
+
+    ### Assert ###
+    assert raised is not None, "Failed background reset was not raised on lease"
+    assert leased == "db_1", "DB was not reset again after the failed reset"
+
+
+def test_pool_keeps_database_when_connect_fails():
+    ### Arrange ###
+    _RecordingCheckpoint.resets = []
+    connects = []
+    def factory():
+        connects.append(None)
+        if len(connects) == 2:
+            raise RuntimeError("connect failed")
+        return _Connection("db_1")
+
+    ### Act ###
+    with CheckpointPool(_RecordingCheckpoint(), [factory]) as pool:
+        try:
+            with pool.lease(timeout=5):
+                pass
+            raised = None
+        except RuntimeError as e:
+            raised = e
+        with pool.lease(timeout=5) as conn:
+            leased = conn.database
+
+    ### Assert ###
+    assert raised is not None and str(raised) == "connect failed", "Failed connect was not raised on lease"
+    assert leased == "db_1", "DB was lost from the pool after the failed connect"
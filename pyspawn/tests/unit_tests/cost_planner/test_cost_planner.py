@@ -0,0 +1,69 @@
+from pyspawn._graph.cost_planner import CostPlanner, TRUNCATE, DELETE, BATCHED_DELETE
+from pyspawn._graph.graph_builder import GraphBuilder
+from pyspawn._graph.relationship import Relationship
+from pyspawn._graph.table import Table
+
+
+def test_cost_planner_deletes_small_and_truncates_large_tables():
+    ### Arrange ###
+    a = Table("dbo", "a")
+    b = Table("dbo", "b")
+    graph = GraphBuilder(set([a, b]), set())
+
+    ### Act ###
+    reset_plan = CostPlanner().plan(graph, graph.to_delete, {a: 10, b: 10000000}, set([a, b]))
+
+    ### Assert ###
+    assert reset_plan.get_tables(DELETE) == [a], "Small table was not deleted"
+    assert reset_plan.get_tables(TRUNCATE) == [b], "Large table was not truncated"
+    assert reset_plan.estimated_cost == sum([t.estimated_cost for t in reset_plan.tables]), "Estimated cost is not the sum of the table costs"
+
+
+def test_cost_planner_batches_large_tables_that_can_not_be_truncated():
+    ### Arrange ###
+    a = Table("dbo", "a")
+    graph = GraphBuilder(set([a]), set())
+
+    ### Act ###
+    reset_plan = CostPlanner(batched_delete_threshold=1000).plan(graph, graph.to_delete, {a: 5000}, set())
+
+    ### Assert ###
+    assert reset_plan.get_tables(BATCHED_DELETE) == [a], "Large table that can not be truncated was not batch deleted"
+
+
+def test_cost_planner_does_not_batch_without_batched_delete():
+    ### Arrange ###
+    a = Table("public", "a")
+    graph = GraphBuilder(set([a]), set())
+
+    ### Act ###
+    reset_plan = CostPlanner(batched_delete_threshold=1000).plan(graph, graph.to_delete, {a: 5000}, set(), batched_delete=False)
+
+    ### Assert ###
+    assert reset_plan.get_tables(DELETE) == [a], "Large table was batch deleted although the adapter does not support it"
+
+
+def test_cost_planner_truncate_cascades_to_referencing_tables():
+    ### Arrange ###
+    a = Table("public", "a")
+    b = Table("public", "b")
+    graph = GraphBuilder(set([a, b]), set([Relationship(b, a, "b_to_a_rel")]))
+
+    ### Act ###
+    reset_plan = CostPlanner().plan(graph, graph.to_delete, {a: 10000000, b: 10}, set([a, b]), truncate_cascades=True)
+
+    ### Assert ###
+    assert reset_plan.get_tables(TRUNCATE) == [b, a], "Table referencing a truncated table was not planned as truncated"
+
+
+def test_cost_planner_truncates_cyclical_tables_when_truncate_cascades():
+    ### Arrange ###
+    a = Table("public", "a")
+    b = Table("public", "b")
+    graph = GraphBuilder(set([a, b]), set([Relationship(a, b, "a_to_b_rel"), Relationship(b, a, "b_to_a_rel")]))
+
+    ### Act ###
+    reset_plan = CostPlanner().plan(graph, graph.to_delete, {a: 10, b: 10}, set([a, b]), truncate_cascades=True)
+
+    ### Assert ###
+    assert reset_plan.get_tables(TRUNCATE) == [a, b], "Tables in a cycle were not planned as truncated"
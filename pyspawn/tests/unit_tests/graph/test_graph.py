@@ -2,7 +2,7 @@ from pyspawn._graph.graph_builder import GraphBuilder
 from pyspawn._graph.table import Table
 from pyspawn._graph.relationship import Relationship
 
-### NB! Environment variable "PYTHONHASHSEED" has to be set to "0" to avoid runtime randomization of hash seed. Randomization will mess up return order and fail tests ###
+### The delete order and the cyclical relationships are deterministic (ties are broken on schema and table name), regardless of "PYTHONHASHSEED" ###
 
 def test_delete_list_with_one_table():
     ### Arrange ###
@@ -27,7 +27,7 @@ def test_delete_list_with_two_unrelated_tables():
     builder = GraphBuilder(set(tables), set())
 
     ### Assert ###
-    assert builder.to_delete == [b, a], "Results not as expected"
+    assert builder.to_delete == [a, b], "Results not as expected"
 
 
 
@@ -176,8 +176,8 @@ def test_remove_cyclical_relationship_ignore_normal_relationships():
     Builder = GraphBuilder(set(Tables), set(Relationships))
 
     ### Assert ###
-    assert Builder.cyclic_relationships == [C_to_D], "Not returning expected cyclical relationship"
-    assert Builder.to_delete == [A, B, D, C], "Results not as expected"
+    assert Builder.cyclic_relationships == [D_to_C], "Not returning expected cyclical relationship"
+    assert Builder.to_delete == [A, B, C, D], "Results not as expected"
     
 
 
@@ -196,8 +196,8 @@ def test_remove_cycles_withouth_removing_start():
     Builder = GraphBuilder(set(Tables), set(Relationships))
 
     ### Assert ###
-    assert Builder.cyclic_relationships == [B_to_C], "Not returning expected cyclical relationship"
-    assert Builder.to_delete == [A, C, B], "Results not as expected"
+    assert Builder.cyclic_relationships == [C_to_B], "Not returning expected cyclical relationship"
+    assert Builder.to_delete == [A, B, C], "Results not as expected"
     
 
 
@@ -224,7 +224,7 @@ def test_find_one_cyclical_relationship():
 
     ### Assert ###
     assert Builder.cyclic_relationships == [B_to_A], "Not returning expected cyclical relationship"
-    assert Builder.to_delete == [F,E,A,B,C,D], "Results not as expected"
+    assert Builder.to_delete == [E,F,A,B,C,D], "Results not as expected"
     
 
 
@@ -245,8 +245,8 @@ def test_multiple_simple_cyclical_relationships():
     Builder = GraphBuilder(set(Tables), set(Relationships))
 
     ### Assert ###
-    assert Builder.cyclic_relationships == [C_to_D, B_to_A], "Not returning expected cyclical relationship"
-    assert Builder.to_delete == [A, B, D, C], "Results not as expected"
+    assert Builder.cyclic_relationships == [B_to_A, D_to_C], "Not returning expected cyclical relationship"
+    assert Builder.to_delete == [A, B, C, D], "Results not as expected"
     
 
 
@@ -277,10 +277,139 @@ def test_find_multiple_cyclical_relationship():
     Builder = GraphBuilder(set(Tables), set(Relationships))
 
     ### Assert ###
-    assert Builder.cyclic_relationships == [C_to_D, E_to_D, F_to_D], "Not returning expected cyclical relationship"
-    assert Builder.to_delete == [A,D,B,C,E,F], "Results not as expected"
+    assert Builder.cyclic_relationships == [D_to_B, D_to_E], "Not returning expected cyclical relationship"
+    assert Builder.to_delete == [A,E,F,B,C,D], "Results not as expected"
     
 
+
+
+
+def test_delete_subset_includes_referencing_tables():
+    """C is dirty. B references C and A references B, so all three have to be deleted. D is untouched."""
+    A = Table("dbo", "A")
+    B = Table("dbo", "B")
+    C = Table("dbo", "C")
+    D = Table("dbo", "D")
+    Tables = [A,B,C,D]
+    A_to_B = Relationship(A, B, "A.B")
+    B_to_C = Relationship(B, C, "B.C")
+    Relationships = [A_to_B, B_to_C]
+
+    ### Act ###
+    Builder = GraphBuilder(set(Tables), set(Relationships))
+    Subset = Builder.get_delete_subset([Table("dbo", "C")])
+
+    ### Assert ###
+    assert Subset == [A, B, C], "Results not as expected"
+
+
+
+
+def test_components_split_disparate_relationships():
+    A = Table("dbo", "A")
+    B = Table("dbo", "B")
+    C = Table("dbo", "C")
+    D = Table("dbo", "D")
+    E = Table("dbo", "E")
+    Tables = [A,B,C,D,E]
+    A_to_B = Relationship(A, B, "A.B")
+    C_to_D = Relationship(C, D, "C.D")
+    D_to_C = Relationship(D, C, "D.C")
+    Relationships = [A_to_B, C_to_D, D_to_C]
+
+    ### Act ###
+    Builder = GraphBuilder(set(Tables), set(Relationships))
+    Components = sorted([sorted(c, key=lambda t: t.table_name) for c in Builder.get_components()], key=lambda c: c[0].table_name)
+
+    ### Assert ###
+    assert Components == [[A, B], [C, D], [E]], "Results not as expected"
+
+
+
+def test_adjacency_indexes_relationships():
+    A = Table("dbo", "A")
+    B = Table("dbo", "B")
+    C = Table("dbo", "C")
+    Tables = [A,B,C]
+    A_to_B = Relationship(A, B, "A.B")
+    A_to_C = Relationship(A, C, "A.C")
+    B_to_C = Relationship(B, C, "B.C")
+    Relationships = [A_to_B, A_to_C, B_to_C]
+
+    ### Act ###
+    Builder = GraphBuilder(set(Tables), set(Relationships))
+    Ordered, Offsets, Targets = Builder.get_adjacency()
+    Edges = set([(Ordered[i], Ordered[Targets[j]]) for i in range(len(Ordered)) for j in range(Offsets[i], Offsets[i + 1])])
+
+    ### Assert ###
+    assert Ordered == Builder.to_delete, "Tables are not in delete order"
+    assert Edges == set([(A, B), (A, C), (B, C)]), "Results not as expected"
+
+
+
+def test_levels_group_tables_without_dependencies():
+    """A references B and C, B references C. D and E form a cycle, which is not considered."""
+    A = Table("dbo", "A")
+    B = Table("dbo", "B")
+    C = Table("dbo", "C")
+    D = Table("dbo", "D")
+    E = Table("dbo", "E")
+    Tables = [A,B,C,D,E]
+    A_to_B = Relationship(A, B, "A.B")
+    A_to_C = Relationship(A, C, "A.C")
+    B_to_C = Relationship(B, C, "B.C")
+    D_to_E = Relationship(D, E, "D.E")
+    E_to_D = Relationship(E, D, "E.D")
+    Relationships = [A_to_B, A_to_C, B_to_C, D_to_E, E_to_D]
+
+    ### Act ###
+    Builder = GraphBuilder(set(Tables), set(Relationships))
+
+    ### Assert ###
+    assert Builder.levels == [[A, D], [B, E], [C]], "Results not as expected"
+    assert Builder.get_levels([B, C]) == [[B], [C]], "Results not as expected"
+
+
+
+def test_update_only_reorders_affected_component():
+    """A references B. C and D are unrelated to A and B, and a new table E referencing C is added together with the relationship."""
+    A = Table("dbo", "A")
+    B = Table("dbo", "B")
+    C = Table("dbo", "C")
+    D = Table("dbo", "D")
+    E = Table("dbo", "E")
+    A_to_B = Relationship(A, B, "A.B")
+    D_to_C = Relationship(D, C, "D.C")
+    E_to_C = Relationship(E, C, "E.C")
+    Builder = GraphBuilder(set([A, B, C, D]), set([A_to_B, D_to_C]))
+    Untouched = Builder.to_delete[0:2]
+
+    ### Act ###
+    Changed = Builder.update(set([A, B, C, D, E]), set([A_to_B, D_to_C, E_to_C]))
+    Unchanged = Builder.update(set([A, B, C, D, E]), set([A_to_B, D_to_C, E_to_C]))
+
+    ### Assert ###
+    assert Changed and not Unchanged, "Change was not detected"
+    assert Untouched == [A, B] and Builder.to_delete[0] is Untouched[0], "Unaffected component was re-ordered"
+    assert Builder.to_delete == [A, B, D, E, C], "Results not as expected"
+
+
+
+def test_delete_list_deep_chain():
+    """A 100k deep foreign key chain exceeds the recursion limit by far."""
+    Tables = [Table("dbo", f"T{i}") for i in range(100000)]
+    Relationships = [Relationship(Tables[i], Tables[i + 1], f"T{i}.T{i + 1}") for i in range(len(Tables) - 1)]
+    Relationships.append(Relationship(Tables[-1], Tables[0], f"T{len(Tables) - 1}.T0"))
+
+    ### Act ###
+    Builder = GraphBuilder(set(Tables), set(Relationships))
+
+    ### Assert ###
+    assert len(Builder.to_delete) == len(Tables), "Results not as expected"
+    assert len(Builder.cyclic_relationships) == 1, "Not returning expected cyclical relationship"
+    position = {t: i for i, t in enumerate(Builder.to_delete)}
+    assert all([position[r.parent_table] < position[r.referenced_table] for r in Relationships if r not in Builder.cyclic_relationships]), "Referencing tables are not deleted before referenced tables"
+
     
 if __name__ == "__main__":
     print("Starting Graph tests")
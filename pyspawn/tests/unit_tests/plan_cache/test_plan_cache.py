@@ -0,0 +1,66 @@
+from pyspawn import Checkpoint
+from pyspawn.adapters import PgAdapter
+from pyspawn._graph.table import Table
+from pyspawn._plan_cache import PlanCache
+
+
+def test_plan_cache_round_trip(tmp_path):
+    ### Arrange ###
+    cache = PlanCache(str(tmp_path / "plan.json"))
+    key = PlanCache.build_key(["PgAdapter", "db", ["a"], "fingerprint"])
+    plan = {"to_delete": [["dbo", "A"]], "delete_sql": "DELETE \"dbo\".\"A\""}
+
+    ### Act ###
+    cache.put(key, plan)
+
+    ### Assert ###
+    assert PlanCache(str(tmp_path / "plan.json")).get(key) == plan, "Plan was not restored from the cache file"
+
+
+def test_plan_cache_key_changes_with_fingerprint():
+    ### Act ###
+    key_1 = PlanCache.build_key(["PgAdapter", "db", "fingerprint_1"])
+    key_2 = PlanCache.build_key(["PgAdapter", "db", "fingerprint_2"])
+
+    ### Assert ###
+    assert key_1 != key_2, "Schema fingerprint is not part of the cache key"
+
+
+def test_plan_cache_ignores_corrupt_file(tmp_path):
+    ### Arrange ###
+    path = tmp_path / "plan.json"
+    path.write_text("{not json")
+
+    ### Act ###
+    cache = PlanCache(str(path))
+
+    ### Assert ###
+    assert cache.get("key") is None, "Corrupt cache file was not treated as empty"
+
+
+def test_cached_plan_keeps_equally_named_foreign_keys_apart():
+    """A references B and C and D reference each other, all through a constraint named "fk". Only one of the C / D constraints is cyclic."""
+    ### Arrange ###
+    rows = [
+        ("table", "public", "a", None, None, None),
+        ("table", "public", "b", None, None, None),
+        ("table", "public", "c", None, None, None),
+        ("table", "public", "d", None, None, None),
+        ("relationship", "public", "a", "public", "b", "fk"),
+        ("relationship", "public", "c", "public", "d", "fk"),
+        ("relationship", "public", "d", "public", "c", "fk"),
+    ]
+    checkpoint = Checkpoint(db_adapter=PgAdapter())
+    checkpoint._build_graph(*checkpoint._read_plan_metadata(rows))
+    checkpoint._build_plan_sql([])
+
+    ### Act ###
+    cached = Checkpoint(db_adapter=PgAdapter())
+    cached._load_plan(checkpoint._dump_plan())
+
+    ### Assert ###
+    A, B, C, D = Table("public", "a"), Table("public", "b"), Table("public", "c"), Table("public", "d")
+    assert sum([len(t.relationships) for t in checkpoint._graph_builder.to_delete]) == 3, "Equally named foreign keys were merged"
+    assert len(cached._graph_builder.cyclic_relationships) == 1, "Equally named foreign keys were restored as cyclic"
+    assert cached._graph_builder.get_levels([A, B]) == [[A], [B]], "Equally named foreign key was not considered"
+    assert cached._graph_builder.get_levels([C, D]) == checkpoint._graph_builder.get_levels([C, D]), "Results not as expected"
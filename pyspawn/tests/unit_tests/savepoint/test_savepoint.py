@@ -0,0 +1,20 @@
+from pyspawn import Checkpoint
+from pyspawn.adapters import PgAdapter
+
+
+def test_reset_parallel_rejects_savepoint_mode():
+    ### Arrange ###
+    checkpoint = Checkpoint(db_adapter=PgAdapter())
+    checkpoint._uses_savepoint = True
+    conns = []
+
+    ### Act ###
+    try:
+        checkpoint.reset_parallel(lambda: conns.append(None))
+        raised = None
+    except ValueError as e:
+        raised = e
+
+    ### Assert ###
+    assert raised is not None and "begin()" in str(raised), "Savepoint mode was not rejected"
+    assert len(conns) == 0, "Connections were opened although savepoint mode is rejected"